@@ -0,0 +1,97 @@
+"""Benchmark plugin command discovery with and without the command manifest
+
+Creates a plugin with 10, 100 and 1000 commands in a temporary directory and
+times PluginManager.load_plugins-style discovery for:
+
+- scan: globbing the command directory (no manifest)
+- manifest: reading a warm command manifest (one open + one stat per plugin)
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_command_manifest.py [--plugins N] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from palm.command_manifest import CommandManifest
+from palm.plugin_manager import PluginManager
+from palm.plugins.base import BasePlugin
+
+COMMAND_SOURCE = """import click
+
+
+@click.command("{name}")
+def cli():
+    pass
+"""
+
+
+def make_plugins(root: Path, plugin_count: int, command_count: int) -> list:
+    plugins = []
+    per_plugin = max(command_count // plugin_count, 1)
+    for p in range(plugin_count):
+        command_dir = root / f"plugin_{p}" / "commands"
+        command_dir.mkdir(parents=True)
+        for c in range(per_plugin):
+            name = f"p{p}_c{c}"
+            (command_dir / f"cmd_{name}.py").write_text(
+                COMMAND_SOURCE.format(name=name)
+            )
+        # Age the directory so the manifest will trust its signature
+        old = time.time() - 60
+        os.utime(command_dir, (old, old))
+        plugins.append(BasePlugin(f"plugin_{p}", command_dir))
+    return plugins
+
+
+def load(plugins: list, manifest: CommandManifest) -> PluginManager:
+    pm = PluginManager(manifest)
+    for plugin in plugins:
+        pm.plugins[plugin.name] = plugin
+        pm.extend_plugin_command_mapping(plugin.name)
+    manifest.save()
+    return pm
+
+
+def time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+class ScanOnly(CommandManifest):
+    """Manifest stand-in which always scans, i.e. the pre-manifest behaviour"""
+
+    def commands(self, plugin):
+        return plugin.all_commands()
+
+    def save(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plugins", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'commands':>10} {'scan (ms)':>12} {'manifest (ms)':>14}")
+    for command_count in (10, 100, 1000):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["PALM_CACHE_DIR"] = str(Path(tmp, "cache"))
+            plugins = make_plugins(Path(tmp), args.plugins, command_count)
+            load(plugins, CommandManifest())  # warm the manifest
+
+            scan = time_ms(lambda: load(plugins, ScanOnly()), args.repeat)
+            warm = time_ms(lambda: load(plugins, CommandManifest()), args.repeat)
+            print(f"{command_count:>10} {scan:>12.3f} {warm:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark rebuilding the containerize Dockerfile after a one-line source edit
+
+For each ``palm containerize --mode``, a sample project is built once to warm
+the cache, then one line of its source is edited and the image rebuilt,
+``--repeat`` times. Prints the median rebuild time and the image size:
+
+- standard: copies the project, then installs dependencies (the old Dockerfile)
+- optimized: installs dependencies from the lockfile first, with a cache mount
+- multi-stage: optimized, with a slim runtime image
+
+Needs docker with BuildKit. Pass --project to use a copy of a real project's
+requirements.txt instead of the sample one.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_dockerfile_rebuild.py [--repeat N]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+
+from palm.containerizer import PythonContainerizer
+
+TEMPLATES = (
+    Path(__file__).parents[1]
+    / "palm"
+    / "plugins"
+    / "core"
+    / "templates"
+    / "containerize"
+)
+REQUIREMENTS = "requests==2.31.0\nflask==3.0.0\npandas==2.1.4\n"
+
+
+def make_project(root: Path, mode: str, requirements: str, python: str) -> None:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES), trim_blocks=True, lstrip_blocks=True
+    )
+    replacements = {
+        "project_name": "bench",
+        "package_manager": "pip3",
+        "python_version": python,
+        "mode": mode,
+    }
+    (root / "scripts").mkdir(parents=True)
+    (root / "Dockerfile").write_text(
+        env.get_template("Dockerfile.txt").render(replacements)
+    )
+    entrypoint = root / "scripts" / "entrypoint.sh"
+    entrypoint.write_text(env.get_template("entrypoint.sh.txt").render(replacements))
+    entrypoint.chmod(0o755)
+    (root / "requirements.txt").write_text(requirements)
+    (root / "app").mkdir()
+    (root / "app" / "main.py").write_text("VERSION = 0\n")
+
+
+def build(root: Path, tag: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        ["docker", "build", "-q", "-t", tag, "."],
+        cwd=root,
+        check=True,
+        env={**os.environ, "DOCKER_BUILDKIT": "1"},
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def image_size_mb(tag: str) -> float:
+    size = subprocess.run(
+        ["docker", "image", "inspect", "-f", "{{.Size}}", tag],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return int(size) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--project", type=Path, help="Project whose requirements to use"
+    )
+    parser.add_argument("--python", default="3.11")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if not shutil.which("docker"):
+        sys.exit("docker is needed to run this benchmark")
+
+    requirements = REQUIREMENTS
+    if args.project:
+        requirements = (args.project / "requirements.txt").read_text()
+
+    print(f"{'mode':>12} {'first build (s)':>16} {'rebuild (s)':>12} {'size (MB)':>10}")
+    for mode in PythonContainerizer.MODES:
+        tag = f"palm-bench-rebuild-{mode}"
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            make_project(root, mode, requirements, args.python)
+            first = build(root, tag)
+            samples = []
+            for i in range(1, args.repeat + 1):
+                (root / "app" / "main.py").write_text(f"VERSION = {i}\n")
+                samples.append(build(root, tag))
+        print(
+            f"{mode:>12} {first:>16.1f} {statistics.median(samples):>12.1f} "
+            f"{image_size_mb(tag):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
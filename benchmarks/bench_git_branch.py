@@ -0,0 +1,93 @@
+"""Benchmark protected-branch resolution: pygit2 vs reading HEAD directly
+
+Each sample runs in a fresh interpreter, so loading libgit2 is included, as it
+is on every palm invocation. Times:
+
+- pygit2: discover_repository + Repository(...).head.shorthand (the old path)
+- head: git_utils.find_git_dir + git_utils.read_head
+
+By default a synthetic monorepo is generated, with many packed branches and a
+deeply nested working directory. Pass --repo to measure a real checkout.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_git_branch.py [--repo PATH] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pygit2
+
+PYGIT2 = """
+import sys
+from pygit2 import Repository, discover_repository
+print(Repository(discover_repository(sys.argv[1])).head.shorthand)
+"""
+
+HEAD = """
+import sys
+from palm import git_utils
+print(git_utils.read_head(git_utils.find_git_dir(sys.argv[1])))
+"""
+
+
+def make_monorepo(root: Path, branches: int, depth: int) -> Path:
+    """Create a repository with many branches and a deep working directory"""
+    repo = pygit2.init_repository(str(root / "monorepo"))
+    signature = pygit2.Signature("palm", "palm@example.com")
+    builder = repo.TreeBuilder()
+    for i in range(200):
+        builder.insert(
+            f"file_{i}.txt", repo.create_blob(f"{i}\n"), pygit2.GIT_FILEMODE_BLOB
+        )
+    commit = repo.create_commit(
+        "HEAD", signature, signature, "initial", builder.write(), []
+    )
+    packed = [f"{commit} refs/heads/feature/branch-{i}" for i in range(branches)]
+    (Path(repo.path) / "packed-refs").write_text(
+        "# pack-refs with: peeled\n" + "\n".join(packed) + "\n"
+    )
+    workdir = Path(repo.workdir).joinpath(*[f"level_{i}" for i in range(depth)])
+    workdir.mkdir(parents=True)
+    return workdir
+
+
+def time_ms(script: str, cwd: Path, repeat: int) -> float:
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).parents[1])}
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", script, str(cwd)],
+            check=True,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", type=Path, help="Existing checkout to measure")
+    parser.add_argument("--branches", type=int, default=20000)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = args.repo or make_monorepo(Path(tmp), args.branches, args.depth)
+        baseline = time_ms("pass", cwd, args.repeat)
+        print(f"{'method':>8} {'total (ms)':>12} {'over python (ms)':>18}")
+        for name, script in (("pygit2", PYGIT2), ("head", HEAD)):
+            total = time_ms(script, cwd, args.repeat)
+            print(f"{name:>8} {total:>12.1f} {total - baseline:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
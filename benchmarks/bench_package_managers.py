@@ -0,0 +1,242 @@
+"""Benchmark image builds with each ``palm containerize --package-manager``
+
+Generates a fixture project whose dependencies are small wheels served from a
+local package index (a stand-in for a private index, so results don't depend
+on PyPI's latency), locks it with each package manager installed on the host,
+and builds the containerize Dockerfile for it. Prints the first build time and
+the median of ``--repeat`` rebuilds with ``--no-cache``. Rebuilds still reuse
+BuildKit cache mounts, like a rebuild after a lockfile change does.
+
+The images install the package managers themselves from PyPI. Managers which
+aren't installed on the host (to lock the fixture) are skipped, pip3 never is.
+
+Needs docker with BuildKit, and host networking so builds reach the index.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_package_managers.py [--mode optimized]
+"""
+import argparse
+import base64
+import csv
+import functools
+import hashlib
+import http.server
+import io
+import os
+import shutil
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+
+from palm.containerizer import PythonContainerizer
+
+TEMPLATES = (
+    Path(__file__).parents[1]
+    / "palm"
+    / "plugins"
+    / "core"
+    / "templates"
+    / "containerize"
+)
+PREFIX = "palmbench-dep"
+# Commands locking the fixture project on the host
+LOCK_COMMANDS = {
+    "uv": ["uv", "lock"],
+    "poetry": ["poetry", "lock"],
+    "pipenv": ["pipenv", "lock"],
+    "pdm": ["pdm", "lock"],
+}
+
+
+def wheel(name: str, requires: list, module_kb: int) -> bytes:
+    """A pure python wheel with one module of module_kb KB"""
+    module = name.replace("-", "_")
+    dist_info = f"{module}-1.0.dist-info"
+    files = {
+        f"{module}/__init__.py": ("DATA = %r\n" % ("x" * module_kb * 1024)).encode(),
+        f"{dist_info}/METADATA": (
+            "Metadata-Version: 2.1\n"
+            f"Name: {name}\nVersion: 1.0\n"
+            + "".join(f"Requires-Dist: {requirement}\n" for requirement in requires)
+        ).encode(),
+        f"{dist_info}/WHEEL": (
+            b"Wheel-Version: 1.0\nGenerator: palm-bench\n"
+            b"Root-Is-Purelib: true\nTag: py3-none-any\n"
+        ),
+    }
+    record = io.StringIO()
+    writer = csv.writer(record, lineterminator="\n")
+    for path, data in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=")
+        writer.writerow([path, f"sha256={digest.decode()}", len(data)])
+    writer.writerow([f"{dist_info}/RECORD", "", ""])
+    files[f"{dist_info}/RECORD"] = record.getvalue().encode()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path, data in files.items():
+            archive.writestr(path, data)
+    return buffer.getvalue()
+
+
+def make_index(root: Path, count: int, module_kb: int) -> None:
+    """A PEP 503 simple index of count packages, each requiring up to two more"""
+    simple = root / "simple"
+    links = []
+    for index in range(count):
+        name = f"{PREFIX}{index}"
+        children = [i for i in (2 * index + 1, 2 * index + 2) if i < count]
+        data = wheel(name, [f"{PREFIX}{i}" for i in children], module_kb)
+        filename = f"{name.replace('-', '_')}-1.0-py3-none-any.whl"
+        digest = hashlib.sha256(data).hexdigest()
+        (simple / name).mkdir(parents=True)
+        (simple / name / filename).write_bytes(data)
+        (simple / name / "index.html").write_text(
+            f'<a href="{filename}#sha256={digest}">{filename}</a>\n'
+        )
+        links.append(f'<a href="{name}/">{name}</a>')
+    (simple / "index.html").write_text("\n".join(links) + "\n")
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve(root: Path) -> socketserver.TCPServer:
+    handler = functools.partial(QuietHandler, directory=str(root))
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_project(root: Path, package_manager: str, index_url: str) -> None:
+    """Project files declaring the fixture dependency for a package manager"""
+    dependency = f"{PREFIX}0"
+    (root / "app").mkdir(parents=True)
+    (root / "app" / "main.py").write_text("VERSION = 0\n")
+    if package_manager == "pip3":
+        (root / "requirements.txt").write_text(
+            f"--extra-index-url {index_url}\n{dependency}\n"
+        )
+    elif package_manager == "pipenv":
+        (root / "Pipfile").write_text(
+            '[[source]]\nname = "pypi"\nurl = "https://pypi.org/simple"\n'
+            "verify_ssl = true\n\n"
+            f'[[source]]\nname = "bench"\nurl = "{index_url}"\nverify_ssl = false\n\n'
+            f'[packages]\n{dependency} = {{version = "*", index = "bench"}}\n'
+        )
+    elif package_manager == "poetry":
+        (root / "pyproject.toml").write_text(
+            '[tool.poetry]\nname = "bench"\nversion = "0.1.0"\n'
+            'description = ""\nauthors = ["bench <bench@example.com>"]\n'
+            "package-mode = false\n\n"
+            '[tool.poetry.dependencies]\npython = "^3.8"\n'
+            f'{dependency} = {{version = "*", source = "bench"}}\n\n'
+            f'[[tool.poetry.source]]\nname = "bench"\nurl = "{index_url}"\n'
+            'priority = "explicit"\n'
+        )
+    else:
+        source = (
+            f'[[tool.pdm.source]]\nname = "bench"\nurl = "{index_url}"\n'
+            if package_manager == "pdm"
+            else f'[[tool.uv.index]]\nname = "bench"\nurl = "{index_url}"\n'
+        )
+        (root / "pyproject.toml").write_text(
+            '[project]\nname = "bench"\nversion = "0.1.0"\n'
+            f'requires-python = ">=3.8"\ndependencies = ["{dependency}"]\n\n' + source
+        )
+
+
+def render(
+    root: Path, package_manager: str, mode: str, python: str, index_url: str
+) -> None:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES), trim_blocks=True, lstrip_blocks=True
+    )
+    replacements = {
+        "project_name": "bench",
+        "package_manager": package_manager,
+        "python_version": python,
+        "mode": mode,
+        "lockfile": PythonContainerizer.LOCKFILES[package_manager],
+    }
+    (root / "scripts").mkdir()
+    entrypoint = root / "scripts" / "entrypoint.sh"
+    entrypoint.write_text(env.get_template("entrypoint.sh.txt").render(replacements))
+    entrypoint.chmod(0o755)
+    # Exported lockfiles don't always name their index
+    lines = env.get_template("Dockerfile.txt").render(replacements).splitlines()
+    first_from = next(i for i, line in enumerate(lines) if line.startswith("FROM "))
+    lines.insert(
+        first_from + 1,
+        f"ENV PIP_EXTRA_INDEX_URL={index_url} UV_EXTRA_INDEX_URL={index_url}",
+    )
+    (root / "Dockerfile").write_text("\n".join(lines) + "\n")
+
+
+def build(root: Path, tag: str, no_cache: bool) -> float:
+    command = ["docker", "build", "-q", "--network", "host", "-t", tag, "."]
+    if no_cache:
+        command.insert(2, "--no-cache")
+    start = time.perf_counter()
+    subprocess.run(
+        command,
+        cwd=root,
+        check=True,
+        env={**os.environ, "DOCKER_BUILDKIT": "1"},
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--mode", choices=PythonContainerizer.MODES, default="optimized"
+    )
+    parser.add_argument("--python", default="3.11")
+    parser.add_argument("--packages", type=int, default=60)
+    parser.add_argument("--module-kb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if not shutil.which("docker"):
+        sys.exit("docker is needed to run this benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_index(Path(tmp) / "index", args.packages, args.module_kb)
+        server = serve(Path(tmp) / "index")
+        index_url = f"http://127.0.0.1:{server.server_address[1]}/simple"
+
+        print(f"{'package manager':>16} {'first build (s)':>16} {'rebuild (s)':>12}")
+        for package_manager in PythonContainerizer.PACKAGE_MANAGERS:
+            lock = LOCK_COMMANDS.get(package_manager)
+            if lock and not shutil.which(lock[0]):
+                print(f"{package_manager:>16} {'skipped, not installed':>29}")
+                continue
+            root = Path(tmp) / package_manager
+            write_project(root, package_manager, index_url)
+            if lock:
+                subprocess.run(lock, cwd=root, check=True, capture_output=True)
+            render(root, package_manager, args.mode, args.python, index_url)
+
+            tag = f"palm-bench-{package_manager}"
+            first = build(root, tag, no_cache=False)
+            samples = [build(root, tag, no_cache=True) for _ in range(args.repeat)]
+            print(
+                f"{package_manager:>16} {first:>16.1f} "
+                f"{statistics.median(samples):>12.1f}"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from palm.daemon_client import main
+
+main()
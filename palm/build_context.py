@@ -0,0 +1,248 @@
+"""Keep docker build contexts small
+
+docker uploads the whole build context, minus what .dockerignore excludes,
+before every build. ``palm containerize`` generates a .dockerignore from the
+defaults below, the virtualenvs and large untracked files it finds in the
+project, and the project's .gitignore files. ``palm containerize --analyze``
+reports what the current context holds per top-level entry.
+
+The project is walked once with ``os.scandir``, keeping only running totals
+per top-level entry and the findings, never a list of every file.
+"""
+import os
+import posixpath
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from palm.dockerignore import DockerIgnore
+
+DEFAULT_LARGE_FILE_MB = 10
+VCS_DIRS = (".git", ".hg", ".svn")
+DEFAULT_PATTERNS = [
+    "# Version control",
+    *VCS_DIRS,
+    "# Caches",
+    "**/__pycache__",
+    "**/*.py[cod]",
+    "**/.pytest_cache",
+    "**/.mypy_cache",
+    "**/.ruff_cache",
+    ".tox",
+    ".nox",
+    ".coverage",
+    "htmlcov",
+    ".palm/cache",
+    "# Virtualenvs and packages",
+    ".venv",
+    "venv",
+    "**/node_modules",
+    "dist",
+    "**/*.egg-info",
+    "# Local settings",
+    ".env",
+    ".idea",
+    ".vscode",
+]
+# Files the generated Dockerfile copies, which must stay in the context
+REQUIRED = (
+    "Dockerfile",
+    "scripts/entrypoint.sh",
+    "requirements.txt",
+    "pyproject.toml",
+    "poetry.lock",
+    "uv.lock",
+    "Pipfile",
+    "Pipfile.lock",
+    "pdm.lock",
+)
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def gitignore_patterns(path: Path, base: str = "") -> List[str]:
+    """Translate a .gitignore file to .dockerignore patterns
+
+    Patterns without a slash match at any depth in git, so they get a
+    ``**/`` prefix. Directory-only patterns (``build/``) also match files of
+    the same name, which .dockerignore can't tell apart.
+
+    Args:
+        path (Path): The .gitignore file
+        base (str): Its directory, relative to the build context
+
+    Returns:
+        List[str]: Patterns relative to the build context, empty if the file
+        can't be read
+    """
+    try:
+        lines = path.read_text().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    patterns = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        line = line.rstrip("/")
+        if not line:
+            continue
+        if "/" not in line and not line.startswith("**"):
+            line = f"**/{line}"
+        pattern = posixpath.join(base, line.lstrip("/")) if base else line.lstrip("/")
+        patterns.append(("!" if negate else "") + pattern)
+    return patterns
+
+
+class ContextScan:
+    """One streaming pass over a build context
+
+    Args:
+        root (Path): The build context directory
+        ignore (DockerIgnore): Rules for what is left out of the context
+        tracked (Optional[Set[str]]): Files tracked by git, relative to root.
+            Without them every large file counts as untracked
+        large_file_mb (int): Size from which untracked files are reported
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ignore: DockerIgnore,
+        tracked: Optional[Set[str]] = None,
+        large_file_mb: int = DEFAULT_LARGE_FILE_MB,
+    ) -> None:
+        self.root = root
+        self.ignore = ignore
+        self.tracked = tracked
+        self.large_file_bytes = large_file_mb * 1024 * 1024
+        # Top-level entry: [bytes, files] in the context
+        self.sizes: Dict[str, List[int]] = {}
+        self.vcs_dirs: List[str] = []
+        self.virtualenvs: List[str] = []
+        self.node_modules: List[str] = []
+        self.large_files: List[Tuple[str, int]] = []
+        self.gitignores: List[str] = []
+
+    def run(self) -> "ContextScan":
+        stack = [""]
+        while stack:
+            relative_dir = stack.pop()
+            try:
+                iterator = os.scandir(self.root / relative_dir)
+            except OSError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    relative = (
+                        f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    )
+                    excluded = self.ignore.is_excluded(relative)
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if excluded and not self.ignore.has_exceptions:
+                            continue
+                        if not excluded:
+                            self._visit_dir(entry, relative)
+                        stack.append(relative)
+                    elif not excluded:
+                        self._visit_file(entry, relative)
+        return self
+
+    def _visit_dir(self, entry: os.DirEntry, relative: str) -> None:
+        if entry.name in VCS_DIRS:
+            self.vcs_dirs.append(relative)
+        elif entry.name == "node_modules":
+            self.node_modules.append(relative)
+        elif os.path.exists(os.path.join(entry.path, "pyvenv.cfg")):
+            self.virtualenvs.append(relative)
+
+    def _visit_file(self, entry: os.DirEntry, relative: str) -> None:
+        try:
+            size = entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            return
+        top = relative.split("/", 1)[0]
+        if top != relative:
+            top += "/"
+        totals = self.sizes.setdefault(top, [0, 0])
+        totals[0] += size
+        totals[1] += 1
+        if entry.name == ".gitignore":
+            self.gitignores.append(relative)
+        if size >= self.large_file_bytes and (
+            self.tracked is None or relative not in self.tracked
+        ):
+            self.large_files.append((relative, size))
+
+    @property
+    def total(self) -> int:
+        return sum(size for size, _ in self.sizes.values())
+
+    def findings(self) -> List[Tuple[str, str]]:
+        """Paths in the context which probably shouldn't be
+
+        Returns:
+            List[Tuple[str, str]]: (path, reason), directories end with /
+        """
+        findings = [(f"{path}/", "version control") for path in self.vcs_dirs]
+        findings += [(f"{path}/", "virtualenv") for path in self.virtualenvs]
+        findings += [(f"{path}/", "node modules") for path in self.node_modules]
+        findings += [
+            (path, f"{format_size(size)}, untracked")
+            for path, size in sorted(self.large_files)
+        ]
+        return findings
+
+
+def generate_dockerignore(
+    root: Path,
+    tracked: Optional[Set[str]] = None,
+    large_file_mb: int = DEFAULT_LARGE_FILE_MB,
+) -> str:
+    """Content of a .dockerignore tuned for a project
+
+    Args:
+        root (Path): The project, which is the build context
+        tracked (Optional[Set[str]]): Files tracked by git, relative to root
+        large_file_mb (int): Size from which untracked files are excluded
+
+    Returns:
+        str: The file's content
+    """
+    gitignore = gitignore_patterns(root / ".gitignore")
+    scan = ContextScan(
+        root, DockerIgnore(DEFAULT_PATTERNS + gitignore), tracked, large_file_mb
+    ).run()
+    for path in sorted(scan.gitignores):
+        if path != ".gitignore":
+            gitignore += gitignore_patterns(root / path, posixpath.dirname(path))
+
+    lines = ["# Generated by palm containerize", *DEFAULT_PATTERNS]
+    if scan.virtualenvs:
+        lines += ["# Virtualenvs found in the project", *sorted(scan.virtualenvs)]
+    if scan.large_files:
+        lines.append(f"# Untracked files over {large_file_mb} MB")
+        lines += sorted(path for path, _ in scan.large_files)
+    if gitignore:
+        lines += ["# From .gitignore", *gitignore]
+    ignore = DockerIgnore(lines)
+    required = [
+        path for path in REQUIRED if (root / path).exists() and ignore.is_excluded(path)
+    ]
+    if required:
+        lines += ["# Needed by the Dockerfile", *(f"!{path}" for path in required)]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,289 @@
+"""Skip ``palm build`` when nothing the image is built from has changed
+
+The fingerprint of a build is a hash of the Dockerfile, the build args and
+target, and the content of the files the Dockerfile copies from the build
+context (respecting .dockerignore), plus any lockfiles and requirements. palm
+labels the image with it, and only builds again when the image's label
+doesn't match the current fingerprint.
+
+Builds run with BuildKit. If the buildx builder can export its cache (any
+driver but the default ``docker`` one, which keeps its cache in the daemon),
+the cache is kept in a local directory in the palm cache.
+"""
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+
+from palm import cache
+from palm.compose_spec import ComposeSpec, compose_files
+from palm.dockerignore import DockerIgnore, translate
+from palm.palm_config import PalmConfig
+from palm.result_cache import ResultCache
+from palm.utils import run_on_host
+
+LABEL = "com.palmetto.palm.build-fingerprint"
+# Included in the fingerprint even if the Dockerfile doesn't copy them
+LOCKFILES = (
+    "requirements*.txt",
+    "requirements/*.txt",
+    "*.lock",
+    "Pipfile",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+)
+LOCKFILE_PATTERN = re.compile(
+    "|".join(translate(pattern).pattern for pattern in LOCKFILES)
+)
+HEREDOC = re.compile(r"<<-?([\"']?)(\w+)\1")
+
+
+def instructions(dockerfile: str) -> List[List[str]]:
+    """Split a Dockerfile into instructions, each as its words
+
+    Joins continuation lines and drops comments and heredoc bodies.
+    """
+    escape = "\\"
+    lines = dockerfile.splitlines()
+    # Parser directives, like escape, come first
+    for line in lines:
+        match = re.match(r"#\s*(\w+)\s*=\s*(\S+)", line)
+        if not match:
+            break
+        if match.group(1).lower() == "escape":
+            escape = match.group(2)
+
+    result, current, heredoc = [], "", None
+    for line in lines:
+        if heredoc is not None:
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        stripped = line.strip()
+        if stripped.startswith("#") or (not stripped and current):
+            continue
+        if stripped.endswith(escape):
+            current += stripped[:-1] + " "
+            continue
+        current += stripped
+        if current:
+            match = HEREDOC.search(current)
+            if match:
+                heredoc = match.group(2)
+            result.append(current.split())
+        current = ""
+    if current:
+        result.append(current.split())
+    return result
+
+
+def copied_sources(dockerfile: str) -> Optional[List[str]]:
+    """Paths in the build context which the Dockerfile copies or bind mounts
+
+    Args:
+        dockerfile (str): The Dockerfile's content
+
+    Returns:
+        Optional[List[str]]: Source patterns relative to the context, or None
+        if they can't be known (e.g. they use variables), so the whole
+        context counts
+    """
+    sources = []
+    for words in instructions(dockerfile):
+        instruction, args = words[0].upper(), words[1:]
+        if instruction == "RUN":
+            for arg in args:
+                if not arg.startswith("--mount="):
+                    continue
+                options = dict(
+                    option.split("=", 1)
+                    for option in arg[len("--mount=") :].split(",")
+                    if "=" in option
+                )
+                if options.get("type") == "bind" and "from" not in options:
+                    sources.append(options.get("source", options.get("src", ".")))
+            continue
+        if instruction not in ("COPY", "ADD"):
+            continue
+        flags = [arg for arg in args if arg.startswith("--")]
+        if any(flag.startswith("--from=") for flag in flags):
+            continue
+        args = args[len(flags) :]
+        if args and args[0].startswith("["):
+            try:
+                args = json.loads(" ".join(args))
+            except ValueError:
+                return None
+        for source in args[:-1]:
+            if source.startswith("<<") or re.match(r"^[a-z]+://|^git@", source):
+                continue
+            if "$" in source:
+                return None
+            sources.append(source)
+    return sources
+
+
+class BuildFingerprint:
+    """Fingerprint of the project service's image build
+
+    Args:
+        palm_config (PalmConfig): The project's config
+    """
+
+    DIRECTORY = "build_fingerprints"
+    VERSION = 1
+
+    def __init__(self, palm_config: PalmConfig) -> None:
+        self.project_root = palm_config.project_root
+        self.service_name = palm_config.image_name
+        self.service = ComposeSpec(palm_config).service()
+        self.image = self.service["image"]
+        self.build: Dict = self.service.get("build") or {}
+        digest = hashlib.sha1(
+            f"{self.project_root}\0{palm_config.image_name}".encode()
+        ).hexdigest()
+        self.name = f"{self.DIRECTORY}/{digest}.json"
+
+    @property
+    def context(self) -> Path:
+        return self.project_root / self.build.get("context", ".")
+
+    @property
+    def dockerfile(self) -> Path:
+        return self.context / self.build.get("dockerfile", "Dockerfile")
+
+    def inputs(self) -> dict:
+        """Everything the build depends on, with content hashes of files
+
+        Returns:
+            dict: dockerfile, args, target and files
+        """
+        dockerfile = self.build.get("dockerfile_inline")
+        if dockerfile is None:
+            try:
+                dockerfile = self.dockerfile.read_text()
+            except OSError:
+                dockerfile = ""
+        ignore = DockerIgnore.load(self.context, self.dockerfile)
+        files = list(ignore.walk(self.context))
+
+        sources = copied_sources(dockerfile)
+        if sources is not None:
+            patterns = [
+                translate(os.path.normpath(source).lstrip("/"))
+                for source in sources
+                if os.path.normpath(source).lstrip("/") not in ("", ".")
+            ]
+            if len(patterns) == len(sources):
+                files = [
+                    f
+                    for f in files
+                    if LOCKFILE_PATTERN.match(f)
+                    or any(pattern.match(f) for pattern in patterns)
+                ]
+        return {
+            "version": self.VERSION,
+            "dockerfile": hashlib.sha256(dockerfile.encode()).hexdigest(),
+            "args": self.build.get("args") or {},
+            "target": self.build.get("target"),
+            "files": ResultCache(self.context).hash_files(sorted(files)),
+        }
+
+    @staticmethod
+    def fingerprint(inputs: dict) -> str:
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def image_fingerprint(self) -> Optional[str]:
+        """The fingerprint label of the current image, None if there is no image"""
+        from palm.docker_api import DockerAPIError, DockerClient
+
+        try:
+            image = DockerClient().inspect_image(self.image)
+        except DockerAPIError:
+            return None
+        if image is None:
+            return None
+        return ((image.get("Config") or {}).get("Labels") or {}).get(LABEL)
+
+    def explain(self, inputs: dict, image_fingerprint: Optional[str]) -> List[str]:
+        """Why the image doesn't match the current inputs
+
+        Args:
+            inputs (dict): Current inputs, from inputs()
+            image_fingerprint (Optional[str]): The image's label
+
+        Returns:
+            List[str]: One line per changed input
+        """
+        if image_fingerprint is None:
+            return [f"there is no image {self.image} built by palm"]
+        previous = cache.read_json(self.name)
+        if not isinstance(previous, dict) or previous.get("fingerprint") != (
+            image_fingerprint
+        ):
+            return ["the image was built from inputs palm has no record of"]
+        previous = previous["inputs"]
+        reasons = []
+        for name in ("version", "dockerfile", "args", "target"):
+            if previous.get(name) != inputs[name]:
+                reasons.append(f"{name} changed")
+        old, new = previous.get("files", {}), inputs["files"]
+        for path in sorted(set(old) | set(new)):
+            if path not in old:
+                reasons.append(f"added {path}")
+            elif path not in new:
+                reasons.append(f"removed {path}")
+            elif old[path] != new[path]:
+                reasons.append(f"changed {path}")
+        return reasons
+
+    def cache_directory(self) -> Optional[Path]:
+        """Local BuildKit cache directory, if the builder can export its cache"""
+        code, stdout, _ = run_on_host("docker buildx inspect", False, True)
+        match = re.search(r"^Driver:\s*(\S+)", stdout or "", re.MULTILINE)
+        if code != 0 or not match or match.group(1) == "docker":
+            return None
+        digest = hashlib.sha1(str(self.project_root).encode()).hexdigest()
+        return cache.cache_dir() / "buildkit" / digest
+
+    def run_build(self, fingerprint: str) -> None:
+        """Build with docker compose and BuildKit, labelling the image
+
+        Raises:
+            subprocess.CalledProcessError: If the build fails
+        """
+        build: dict = {"labels": {LABEL: fingerprint}}
+        cache_directory = self.cache_directory()
+        if cache_directory is not None:
+            if (cache_directory / "index.json").exists():
+                build["cache_from"] = [f"type=local,src={cache_directory}"]
+            build["cache_to"] = [f"type=local,dest={cache_directory},mode=max"]
+        override = cache.project_cache_dir(self.project_root) / "build-override.json"
+        override.write_text(
+            json.dumps({"services": {self.service_name: {"build": build}}}, indent=2)
+        )
+
+        command = ["docker", "compose"]
+        for path in compose_files(self.project_root) + [override]:
+            command += ["-f", str(path)]
+        command.append("build")
+        click.echo("Running " + " ".join(shlex.quote(arg) for arg in command))
+        subprocess.run(
+            command,
+            check=True,
+            cwd=self.project_root,
+            env={**os.environ, "DOCKER_BUILDKIT": "1", "COMPOSE_DOCKER_CLI_BUILD": "1"},
+        )
+
+    def save(self, inputs: dict) -> None:
+        """Record the inputs of a successful build, for explain()"""
+        cache.write_json(
+            self.name, {"fingerprint": self.fingerprint(inputs), "inputs": inputs}
+        )
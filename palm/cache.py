@@ -0,0 +1,157 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+# A file modified within this window may be modified again without its
+# mtime changing (filesystem timestamps are coarse), so a stat signature
+# taken inside it can't be trusted to detect the next change.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def cache_dir() -> Path:
+    """Get the user cache directory for palm
+
+    Honours PALM_CACHE_DIR, then XDG_CACHE_HOME, falling back to ~/.cache/palm
+
+    Returns:
+        Path: Path to the palm cache directory (may not exist yet)
+    """
+    override = os.getenv("PALM_CACHE_DIR")
+    if override:
+        return Path(override)
+    xdg_cache = os.getenv("XDG_CACHE_HOME")
+    base = Path(xdg_cache) if xdg_cache else Path.home() / ".cache"
+    return base / "palm"
+
+
+def project_cache_dir(project_root: Path) -> Path:
+    """Get a project's own cache directory, .palm/cache, creating it if needed
+
+    Used for files shared with the project's containers, which see the project
+    directory but not the user cache directory. Git ignores its contents.
+
+    Args:
+        project_root (Path): The project's root directory
+
+    Returns:
+        Path: Path to the project cache directory
+    """
+    directory = project_root / ".palm" / "cache"
+    directory.mkdir(parents=True, exist_ok=True)
+    gitignore = directory / ".gitignore"
+    if not gitignore.exists():
+        gitignore.write_text("*\n")
+    return directory
+
+
+def stat_signature(path: Union[str, Path]) -> Optional[List[int]]:
+    """Cheap change-detection signature for a file or directory
+
+    Args:
+        path (Union[str, Path]): Path to stat
+
+    Returns:
+        Optional[List[int]]: [mtime_ns, inode, size], or None if the path does not exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_ino, st.st_size]
+
+
+def is_racy(signature: Optional[List[int]]) -> bool:
+    """Check whether a signature is too recent to be trusted
+
+    Args:
+        signature (Optional[List[int]]): signature from stat_signature
+
+    Returns:
+        bool: True if the path was modified within RACY_WINDOW_NS
+    """
+    if signature is None:
+        return False
+    return time.time_ns() - signature[0] < RACY_WINDOW_NS
+
+
+def read_json(name: str) -> Any:
+    """Read a JSON document from the cache directory
+
+    Args:
+        name (str): File name, relative to the cache directory
+
+    Returns:
+        Any: The decoded document, or None if it is missing or unreadable
+    """
+    try:
+        with open(cache_dir() / name) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(name: str, data: Any) -> None:
+    """Atomically write a JSON document to the cache directory
+
+    Failures are ignored, the cache is always optional.
+
+    Args:
+        name (str): File name, relative to the cache directory
+        data (Any): JSON serializable data
+    """
+    write_bytes(name, json.dumps(data).encode())
+
+
+def read_bytes(name: str) -> Optional[bytes]:
+    """Read a binary file from the cache directory
+
+    Args:
+        name (str): File name, relative to the cache directory
+
+    Returns:
+        Optional[bytes]: The file contents, or None if it is missing or unreadable
+    """
+    try:
+        return (cache_dir() / name).read_bytes()
+    except OSError:
+        return None
+
+
+def write_bytes(name: str, data: bytes) -> None:
+    """Atomically write a binary file to the cache directory
+
+    Failures are ignored, the cache is always optional.
+
+    Args:
+        name (str): File name, relative to the cache directory
+        data (bytes): File contents
+    """
+    path = cache_dir() / name
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def remove(name: str) -> bool:
+    """Remove a file from the cache directory
+
+    Args:
+        name (str): File name, relative to the cache directory
+
+    Returns:
+        bool: True if a file was removed
+    """
+    try:
+        (cache_dir() / name).unlink()
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,228 @@
+"""Named docker volume for caches that live outside the project tree
+
+Commands run in a new container each time (``--rm``), so pip's, poetry's,
+pre-commit's and mypy's caches under ``~/.cache`` are lost after every
+command. palm mounts a named volume at ``/cache`` in its containers and points
+those tools at it, so they are warm from the second run onward.
+
+Projects created with ``palm containerize`` declare the volume in their
+compose file. For other projects palm adds it when it runs a command, unless
+the service already mounts a cache of its own. ``cache_volume: false`` in
+.palm/config.yaml turns this off, and ``palm cache prune`` keeps the volume
+under ``cache_volume.max_size_mb``.
+"""
+import shlex
+from typing import Dict, List, Optional
+
+import click
+
+from palm.compose_spec import ComposeSpec, compose_files, service_environment
+from palm.palm_config import PalmConfig
+from palm.utils import run_on_host
+
+TARGET = "/cache"
+VOLUME = "palm-cache"
+DEFAULT_MAX_SIZE_MB = 4096
+ENVIRONMENT = {
+    "XDG_CACHE_HOME": TARGET,
+    "PIP_CACHE_DIR": f"{TARGET}/pip",
+    "POETRY_CACHE_DIR": f"{TARGET}/pypoetry",
+    "PIPENV_CACHE_DIR": f"{TARGET}/pipenv",
+    "UV_CACHE_DIR": f"{TARGET}/uv",
+    "PRE_COMMIT_HOME": f"{TARGET}/pre-commit",
+    "MYPY_CACHE_DIR": f"{TARGET}/mypy",
+}
+
+# Run in a container with the volume mounted: removes the least recently used
+# files until the cache is under max_bytes, then any directories left empty
+PRUNE_SCRIPT = """\
+import os, sys
+root, max_bytes = sys.argv[1], int(sys.argv[2])
+files, total = [], 0
+for dirpath, _, names in os.walk(root):
+    for name in names:
+        path = os.path.join(dirpath, name)
+        try:
+            stat = os.lstat(path)
+        except OSError:
+            continue
+        files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+        total += stat.st_size
+size, freed = total, 0
+for _, file_size, path in sorted(files):
+    if size <= max_bytes:
+        break
+    try:
+        os.remove(path)
+    except OSError:
+        continue
+    size -= file_size
+    freed += file_size
+for dirpath, _, _ in sorted(os.walk(root), reverse=True):
+    if dirpath != root:
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass
+print(total, freed)
+"""
+
+
+def has_own_cache(service: dict) -> bool:
+    """Whether a compose service already mounts a cache or sets XDG_CACHE_HOME
+
+    Args:
+        service (dict): The resolved compose service
+
+    Returns:
+        bool: True if palm shouldn't add its cache volume
+    """
+    environment = service.get("environment") or {}
+    if isinstance(environment, list):
+        environment = dict(item.partition("=")[::2] for item in environment)
+    if "XDG_CACHE_HOME" in environment:
+        return True
+    for volume in service.get("volumes") or []:
+        if isinstance(volume, dict):
+            target = volume.get("target", "")
+        else:
+            target = volume.split(":")[1] if ":" in volume else volume
+        target = target.rstrip("/")
+        if target == TARGET or target.endswith("/.cache"):
+            return True
+    return False
+
+
+class CacheVolume:
+    """The cache volume of a project's compose service
+
+    Args:
+        palm_config (PalmConfig): The project's config
+    """
+
+    def __init__(self, palm_config: PalmConfig) -> None:
+        self.palm = palm_config
+        settings = palm_config.config.get("cache_volume", {})
+        if settings is False:
+            settings = {"enabled": False}
+        settings = settings or {}
+        self.enabled = bool(settings.get("enabled", True))
+        self.max_size_mb = int(settings.get("max_size_mb") or DEFAULT_MAX_SIZE_MB)
+        self.spec = ComposeSpec(palm_config)
+        self._entry = None
+
+    def entry(self) -> Optional[dict]:
+        """The resolved compose service entry, None if it can't be resolved"""
+        if self._entry is None and compose_files(self.palm.project_root):
+            try:
+                self._entry = self.spec.load() or self.spec.resolve()
+            except (click.ClickException, ValueError):
+                return None
+        return self._entry
+
+    @property
+    def name(self) -> Optional[str]:
+        """Volume name, as compose names the volume declared by palm containerize"""
+        entry = self.entry()
+        return f"{entry['project']}_{VOLUME}" if entry else None
+
+    def missing(self, service: dict) -> Dict[str, str]:
+        """Cache variables the service doesn't set itself"""
+        environment = service_environment(service, self.palm.project_root)
+        return {
+            key: value for key, value in ENVIRONMENT.items() if key not in environment
+        }
+
+    def wanted(self) -> bool:
+        """Whether palm should add the volume to the project's containers"""
+        entry = self.entry()
+        return (
+            self.enabled and entry is not None and not has_own_cache(entry["service"])
+        )
+
+    def apply(self, service: dict) -> dict:
+        """The service with the cache volume and its variables added
+
+        Args:
+            service (dict): The resolved compose service
+
+        Returns:
+            dict: A copy of the service, or the service itself if not wanted
+        """
+        if not self.wanted():
+            return service
+        environment = service.get("environment") or {}
+        if isinstance(environment, list):
+            environment = dict(item.partition("=")[::2] for item in environment)
+        volume = {"type": "volume", "source": self.name, "target": TARGET}
+        return {
+            **service,
+            "volumes": list(service.get("volumes") or []) + [volume],
+            "environment": {**self.missing(service), **environment},
+        }
+
+    def compose_flags(self) -> List[str]:
+        """``docker compose run`` flags mounting the volume and setting its variables"""
+        if not self.wanted():
+            return []
+        service = self.entry()["service"]
+        flags = [f"-v {self.name}:{TARGET}"]
+        for key, value in self.missing(service).items():
+            flags.append(f"-e {key}={value}")
+        return flags
+
+    def prune(self, max_size_mb: Optional[int] = None) -> Optional[tuple]:
+        """Remove the least recently used files until the volume fits its limit
+
+        Runs a short-lived container of the service's image with the volume
+        mounted.
+
+        Args:
+            max_size_mb (Optional[int]): Limit, defaults to cache_volume.max_size_mb
+
+        Returns:
+            Optional[tuple]: (size, freed) in bytes, None if there is no volume
+        """
+        if self.name is None:
+            return None
+        code, _, _ = run_on_host(
+            f"docker volume inspect {shlex.quote(self.name)}", False, True
+        )
+        if code != 0:
+            return None
+        max_bytes = (max_size_mb or self.max_size_mb) * 1024 * 1024
+        image = self.entry()["service"]["image"]
+        cmd = [
+            "docker",
+            "run",
+            "--rm",
+            "--entrypoint",
+            "python3",
+            "-v",
+            f"{self.name}:{TARGET}",
+            image,
+            "-c",
+            PRUNE_SCRIPT,
+            TARGET,
+            str(max_bytes),
+        ]
+        code, stdout, stderr = run_on_host(
+            " ".join(shlex.quote(arg) for arg in cmd), False, True
+        )
+        if code != 0:
+            raise click.ClickException(f"Failed to prune {self.name}: {stderr}")
+        size, freed = (int(value) for value in stdout.split()[-2:])
+        return size, freed
+
+    def remove(self) -> bool:
+        """Remove the volume
+
+        Returns:
+            bool: True if a volume was removed
+        """
+        if self.name is None:
+            return False
+        code, _, _ = run_on_host(
+            f"docker volume rm {shlex.quote(self.name)}", False, True
+        )
+        return code == 0
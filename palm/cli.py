@@ -1,20 +1,31 @@
-import importlib
 import os
+import shutil
 import sys
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, FrozenSet, List, Optional
 
 import click
-import pkg_resources
 
+from .command_loader import command_loader
 from .environment import Environment
+from .help_index import ALL_REQUIREMENTS, HelpIndex
 from .palm_config import PalmConfig
 from .plugin_manager import PluginManager
+from .timings import timings
 from .utils import cmd_name_from_file, is_cmd_file, run_on_host
 
 CONTEXT_SETTINGS = dict(auto_envvar_prefix="PALM")
 
 plugin_manager_instance = PluginManager()
-palm_config = PalmConfig()
+with timings.phase("config"):
+    palm_config = PalmConfig()
+
+
+def ensure_valid_branch(config: PalmConfig) -> None:
+    """Exit if the project is on one of its protected branches"""
+    if not config.is_valid_branch():
+        msg = f"You are currently on protected branch {config.branch}. For your safety Palm will not run!"
+        click.secho(msg, fg="red")
+        sys.exit(1)
 
 
 class PalmCLI(click.MultiCommand):
@@ -28,13 +39,13 @@ class PalmCLI(click.MultiCommand):
         result_callback: Optional[Callable[..., Any]] = None,
         **attrs: Any,
     ) -> None:
-        if not palm_config.is_valid_branch():
-            msg = f"You are currently on protected branch {palm_config.branch}. For your safety Palm will not run!"
-            click.secho(msg, fg="red")
-            sys.exit(1)
         self.palm = palm_config
         self.plugin_manager = plugin_manager_instance
-        self.plugin_manager.load_plugins(self.palm.plugins)
+        with timings.phase("plugins"):
+            self.plugin_manager.load_plugins(self.palm.plugins)
+        self.help_index = HelpIndex()
+        self.command_loader = command_loader
+        self.timings = timings
 
         super().__init__(
             name=name,
@@ -66,16 +77,20 @@ class PalmCLI(click.MultiCommand):
         """
         Formats the list of commands for the help page
         Group commands by plugin
+
+        Help entries are read statically from the command modules where
+        possible, commands are only imported when that is ambiguous.
         """
         commands = []
         for subcommand in self.list_commands(ctx):
-            cmd = self.get_command(ctx, subcommand)
+            cmd = self.help_command(ctx, subcommand)
             # What is this, the tool lied about a command.  Ignore it
             if cmd is None:
                 continue
             if cmd.hidden:
                 continue
             commands.append((subcommand, cmd))
+        self.help_index.save()
 
         if len(commands):
             # allow for 3 times the default spacing
@@ -100,14 +115,29 @@ class PalmCLI(click.MultiCommand):
                 with formatter.section(plugin_name.title()):
                     formatter.write_dl(cmds)
 
+    def help_command(self, ctx, cmd_name: str) -> Optional[click.Command]:
+        """Get a command for the help page, without importing it if possible
+
+        Args:
+            cmd_name (str): Name of the palm command
+
+        Returns:
+            Optional[click.Command]: A help-only command from the help index,
+            or the real command if it could not be read statically
+        """
+        path = self.plugin_manager.command_path(cmd_name)
+        cmd = self.help_index.command(path) if path else None
+        return cmd or self.get_command(ctx, cmd_name)
+
     def get_command(self, ctx, cmd_name: str) -> click.Command:
         try:
-            if self.plugin_manager.is_plugin_command(cmd_name):
-                spec = self.plugin_manager.command_spec(cmd_name)
-            else:
+            if not self.plugin_manager.is_plugin_command(cmd_name):
                 raise FileNotFoundError
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
+            mod = self.command_loader.load(
+                self.plugin_manager.plugin_command_dict[cmd_name],
+                cmd_name,
+                self.plugin_manager.command_path(cmd_name),
+            )
         except ImportError as error:
             click.secho(f"Import error: {error}", fg="red")
             return
@@ -116,43 +146,140 @@ class PalmCLI(click.MultiCommand):
             return
         return mod.cli
 
+    def requirements(self, cmd_name: Optional[str]) -> FrozenSet[str]:
+        """Get what palm must prepare before running a command
+
+        Commands declare this with a module-level ``requires`` set, which is
+        read statically where possible.
+
+        Args:
+            cmd_name (Optional[str]): Name of the palm command
+
+        Returns:
+            FrozenSet[str]: Requirements, e.g. {"config", "docker", "git"}
+        """
+        path = self.plugin_manager.command_path(cmd_name) if cmd_name else None
+        if path is None:
+            return frozenset()
+        requires = self.help_index.requirements(path)
+        self.help_index.save()
+        if requires is None:
+            mod = self.command_loader.load(
+                self.plugin_manager.plugin_command_dict[cmd_name], cmd_name, path
+            )
+            requires = frozenset(getattr(mod, "requires", ALL_REQUIREMENTS))
+        return requires
+
 
 def get_version():
     try:
-        version = pkg_resources.require("palm")[0].version
-    except pkg_resources.DistributionNotFound:
-        version = "unknown"
-    return version
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python < 3.8
+        from importlib_metadata import PackageNotFoundError, version
+
+    try:
+        return version("palm")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def print_version(ctx, param, value):
+    """Eager --version callback, so the version is only looked up when asked for"""
+    if not value or ctx.resilient_parsing:
+        return
+    click.echo(f"{ctx.find_root().info_name}, version {get_version()}")
+    ctx.exit()
 
 
 def required_dependencies_ready():
+    """Check docker is installed and the engine is running
+
+    The engine is pinged over its API socket, and a successful check is cached
+    for a short time. Hosts the API client can't reach (e.g. TLS or ssh) are
+    checked with `docker ps` instead.
+    """
+    from .docker_api import UnsupportedDockerHost, engine_ready
+
+    if shutil.which("docker") is None:
+        click.secho("Docker is not installed, please install it first", fg="red")
+        return False
+
+    try:
+        ready = engine_ready()
+    except UnsupportedDockerHost:
+        ready = run_on_host("docker ps", capture_output=True)[0] == 0
+    if not ready:
+        click.secho("Docker is not running, please start it first", fg="red")
+    return ready
 
-    docker_checks = (
-        (
-            "docker --version",
-            "Docker is not installed, please install it first",
-        ),
-        (
-            "docker ps",
-            "Docker is not running, please start it first",
-        ),
-    )
-    for cmd, msg in docker_checks:
-        if run_on_host(cmd, capture_output=True)[0] > 0:
-            click.secho(msg, fg="red")
-            return False
-    return True
+
+def ensure_docker_ready() -> None:
+    """Exit if docker isn't ready, the check is skipped when PALM_TEST is set"""
+    if os.getenv("PALM_TEST"):
+        return
+    if not required_dependencies_ready():
+        sys.exit(1)
 
 
 @click.group(cls=PalmCLI, context_settings=CONTEXT_SETTINGS)
-@click.version_option(get_version())
+@click.option(
+    "--version",
+    is_flag=True,
+    expose_value=False,
+    is_eager=True,
+    callback=print_version,
+    help="Show the version and exit.",
+)
+@click.option("--debug", is_flag=True, help="Print palm internals to stderr.")
+@click.option("--timings", is_flag=True, help="Print startup phase timings to stderr.")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    envvar="PALM_NO_CACHE",
+    help="Don't read or store cached command results.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    envvar="PALM_FORCE",
+    help="Run commands even if a cached result exists, and replace it.",
+)
 @click.pass_context
-def cli(ctx):
+def cli(ctx, debug: bool, timings: bool, no_cache: bool, force: bool):
     """Palmetto data product command line interface."""
-    is_test = os.getenv("PALM_TEST")
-    if not (is_test or required_dependencies_ready()):
-        ctx.exit(1)
-    ctx.obj = Environment(plugin_manager_instance, palm_config)
+    phases = ctx.command.timings
+    if debug:
+        loader = ctx.command.command_loader
+        ctx.call_on_close(lambda: click.secho(loader.stats(), err=True))
+    if timings:
+        ctx.call_on_close(lambda: click.echo(phases.report(), err=True))
+
+    with phases.phase("requirements"):
+        requirements = ctx.command.requirements(ctx.invoked_subcommand)
+
+    if "git" in requirements:
+        with phases.phase("git"):
+            ensure_valid_branch(ctx.command.palm)
+    else:
+        phases.skip("git")
+
+    if "config" in requirements:
+        ctx.command.palm.warn_if_unconfigured()
+
+    if "docker" in requirements:
+        with phases.phase("docker"):
+            ensure_docker_ready()
+    else:
+        phases.skip("docker")
+
+    ctx.obj = Environment(ctx.command.plugin_manager, ctx.command.palm)
+    # Exported, so palm subprocesses (e.g. palm run tasks) follow suit
+    if no_cache:
+        os.environ["PALM_NO_CACHE"] = "1"
+        ctx.obj.use_result_cache = False
+    if force:
+        os.environ["PALM_FORCE"] = "1"
+        ctx.obj.force = True
 
 
 if __name__ == "__main__":
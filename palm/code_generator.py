@@ -1,12 +1,104 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-import yaml
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from palm import cache
+from palm.config_snapshot import load_yaml
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    """A bytecode cache whose write failures don't fail the render"""
+
+    def dump_bytecode(self, bucket) -> None:
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            # e.g. the cache directory was removed while palm was running
+            pass
+
+
+class TemplateSet:
+    """The jinja environment for a template directory, shared within a process
+
+    Compiled templates are also kept in a bytecode cache in the user cache
+    directory, so later processes load them instead of compiling the source
+    again. jinja checks each template's source before reusing its bytecode,
+    and the file's mtime before reusing the compiled template in memory.
+
+    Args:
+        template_path (Path): Directory containing the templates
+    """
+
+    # Template sets for this process, keyed on absolute path
+    _sets: Dict[str, "TemplateSet"] = {}
+
+    def __init__(self, template_path: Path) -> None:
+        self.env = Environment(
+            loader=FileSystemLoader(template_path),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            bytecode_cache=self.bytecode_cache(),
+        )
+        # Directory and destination strings from template-config.yaml
+        self.strings: Dict[str, Template] = {}
+
+    @classmethod
+    def get(cls, template_path: Path) -> "TemplateSet":
+        key = os.path.abspath(template_path)
+        if key not in cls._sets:
+            cls._sets[key] = cls(template_path)
+        return cls._sets[key]
+
+    @staticmethod
+    def bytecode_cache() -> Optional[BytecodeCache]:
+        directory = cache.cache_dir() / "jinja"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+        return BytecodeCache(str(directory))
+
+    def render(self, name: str, replacements: dict) -> str:
+        return self.env.get_template(name).render(replacements)
+
+    def render_string(self, source: str, replacements: dict) -> str:
+        """Render a template string, compiling each distinct string once"""
+        if "{" not in source:
+            return source
+        template = self.strings.get(source)
+        if template is None:
+            template = self.strings[source] = self.env.from_string(source)
+        return template.render(replacements)
+
+
+def render_in_process(template_path: Path, name: str, replacements: dict) -> tuple:
+    """Render a template in a process pool worker
+
+    Returns:
+        tuple: The rendered content and the seconds it took
+    """
+    start = time.perf_counter()
+    content = TemplateSet.get(template_path).render(name, replacements)
+    return content, time.perf_counter() - start
 
 
 class CodeGenerator:
+    POOLS = ("thread", "process")
+
     def __init__(
-        self, template_path: Path, target_path: Path, replacements: dict
+        self,
+        template_path: Path,
+        target_path: Path,
+        replacements: dict,
+        workers: int = 1,
+        pool: str = "thread",
+        writers: int = 4,
     ) -> None:
         """Palm core code generator class
 
@@ -14,10 +106,21 @@ class CodeGenerator:
             template_path (Path): Path to the directory containing your templates and template-config.yaml
             target_path (Path): Path to directory where generated files will be written
             replacements (dict): Dictionary of templated strings to replace
+            workers (int): Templates rendered at once, 1 renders and writes
+                one file after another
+            pool (str): "thread", or "process" for CPU-heavy templates
+            writers (int): Files written at once when workers > 1
         """
         self.template_path = template_path
         self.target_path = target_path
         self.replacements = replacements
+        self.workers = max(int(workers or 1), 1)
+        if pool not in self.POOLS:
+            raise ValueError(f"Invalid pool {pool!r}, expected one of {self.POOLS}")
+        self.pool = pool
+        self.writers = max(int(writers or 1), 1)
+        # (template, destination, render seconds, write seconds) per written file
+        self.timings: List[Tuple[str, str, float, float]] = []
         self.config = self.get_config()
 
     def run(self) -> str:
@@ -29,17 +132,15 @@ class CodeGenerator:
         Returns:
             str: Result message
         """
-        env = Environment(
-            loader=FileSystemLoader(self.template_path),
-            trim_blocks=True,
-            lstrip_blocks=True,
-        )
+        templates = TemplateSet.get(self.template_path)
+        if self.workers > 1:
+            return self.run_concurrently(templates)
 
         for directory in self.config.get("directories", []):
             directory_path = Path(
                 Path.cwd(),
                 self.target_path,
-                env.from_string(directory).render(self.replacements),
+                templates.render_string(directory, self.replacements),
             )
 
             if not directory_path.is_dir():
@@ -50,16 +151,159 @@ class CodeGenerator:
         for file_item in self.config.get("files", []):
             for key in file_item:
                 template = key
-                destination = env.from_string(file_item[key]).render(self.replacements)
+                destination = templates.render_string(file_item[key], self.replacements)
                 print(f"Generating {template} to {destination}")
-                t = env.get_template(template)
-                templated_contents = t.render(self.replacements)
+                start = time.perf_counter()
+                templated_contents = templates.render(template, self.replacements)
+                rendered = time.perf_counter()
 
                 with open(Path(Path.cwd(), self.target_path, destination), "w") as fh:
                     fh.write(templated_contents)
+                self.timings.append(
+                    (
+                        template,
+                        destination,
+                        rendered - start,
+                        time.perf_counter() - rendered,
+                    )
+                )
 
         return "Generated successfully"
 
+    def run_concurrently(self, templates: TemplateSet) -> str:
+        """Generate the files with pools of renderers and writers
+
+        Directories are created in one pass first. Writes start as soon as a
+        file is rendered, with at most workers + 2 * writers files being
+        rendered or waiting to be written. When several entries have the same
+        destination, only the last one is written, as with run(). Progress is
+        printed in config order once every file is written, with per-file
+        timings.
+
+        Like run(), generation stops at the first error: no more files are
+        submitted, and the error is raised once the files already rendering
+        are written.
+
+        Returns:
+            str: Result message
+        """
+        start = time.perf_counter()
+        root = Path(Path.cwd(), self.target_path)
+        self.make_directories(
+            root / templates.render_string(directory, self.replacements)
+            for directory in self.config.get("directories", [])
+        )
+
+        # Last entry wins for each destination, as when written one by one
+        entries = {}
+        for file_item in self.config.get("files", []):
+            for template, destination in file_item.items():
+                destination = templates.render_string(destination, self.replacements)
+                entries.pop(destination, None)
+                entries[destination] = template
+
+        results: Dict[str, tuple] = {}
+        # Renders in progress, plus rendered files waiting for a writer
+        capacity = self.workers + 2 * self.writers
+        slots = threading.BoundedSemaphore(capacity)
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def write(destination: str, content: str, render_seconds: float) -> None:
+            try:
+                write_start = time.perf_counter()
+                with open(root / destination, "w") as fh:
+                    fh.write(content)
+                result = (render_seconds, time.perf_counter() - write_start, None)
+            except Exception as error:
+                result = (render_seconds, 0.0, error)
+                failed.set()
+            with lock:
+                results[destination] = result
+            slots.release()
+
+        def render(template: str) -> tuple:
+            render_start = time.perf_counter()
+            content = templates.render(template, self.replacements)
+            return content, time.perf_counter() - render_start
+
+        def rendered(destination: str, future: Future) -> None:
+            try:
+                content, render_seconds = future.result()
+            except Exception as error:
+                with lock:
+                    results[destination] = (0.0, 0.0, error)
+                failed.set()
+                slots.release()
+                return
+            writer_pool.submit(write, destination, content, render_seconds)
+
+        if self.pool == "process":
+            render_pool = ProcessPoolExecutor(self.workers)
+        else:
+            render_pool = ThreadPoolExecutor(self.workers)
+        writer_pool = ThreadPoolExecutor(self.writers)
+        with writer_pool, render_pool:
+            for destination, template in entries.items():
+                if failed.is_set():
+                    break
+                slots.acquire()
+                if failed.is_set():
+                    slots.release()
+                    break
+                if self.pool == "process":
+                    future = render_pool.submit(
+                        render_in_process,
+                        self.template_path,
+                        template,
+                        self.replacements,
+                    )
+                else:
+                    future = render_pool.submit(render, template)
+                future.add_done_callback(functools.partial(rendered, destination))
+            # Every render has been handed to the writers once all slots are free
+            for _ in range(capacity):
+                slots.acquire()
+
+        # Files after a failure may not have been submitted, but the failure
+        # comes first in config order and is raised before they are reached
+        for destination, template in entries.items():
+            render_seconds, write_seconds, error = results[destination]
+            if error is not None:
+                raise error
+            print(
+                f"Generating {template} to {destination} "
+                f"({render_seconds * 1000:.1f} ms render, "
+                f"{write_seconds * 1000:.1f} ms write)"
+            )
+            self.timings.append((template, destination, render_seconds, write_seconds))
+        print(
+            f"Generated {len(entries)} files in {time.perf_counter() - start:.2f}s "
+            f"with {self.workers} {self.pool} workers"
+        )
+        return "Generated successfully"
+
+    @staticmethod
+    def make_directories(paths: Iterable[Path]) -> None:
+        """Create directories in one pass, only calling mkdir for the deepest ones
+
+        Directories which already exist are reported, as run() does.
+        """
+        missing = []
+        for path in paths:
+            if path.is_dir():
+                print(f"{path} already exists")
+            else:
+                missing.append(path)
+        missing.sort(key=lambda path: len(path.parts), reverse=True)
+        created: Set[Path] = set()
+        for path in missing:
+            if path in created:
+                continue
+            path.mkdir(parents=True, exist_ok=True)
+            created.update(path.parents)
+            created.add(path)
+
     def get_config(self) -> dict:
         """Read configuration from template_path/template-config.yaml
 
@@ -79,9 +323,7 @@ class CodeGenerator:
         config_data = {}
 
         try:
-            config_data = yaml.safe_load(
-                (self.template_path / "template-config.yaml").read_text()
-            )
+            config_data = load_yaml(self.template_path / "template-config.yaml")
         except FileNotFoundError:
             print(f"No template-config.yaml found in {self.template_path}")
         except:
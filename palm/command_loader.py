@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import re
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Tuple, Union
+
+from palm import cache
+
+# Parent namespace for command modules registered in sys.modules
+COMMAND_NAMESPACE = "palm._cmd"
+
+
+def command_module_name(plugin_name: str, command_name: str) -> str:
+    """Stable sys.modules name for a command module
+
+    Args:
+        plugin_name (str): Name of the plugin providing the command
+        command_name (str): Name of the command
+
+    Returns:
+        str: e.g. palm._cmd.core.build
+    """
+    parts = [re.sub(r"\W", "_", part) for part in (plugin_name, command_name)]
+    return ".".join([COMMAND_NAMESPACE, *parts])
+
+
+class CommandLoader:
+    """Process-wide cache of executed command modules
+
+    Command modules are keyed on their resolved path and only executed again
+    when the file's stat signature changes. Loaded modules are registered in
+    sys.modules under command_module_name(), and are compiled through the
+    standard SourceFileLoader so __pycache__ bytecode is reused between runs.
+    """
+
+    def __init__(self) -> None:
+        self.modules: Dict[str, Tuple[List[int], ModuleType]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(
+        self, plugin_name: str, command_name: str, path: Union[str, Path]
+    ) -> ModuleType:
+        """Get the executed module for a command, executing it on first use
+
+        Args:
+            plugin_name (str): Name of the plugin providing the command
+            command_name (str): Name of the command
+            path (Union[str, Path]): Path to the cmd_*.py module
+
+        Raises:
+            FileNotFoundError: If the command module does not exist
+
+        Returns:
+            ModuleType: The executed command module
+        """
+        key = os.path.realpath(path)
+        signature = cache.stat_signature(key)
+        if signature is None:
+            raise FileNotFoundError(key)
+
+        cached = self.modules.get(key)
+        if cached and cached[0] == signature:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        module_name = command_module_name(plugin_name, command_name)
+        spec = importlib.util.spec_from_file_location(module_name, key)
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = mod
+        try:
+            spec.loader.exec_module(mod)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+
+        self.modules[key] = (signature, mod)
+        return mod
+
+    def stats(self) -> str:
+        """Summary of cache hits and misses, for --debug output"""
+        return (
+            f"command loader: {self.hits} hits, {self.misses} misses, "
+            f"{len(self.modules)} modules cached"
+        )
+
+
+command_loader = CommandLoader()
@@ -0,0 +1,75 @@
+import os
+from typing import Dict, List
+
+from palm import cache
+from palm.plugins.base import BasePlugin
+
+
+class CommandManifest:
+    """On-disk map of plugin command directories to the commands they contain
+
+    Each entry is keyed on the command directory path and stores the directory
+    stat signature (mtime, inode, size) it was built from. Adding, removing or
+    renaming a command file changes the directory mtime, so a matching
+    signature means the cached command list is still valid and the directory
+    does not need to be scanned.
+    """
+
+    FILE_NAME = "command_manifest.json"
+    VERSION = 1
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        self._loaded = False
+
+    def load(self) -> None:
+        """Read the manifest from the cache directory, ignoring invalid files"""
+        data = cache.read_json(self.FILE_NAME)
+        if isinstance(data, dict) and data.get("version") == self.VERSION:
+            self.entries = data.get("entries") or {}
+        self._loaded = True
+
+    def commands(self, plugin: BasePlugin) -> List[str]:
+        """Get the command names for a plugin, scanning its command_dir only
+        when the manifest entry is missing or out of date
+
+        Args:
+            plugin (BasePlugin): The plugin to list commands for
+
+        Returns:
+            list: List of click cli command names
+        """
+        if not self._loaded:
+            self.load()
+
+        key = os.path.abspath(plugin.command_dir)
+        signature = cache.stat_signature(key)
+        entry = self.entries.get(key)
+        if signature and entry and entry.get("signature") == signature:
+            return list(entry["commands"])
+
+        commands = plugin.all_commands()
+        if signature and not cache.is_racy(signature):
+            self.entries[key] = {"signature": signature, "commands": commands}
+            self.dirty = True
+        elif entry:
+            del self.entries[key]
+            self.dirty = True
+        return commands
+
+    def save(self) -> None:
+        """Write the manifest to the cache directory if it has changed"""
+        if not self.dirty:
+            return
+        cache.write_json(
+            self.FILE_NAME, {"version": self.VERSION, "entries": self.entries}
+        )
+        self.dirty = False
+
+    def clear(self) -> None:
+        """Discard all entries and remove the manifest file"""
+        self.entries = {}
+        self.dirty = False
+        self._loaded = True
+        cache.remove(self.FILE_NAME)
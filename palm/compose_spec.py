@@ -0,0 +1,416 @@
+"""Resolved compose service definitions, cached between runs
+
+``docker compose`` reads and interpolates the compose files and ``.env`` every
+time it runs. palm resolves the project's service once with
+``docker compose config``, caches the result keyed on the content of those
+inputs, and reuses it until one of them changes. With
+``docker_executor: docker-run``, commands run with a plain ``docker run``
+built from the resolved service.
+"""
+import hashlib
+import json
+import os
+import re
+import shlex
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from palm import cache
+from palm.palm_config import PalmConfig
+from palm.utils import run_on_host
+
+COMPOSE_FILES = (
+    "compose.yaml",
+    "compose.yml",
+    "docker-compose.yaml",
+    "docker-compose.yml",
+)
+OVERRIDE_FILES = (
+    "compose.override.yaml",
+    "compose.override.yml",
+    "docker-compose.override.yaml",
+    "docker-compose.override.yml",
+)
+# Host variables a compose file interpolates, e.g. $TAG or ${TAG:-latest}
+VARIABLE_PATTERN = re.compile(rb"\$\{?([A-Za-z_][A-Za-z0-9_]*)")
+
+
+def compose_project_name(project_root: Path) -> str:
+    """Default compose project name for a directory, as compose derives it"""
+    return re.sub(r"[^a-z0-9_-]", "", project_root.name.lower())
+
+
+def compose_files(project_root: Path) -> List[Path]:
+    """The compose files docker compose reads for a project
+
+    Honours COMPOSE_FILE, otherwise the first compose file found and its
+    override file.
+
+    Args:
+        project_root (Path): Directory containing the compose file
+
+    Returns:
+        List[Path]: Compose files, empty if there are none
+    """
+    if os.getenv("COMPOSE_FILE"):
+        separator = os.getenv("COMPOSE_PATH_SEPARATOR") or os.pathsep
+        return [
+            project_root / name for name in os.environ["COMPOSE_FILE"].split(separator)
+        ]
+
+    files = []
+    for names in (COMPOSE_FILES, OVERRIDE_FILES):
+        for name in names:
+            if (project_root / name).exists():
+                files.append(project_root / name)
+                break
+    return files if files and files[0].name in COMPOSE_FILES else []
+
+
+def read_env_file(path: Path) -> Dict[str, str]:
+    """Parse a docker env file: KEY=VALUE lines, # comments"""
+    env = {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export ") :]
+        key, sep, value = line.partition("=")
+        if not sep:
+            value = os.environ.get(key.strip(), "")
+        elif len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        env[key.strip()] = value
+    return env
+
+
+def env_files(service: dict) -> List[Tuple[str, bool]]:
+    """A compose service's env files, as (path, required) pairs"""
+    entries = service.get("env_file") or []
+    if isinstance(entries, (str, dict)):
+        entries = [entries]
+    return [
+        (entry["path"], entry.get("required", True))
+        if isinstance(entry, dict)
+        else (entry, True)
+        for entry in entries
+    ]
+
+
+def service_environment(service: dict, project_root: Path) -> Dict[str, str]:
+    """Environment for a compose service: env_file entries, then environment"""
+    env = {}
+    for path, required in env_files(service):
+        path = project_root / path
+        if path.exists():
+            env.update(read_env_file(path))
+        elif required:
+            raise click.ClickException(f"env file {path} not found")
+
+    environment = service.get("environment") or {}
+    if isinstance(environment, list):
+        environment = dict(item.partition("=")[::2] for item in environment)
+    for key, value in environment.items():
+        env[key] = os.environ.get(key, "") if value is None else str(value)
+    return env
+
+
+def service_binds(service: dict, project_root: Path) -> List[str]:
+    """Bind mounts and named volumes, as docker's source:target[:mode] strings"""
+    binds = []
+    for volume in service.get("volumes") or []:
+        if isinstance(volume, dict):
+            source, target = volume.get("source"), volume["target"]
+            mode = "ro" if volume.get("read_only") else None
+            if volume.get("type", "volume") == "bind":
+                source = str((project_root / source).resolve())
+        else:
+            parts = volume.split(":")
+            source, target = (
+                (parts[0], parts[1]) if len(parts) > 1 else (None, parts[0])
+            )
+            mode = parts[2] if len(parts) > 2 else None
+            if source and source.startswith((".", "/", "~")):
+                source = str((project_root / Path(source).expanduser()).resolve())
+        if not source:
+            # Anonymous volumes are created by the engine from the image config
+            continue
+        binds.append(":".join(part for part in (source, target, mode) if part))
+    return binds
+
+
+def service_ports(service: dict) -> Tuple[Dict[str, dict], Dict[str, List[dict]]]:
+    """Published ports, as Engine API ExposedPorts and HostConfig.PortBindings"""
+    exposed, bindings = {}, {}
+    for port in service.get("ports") or []:
+        if isinstance(port, dict):
+            host_ip = port.get("host_ip", "")
+            published = str(port.get("published") or "")
+            target = str(port["target"])
+            protocol = port.get("protocol", "tcp")
+        else:
+            port = str(port)
+            port, _, protocol = port.partition("/")
+            parts = port.rsplit(":", 2)
+            target = parts[-1]
+            published = parts[-2] if len(parts) > 1 else ""
+            host_ip = parts[0] if len(parts) > 2 else ""
+        key = f"{target}/{protocol or 'tcp'}"
+        exposed[key] = {}
+        bindings.setdefault(key, []).append({"HostIp": host_ip, "HostPort": published})
+    return exposed, bindings
+
+
+def entrypoint(service: dict) -> Optional[List[str]]:
+    value = service.get("entrypoint")
+    if value is None:
+        return None
+    return shlex.split(value) if isinstance(value, str) else list(value)
+
+
+def docker_run_args(
+    service: dict,
+    project_root: Path,
+    env: Dict[str, str],
+    tty: bool,
+    publish_ports: bool = True,
+) -> List[str]:
+    """docker run arguments equivalent to ``docker compose run --service-ports``
+
+    Args:
+        service (dict): The resolved compose service
+        project_root (Path): Directory containing the compose file
+        env (Dict[str, str]): Extra environment variables for the command
+        tty (bool): Allocate a tty
+        publish_ports (bool): Publish the service's ports on the host
+
+    Returns:
+        List[str]: Arguments up to and including the image; append the command
+    """
+    args = ["docker", "run", "--rm", "-i"]
+    if tty:
+        args.append("-t")
+    if service.get("working_dir"):
+        args.extend(["-w", service["working_dir"]])
+    if service.get("user"):
+        args.extend(["-u", str(service["user"])])
+    for bind in service_binds(service, project_root):
+        args.extend(["-v", bind])
+    for key, value in {**service_environment(service, project_root), **env}.items():
+        args.extend(["-e", f"{key}={value}"])
+    bindings = service_ports(service)[1] if publish_ports else {}
+    for port, bindings in bindings.items():
+        for binding in bindings:
+            host = ":".join((binding["HostIp"], binding["HostPort"]))
+            args.extend(["-p", f"{host.lstrip(':')}:{port}" if host != ":" else port])
+    command = entrypoint(service)
+    if command is not None:
+        args.extend(["--entrypoint", command[0] if command else ""])
+    args.append(service["image"])
+    if command:
+        args.extend(command[1:])
+    return args
+
+
+class ComposeSpec:
+    """The project's compose service, resolved by docker compose and cached
+
+    The cache entry is keyed on the content of the compose files, .env, the
+    service's env files and the host variables the compose files reference.
+
+    Args:
+        palm_config (PalmConfig): The project's config
+    """
+
+    DIRECTORY = "compose_specs"
+    VERSION = 1
+
+    def __init__(self, palm_config: PalmConfig) -> None:
+        self.project_root = palm_config.project_root
+        self.service_name = palm_config.image_name
+        digest = hashlib.sha1(str(self.project_root).encode()).hexdigest()
+        self.name = f"{self.DIRECTORY}/{digest}.json"
+
+    def inputs(self) -> List[Path]:
+        """Files docker compose reads to resolve the service, besides env files"""
+        return compose_files(self.project_root) + [self.project_root / ".env"]
+
+    def key(self, extra_inputs: List[str] = []) -> str:
+        """Content hash of everything the resolved service depends on
+
+        Args:
+            extra_inputs (List[str]): Further input files, e.g. env files
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256(f"{self.VERSION}\0{self.service_name}\0".encode())
+        variables = {"COMPOSE_PROJECT_NAME", "COMPOSE_PROFILES"}
+        for path in self.inputs() + [self.project_root / p for p in extra_inputs]:
+            try:
+                content = path.read_bytes()
+            except OSError:
+                content = b"\0missing"
+            digest.update(f"{path}\0{len(content)}\0".encode() + content)
+            variables.update(v.decode() for v in VARIABLE_PATTERN.findall(content))
+        for variable in sorted(variables):
+            digest.update(f"{variable}={os.environ.get(variable)}\0".encode())
+        return digest.hexdigest()
+
+    def load(self) -> Optional[dict]:
+        """Get the cached entry, if it is still fresh
+
+        Returns:
+            Optional[dict]: Entry with project, service, key and env_files, or None
+        """
+        entry = cache.read_json(self.name)
+        if (
+            not isinstance(entry, dict)
+            or entry.get("version") != self.VERSION
+            or entry.get("service_name") != self.service_name
+        ):
+            return None
+        if entry.get("key") != self.key(entry.get("env_files", [])):
+            return None
+        return entry
+
+    def resolve(self) -> dict:
+        """Resolve the service with ``docker compose config`` and cache it
+
+        Raises:
+            click.ClickException: If docker compose fails or the service is missing
+
+        Returns:
+            dict: The new cache entry
+        """
+        if not compose_files(self.project_root):
+            raise click.ClickException("No compose file found, run palm containerize")
+        code, stdout, stderr = run_on_host(
+            f"cd {shlex.quote(str(self.project_root))} && "
+            "docker compose config --format json",
+            False,
+            True,
+        )
+        if code != 0:
+            raise click.ClickException(f"docker compose config failed: {stderr}")
+        config = json.loads(stdout)
+        service = (config.get("services") or {}).get(self.service_name)
+        if service is None:
+            raise click.ClickException(
+                f"Service {self.service_name} not found in the compose config"
+            )
+
+        project = config.get("name") or compose_project_name(self.project_root)
+        # Compose names the images it builds <project>-<service>
+        service.setdefault("image", f"{project}-{self.service_name}")
+        # Named volumes are created as <project>_<volume> unless named
+        volumes = config.get("volumes") or {}
+        for volume in service.get("volumes") or []:
+            if isinstance(volume, dict) and volume.get("type") == "volume":
+                named = volumes.get(volume.get("source")) or {}
+                if named.get("name"):
+                    volume["source"] = named["name"]
+
+        extra_inputs = [path for path, _ in env_files(service)]
+        entry = {
+            "version": self.VERSION,
+            "service_name": self.service_name,
+            "project": project,
+            "service": service,
+            "env_files": extra_inputs,
+            "key": self.key(extra_inputs),
+            "resolved_at": time.time(),
+        }
+        cache.write_json(self.name, entry)
+        return entry
+
+    def service(self) -> dict:
+        """The resolved service definition, resolving it if the cache is stale
+
+        Returns:
+            dict: The compose service, in docker compose config's long syntax
+        """
+        entry = self.load() or self.resolve()
+        return entry["service"]
+
+    def clear(self) -> bool:
+        return cache.remove(self.name)
+
+
+class DockerRunExecutor:
+    """Runs commands with ``docker run``, from the cached compose service
+
+    Args:
+        palm_config (PalmConfig): The project's config
+    """
+
+    def __init__(self, palm_config: PalmConfig) -> None:
+        self.palm = palm_config
+        self.spec = ComposeSpec(palm_config)
+
+    def command(
+        self,
+        cmd: str,
+        env_vars: List[str],
+        no_bin_bash: bool = False,
+        service_ports: bool = True,
+    ) -> str:
+        """Build the docker run command line for a palm command
+
+        Args:
+            cmd (str): The command to run
+            env_vars (List[str]): docker -e flags
+            no_bin_bash (bool): Run cmd directly instead of with /bin/bash -c
+            service_ports (bool): Publish the service's ports on the host
+
+        Returns:
+            str: Shell command line
+        """
+        from palm.cache_volume import CacheVolume
+
+        env = dict(var[len("-e ") :].partition("=")[::2] for var in env_vars)
+        tty = sys.stdin.isatty() and sys.stdout.isatty()
+        service = CacheVolume(self.palm).apply(self.spec.service())
+        args = docker_run_args(service, self.palm.project_root, env, tty, service_ports)
+        docker_cmd = [" ".join(shlex.quote(arg) for arg in args)]
+        if no_bin_bash:
+            docker_cmd.append(cmd)
+        else:
+            docker_cmd.append(f'/bin/bash -c "{cmd}" ')
+        return " ".join(docker_cmd)
+
+    def run(
+        self,
+        cmd: str,
+        env_vars: Optional[List[str]] = [],
+        no_bin_bash: Optional[bool] = False,
+        capture_output: Optional[bool] = False,
+        silent: Optional[bool] = False,
+        service_ports: Optional[bool] = True,
+    ) -> Tuple[bool, str]:
+        """Run a command in a new container of the project's compose service
+
+        Takes the same arguments and returns the same results as
+        :obj:`palm.utils.run_in_docker`.
+        """
+        if not silent:
+            click.secho(f"Executing command `{cmd}` in docker...", fg="yellow")
+
+        ex_code, std_out, std_err = run_on_host(
+            self.command(cmd, env_vars, no_bin_bash, service_ports),
+            False,
+            capture_output,
+        )
+        if capture_output:
+            if ex_code == 0:
+                return (True, std_out)
+            return (False, std_err)
+
+        if ex_code == 0:
+            return (True, "Success! Palm completed with exit code 0")
+        return (False, f"Fail! Palm exited with code {ex_code}")
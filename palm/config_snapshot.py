@@ -0,0 +1,126 @@
+import copy
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import yaml
+
+from palm import cache
+
+# libyaml's loader is several times faster than the pure Python one
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Parsed YAML documents for this process, keyed on absolute path
+_documents: Dict[str, Tuple[List[int], Any]] = {}
+
+
+def load_yaml(path: Union[str, Path]) -> Any:
+    """Parse a YAML file, reusing the parsed document while the file is unchanged
+
+    Every config consumer in the process shares one parsed copy of each
+    file. Callers get a deep copy, so they can modify the result.
+
+    Args:
+        path (Union[str, Path]): Path to the YAML file
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+
+    Returns:
+        Any: The parsed document
+    """
+    key = os.path.abspath(path)
+    signature = cache.stat_signature(key)
+    if signature is None:
+        raise FileNotFoundError(key)
+
+    cached = _documents.get(key)
+    if cached and cached[0] == signature:
+        return copy.deepcopy(cached[1])
+
+    with open(key) as f:
+        document = yaml.load(f, Loader=YamlLoader)
+    if not cache.is_racy(signature):
+        _documents[key] = (signature, document)
+    return copy.deepcopy(document)
+
+
+def clear() -> None:
+    """Forget all parsed documents"""
+    _documents.clear()
+
+
+class ConfigSnapshot:
+    """Pickled merged config, keyed on the stat signatures of its source files
+
+    When every source file is unchanged, the merged config and the parsed
+    source documents are read from one file in the cache directory and YAML
+    isn't parsed at all. The source documents are shared with load_yaml, so
+    later reads of the same files (e.g. plugin configs) don't parse them either.
+    """
+
+    DIRECTORY = "config_snapshots"
+    VERSION = 1
+
+    def __init__(self, sources: List[Path]) -> None:
+        self.sources = [os.path.abspath(source) for source in sources]
+        digest = hashlib.sha1("\0".join(self.sources).encode()).hexdigest()
+        self.name = f"{self.DIRECTORY}/{digest}.pickle"
+
+    def _signatures(self) -> List[Optional[List[int]]]:
+        return [cache.stat_signature(source) for source in self.sources]
+
+    def load(self) -> Optional[dict]:
+        """Get the merged config, if the snapshot is still fresh
+
+        Returns:
+            Optional[dict]: The merged config, or None if there is no fresh snapshot
+        """
+        data = cache.read_bytes(self.name)
+        if data is None:
+            return None
+        try:
+            snapshot = pickle.loads(data)
+        except Exception:
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != self.VERSION:
+            return None
+
+        signatures = self._signatures()
+        if snapshot.get("signatures") != signatures or None in signatures:
+            return None
+
+        for source, signature, document in zip(
+            self.sources, signatures, snapshot["documents"]
+        ):
+            _documents[source] = (signature, document)
+        return snapshot["config"]
+
+    def save(self, config: dict) -> None:
+        """Write a snapshot of the merged config
+
+        Nothing is written unless every source was parsed by load_yaml and is
+        older than the racy window, so the snapshot can't hide a later edit.
+
+        Args:
+            config (dict): The merged config
+        """
+        signatures = self._signatures()
+        documents = []
+        for source, signature in zip(self.sources, signatures):
+            cached = _documents.get(source)
+            if signature is None or not cached or cached[0] != signature:
+                return
+            documents.append(cached[1])
+
+        snapshot = {
+            "version": self.VERSION,
+            "signatures": signatures,
+            "documents": documents,
+            "config": config,
+        }
+        cache.write_bytes(
+            self.name, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        )
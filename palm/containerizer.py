@@ -2,7 +2,7 @@ import re
 import sys
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 
 import click
 
@@ -90,27 +90,77 @@ class Containerizer(ABC):
 class PythonContainerizer(Containerizer):
     """Containerizer for Python projects"""
 
+    # standard: copy the project, then install dependencies with entrypoint.sh
+    # optimized: install dependencies from the lockfile with a BuildKit cache
+    #   mount, then copy the source, so source edits reuse the dependency layer
+    # multi-stage: like optimized, into a venv copied to a slim runtime image
+    MODES = ("standard", "optimized", "multi-stage")
+    # The file each package manager installs from, in detection order.
+    # uv falls back to requirements.txt when the project has no uv.lock
+    LOCKFILES = {
+        "uv": "uv.lock",
+        "pip3": "requirements.txt",
+        "poetry": "poetry.lock",
+        "pipenv": "Pipfile.lock",
+        "pdm": "pdm.lock",
+    }
+    PACKAGE_MANAGERS = tuple(LOCKFILES)
+
     def __init__(
-        self, ctx, template_dir: Path, python_version: Optional[str] = "3.8"
+        self,
+        ctx,
+        template_dir: Path,
+        python_version: Optional[str] = "3.8",
+        mode: str = "standard",
+        package_manager: Optional[str] = None,
     ) -> None:
         """PythonContainerizer constructor
 
         Args:
             ctx (click.context): The click context object from the calling command
             template_dir (Path): Path to the templates directory
+            python_version (Optional[str]): Python version of the base image
+            mode (str): How the Dockerfile builds the image, one of MODES
+            package_manager (Optional[str]): One of PACKAGE_MANAGERS, detected
+                from the project's lockfile if not given
         """
         self.ctx = ctx
         self.project_name = ctx.obj.palm.image_name
         self.template_dir = template_dir
         self.python_version = python_version
+        self.mode = mode
+        self.requested_package_manager = package_manager
         self.package_manager = ""
+        self.lockfile = ""
 
     def run(self) -> None:
         """Run the containerizer"""
         self.check_setup()
-        self.package_manager = self.detect_package_manager()
+        self.package_manager = (
+            self.requested_package_manager or self.detect_package_manager()
+        )
+        self.lockfile = self.detect_lockfile()
 
         super().generate(self.target_dir, self.replacements)
+        self.write_dockerignore()
+
+    def write_dockerignore(self) -> None:
+        """Generate a .dockerignore for the project, unless it already has one"""
+        from palm.build_context import generate_dockerignore
+
+        path = Path(self.target_dir, ".dockerignore")
+        if path.exists():
+            return
+        path.write_text(generate_dockerignore(self.target_dir, self.tracked_files()))
+
+    def tracked_files(self) -> Optional[Set[str]]:
+        """Files tracked by git, relative to target_dir, None outside a work tree"""
+        from palm import git_utils
+
+        repo = self.ctx.obj.palm.repo
+        if repo is None or repo.is_bare:
+            return None
+        return git_utils.tracked_files(repo, self.target_dir)
 
     @property
     def replacements(self) -> Dict:
@@ -119,6 +169,8 @@ class PythonContainerizer(Containerizer):
             "project_name": self.project_name,
             "package_manager": self.package_manager,
             "python_version": self.python_version,
+            "mode": self.mode,
+            "lockfile": self.lockfile,
         }
 
     @property
@@ -142,16 +194,15 @@ class PythonContainerizer(Containerizer):
             return
 
     def detect_package_manager(self) -> str:
-        """Determine which package manager is in use,
-        supports pip3 and poetry, returns "unknown" if neither are found
+        """Determine which package manager is in use from the project's lockfile,
+        prompting to add a requirements.txt if there is none
 
         Returns:
-            str: pip3 | poetry | unknown
+            str: uv | pip3 | poetry | pipenv | pdm
         """
-        if self.has_requirements_txt():
-            return "pip3"
-        if self.has_poetry():
-            return "poetry"
+        for package_manager in self.PACKAGE_MANAGERS:
+            if self.has_lockfile(package_manager):
+                return package_manager
         # Unknown package manager, prompt to setup requirements.txt
         try:
             self.optionally_add_requirements_txt()
@@ -160,6 +211,33 @@ class PythonContainerizer(Containerizer):
             sys.exit(1)
         return "pip3"
 
+    def detect_lockfile(self) -> str:
+        """The file the package manager installs dependencies from
+
+        Returns:
+            str: e.g. uv.lock, or requirements.txt for uv without a uv.lock
+        """
+        if self.has_lockfile(self.package_manager):
+            return self.LOCKFILES[self.package_manager]
+        if self.package_manager not in ("uv", "pip3"):
+            click.secho(
+                f"No {self.LOCKFILES[self.package_manager]} found for "
+                f"{self.package_manager}, aborting containerization",
+                fg="red",
+            )
+            sys.exit(1)
+        if not self.has_requirements_txt():
+            try:
+                self.optionally_add_requirements_txt()
+            except AbortPalm:
+                click.secho("Aborting containerization", fg="red")
+                sys.exit(1)
+        return "requirements.txt"
+
+    def has_lockfile(self, package_manager: str) -> bool:
+        """Check for the package manager's lockfile in the project root"""
+        return Path(self.LOCKFILES[package_manager]).exists()
+
     def has_requirements_txt(self) -> bool:
         """Check for a requirements.txt file in the project root"""
         return Path("requirements.txt").exists()
@@ -0,0 +1,284 @@
+"""palm daemon: a resident server which keeps palm warm between invocations
+
+The daemon holds a PalmConfig, PluginManager and CommandLoader for each project
+root it has served. Each request is run in a forked child of the daemon, so
+commands start with config parsed, plugins imported and command modules
+loaded, while still getting a fresh process of their own.
+
+Commands run from a subdirectory share the state of the project they belong
+to. State is invalidated when any watched path changes: the project's .palm
+directory and config, the global config and the git HEAD.
+"""
+import os
+import signal
+import socket
+import sys
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import palm.cli as palm_cli
+from palm import cache, git_utils
+from palm.command_loader import CommandLoader
+from palm.daemon_client import recv_message, send_message, socket_path
+from palm.palm_config import PalmConfig
+from palm.plugin_manager import PluginManager
+from palm.plugins.base import BasePlugin
+from palm.timings import Timings
+
+ACCEPT_TIMEOUT = 1.0
+
+
+def project_root(cwd: Path) -> Path:
+    """The project a directory belongs to
+
+    The nearest directory from cwd up to the top of its git worktree which has
+    a .palm directory, or cwd itself if there is none.
+
+    Args:
+        cwd (Path): The client's working directory
+
+    Returns:
+        Path: The resolved project root
+    """
+    cwd = Path(cwd).resolve()
+    for directory in (cwd, *cwd.parents):
+        if (directory / ".palm").is_dir():
+            return directory
+        if (directory / ".git").exists():
+            break
+    return cwd
+
+
+def watched_paths(project_root: Path) -> List[Path]:
+    """Paths which invalidate the daemon's state for a project when they change"""
+    paths = [
+        project_root / ".palm",
+        project_root / ".palm" / "config.yaml",
+        Path.home() / ".palm" / "config.yaml",
+    ]
+    git_dir = git_utils.find_git_dir(project_root)
+    if git_dir:
+        paths.append(git_dir / "HEAD")
+    return paths
+
+
+def watch_signature(project_root: Path) -> list:
+    """Combined stat signature of the watched paths for a project"""
+    return [cache.stat_signature(path) for path in watched_paths(project_root)]
+
+
+class ProjectState:
+    """Warm palm state for a single project root"""
+
+    def __init__(self, project_root: Path) -> None:
+        self.project_root = project_root
+        self.signature = watch_signature(project_root)
+        self.config = PalmConfig(project_root)
+        self.plugin_manager = PluginManager()
+        self.plugin_manager.load_plugins(self.config.plugins)
+        self._bind_repo_plugin()
+        self.command_loader = CommandLoader()
+        self._preload_commands()
+
+    def is_stale(self) -> bool:
+        return watch_signature(self.project_root) != self.signature
+
+    def _bind_repo_plugin(self) -> None:
+        """Point the repo plugin at this project's .palm directory
+
+        The repo plugin's command_dir is bound to the cwd when palm.plugins.repo
+        is imported, which is only correct for the first project served.
+        """
+        if "repo" not in self.plugin_manager.plugins:
+            return
+        self.plugin_manager.plugins["repo"] = BasePlugin(
+            name="repo", command_dir=self.project_root / ".palm"
+        )
+        self.plugin_manager.plugin_command_dict = {}
+        for plugin_name in self.plugin_manager.plugins:
+            self.plugin_manager.extend_plugin_command_mapping(plugin_name)
+
+    def _preload_commands(self) -> None:
+        """Import every command module, so forked children inherit them"""
+        for (
+            command_name,
+            plugin_name,
+        ) in self.plugin_manager.plugin_command_dict.items():
+            try:
+                self.command_loader.load(
+                    plugin_name,
+                    command_name,
+                    self.plugin_manager.command_path(command_name),
+                )
+            except Exception:
+                # The error is reported when the command is actually used
+                continue
+
+
+class PalmDaemon:
+    """Serve palm commands over a Unix domain socket"""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.socket_path = path or socket_path()
+        self.projects: Dict[str, ProjectState] = {}
+        self.children: Set[int] = set()
+        self.running = False
+
+    def serve_forever(self) -> None:
+        """Accept and dispatch requests until a stop request is received"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(self.socket_path))
+        # The daemon runs commands for whoever connects, so only its user may.
+        # Nobody can connect before listen(), so this leaves no window open.
+        os.chmod(self.socket_path, 0o600)
+        server.listen()
+        server.settimeout(ACCEPT_TIMEOUT)
+        self.running = True
+        try:
+            while self.running:
+                self._reap_children()
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                self._handle(conn, server)
+        finally:
+            server.close()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+    def state_for(self, project_root: Path) -> ProjectState:
+        """Get warm state for a project, rebuilding it if it is stale"""
+        key = str(project_root)
+        state = self.projects.get(key)
+        if state is None or state.is_stale():
+            previous_cwd = os.getcwd()
+            os.chdir(project_root)
+            try:
+                state = ProjectState(project_root)
+            finally:
+                os.chdir(previous_cwd)
+            self.projects[key] = state
+        return state
+
+    def _handle(self, conn: socket.socket, server: socket.socket) -> None:
+        fds = []
+        try:
+            message, fds = recv_message(conn)
+            if message is None:
+                return
+            command = message.get("command")
+            if command == "stop":
+                self.running = False
+                send_message(conn, {"stopped": True})
+            elif command == "status":
+                send_message(
+                    conn, {"pid": os.getpid(), "projects": sorted(self.projects)}
+                )
+            elif command == "run" and len(fds) == 3:
+                self._run(conn, server, message, fds)
+            else:
+                send_message(conn, {"error": f"invalid request: {command}"})
+        except Exception as e:
+            try:
+                send_message(conn, {"error": str(e)})
+            except OSError:
+                pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+
+    def _run(self, conn, server, message: dict, fds: List[int]) -> None:
+        state = self.state_for(project_root(Path(message["cwd"])))
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+
+        # Forked child: run the command with the client's cwd, env and stdio
+        exit_code = 1
+        try:
+            server.close()
+            exit_code = run_command(state, message, fds, conn)
+        finally:
+            os._exit(exit_code)
+
+    def _reap_children(self) -> None:
+        for pid in list(self.children):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.discard(pid)
+
+
+def run_command(state: ProjectState, message: dict, fds: List[int], conn) -> int:
+    """Run a forwarded palm command, in a forked child of the daemon
+
+    Returns:
+        int: Exit status for the child process
+    """
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    os.chdir(message["cwd"])
+    os.environ.clear()
+    os.environ.update(message["env"])
+    send_message(conn, {"pid": os.getpid()})
+
+    palm_cli.palm_config = state.config
+    palm_cli.plugin_manager_instance = state.plugin_manager
+    cli = palm_cli.cli
+    cli.palm = state.config
+    cli.plugin_manager = state.plugin_manager
+    cli.command_loader = state.command_loader
+    cli.timings = Timings()
+    cli.timings.skip("config", "warm in daemon")
+    cli.timings.skip("plugins", "warm in daemon")
+
+    try:
+        cli.main(args=message["argv"], prog_name="palm")
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            sys.stderr.write(f"{e.code}\n")
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    send_message(conn, {"exit_code": exit_code})
+    return 0
+
+
+def main() -> None:
+    """Run the daemon in the foreground, used by `palm daemon start`"""
+    daemon = PalmDaemon()
+
+    def stop(signum, frame):
+        daemon.running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
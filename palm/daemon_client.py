@@ -0,0 +1,189 @@
+"""Thin client for the palm daemon
+
+This module is palm's console entry point, so it must stay cheap to import:
+only the standard library and palm.cache. If no daemon is running, palm runs
+in-process as usual.
+"""
+import array
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from palm.cache import cache_dir
+
+HEADER = struct.Struct("!I")
+MAX_FDS = 3
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT")
+
+
+def socket_path() -> Path:
+    """Path to the palm daemon's Unix domain socket"""
+    return cache_dir() / "daemon.sock"
+
+
+def send_message(sock: socket.socket, payload: dict, fds: Sequence[int] = ()) -> None:
+    """Send a length-prefixed JSON message, optionally passing file descriptors
+
+    Args:
+        sock (socket.socket): Connected Unix socket
+        payload (dict): JSON serializable message
+        fds (Sequence[int]): File descriptors to pass with SCM_RIGHTS
+    """
+    body = json.dumps(payload).encode()
+    ancillary = []
+    if fds:
+        ancillary = [
+            (socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds).tobytes())
+        ]
+    sock.sendmsg([HEADER.pack(len(body))], ancillary)
+    sock.sendall(body)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Optional[dict], List[int]]:
+    """Receive a message sent with send_message
+
+    Args:
+        sock (socket.socket): Connected Unix socket
+
+    Returns:
+        Tuple[Optional[dict], List[int]]: The message (None if the peer closed
+        the connection) and any file descriptors passed with it
+    """
+    fds = array.array("i")
+    header, ancdata, _, _ = sock.recvmsg(
+        HEADER.size, socket.CMSG_SPACE(MAX_FDS * fds.itemsize)
+    )
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+    if not header:
+        return None, list(fds)
+
+    header += _recv_exactly(sock, HEADER.size - len(header))
+    (length,) = HEADER.unpack(header)
+    return json.loads(_recv_exactly(sock, length)), list(fds)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("palm daemon closed the connection")
+        data += chunk
+    return data
+
+
+def connect(path: Optional[Path] = None) -> Optional[socket.socket]:
+    """Connect to the daemon
+
+    Returns:
+        Optional[socket.socket]: Connected socket, or None if no daemon is running
+    """
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(payload: dict, path: Optional[Path] = None) -> Optional[dict]:
+    """Send a control request (status, stop) to the daemon
+
+    Returns:
+        Optional[dict]: The daemon's reply, or None if no daemon is running
+    """
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        send_message(sock, payload)
+        reply, _ = recv_message(sock)
+    return reply
+
+
+def forward(
+    argv: List[str],
+    cwd: Optional[str] = None,
+    env: Optional[dict] = None,
+    fds: Sequence[int] = (0, 1, 2),
+    path: Optional[Path] = None,
+) -> Optional[int]:
+    """Run a palm command in the daemon
+
+    stdin, stdout and stderr are passed to the daemon as file descriptors, so
+    the command reads and writes the caller's terminal directly. Signals
+    received while waiting are forwarded to the process running the command.
+
+    Args:
+        argv (List[str]): palm arguments, without the program name
+        cwd (Optional[str]): Working directory, defaults to the current one
+        env (Optional[dict]): Environment, defaults to the current one
+        fds (Sequence[int]): stdin, stdout and stderr file descriptors
+        path (Optional[Path]): Socket path, defaults to socket_path()
+
+    Returns:
+        Optional[int]: The command's exit code, or None if no daemon is running
+    """
+    sock = connect(path)
+    if sock is None:
+        return None
+
+    payload = {
+        "command": "run",
+        "argv": list(argv),
+        "cwd": cwd or os.getcwd(),
+        "env": dict(os.environ if env is None else env),
+    }
+    previous = {}
+    with sock:
+        send_message(sock, payload, fds)
+        reply, _ = recv_message(sock)
+        if reply is None or "pid" not in reply:
+            return None
+        pid = reply["pid"]
+
+        def forward_signal(signum, frame):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+        for name in FORWARDED_SIGNALS:
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                previous[signum] = signal.signal(signum, forward_signal)
+        try:
+            reply, _ = recv_message(sock)
+        except ConnectionError:
+            reply = None
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    if reply is None:
+        sys.stderr.write("palm daemon: lost connection to command\n")
+        return 1
+    return reply.get("exit_code", 1)
+
+
+def main() -> None:
+    """palm console entry point, runs commands in the daemon when available"""
+    if not os.getenv("PALM_NO_DAEMON"):
+        exit_code = forward(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from palm.cli import cli
+
+    cli()
@@ -0,0 +1,396 @@
+"""Minimal Docker Engine API client
+
+Talks HTTP/1.1 to the Docker daemon socket directly, so palm can check and
+drive the engine without spawning the docker CLI. Only the small subset of
+the API palm needs is implemented.
+"""
+import json
+import os
+import socket
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote, urlencode, urlparse
+
+from palm import cache
+
+DEFAULT_HOST = "unix:///var/run/docker.sock"
+PING_TIMEOUT = 2.0
+# Successful readiness probes are trusted for this long
+READY_TTL = 30
+READY_CACHE = "docker_ready.json"
+# Header of each frame in a multiplexed (non-tty) attach stream
+FRAME_HEADER = struct.Struct(">BxxxL")
+STDOUT = 1
+STDERR = 2
+
+
+class DockerAPIError(Exception):
+    """
+    Raised when the Docker Engine API can't be reached or returns an error.
+    """
+
+    pass
+
+
+class UnsupportedDockerHost(DockerAPIError):
+    """
+    Raised for Docker hosts this client can't talk to (TLS, ssh, npipe).
+    """
+
+    pass
+
+
+def docker_config_dir() -> Path:
+    return Path(os.getenv("DOCKER_CONFIG") or Path.home() / ".docker")
+
+
+def docker_host() -> str:
+    """Resolve the Docker host the docker CLI would use
+
+    Honours DOCKER_HOST, then the current docker context (DOCKER_CONTEXT or
+    currentContext in the docker config), falling back to the default socket.
+
+    Returns:
+        str: Docker host URL, e.g. unix:///var/run/docker.sock
+    """
+    host = os.getenv("DOCKER_HOST")
+    if host:
+        return host
+
+    context = os.getenv("DOCKER_CONTEXT")
+    if not context:
+        try:
+            config = json.loads((docker_config_dir() / "config.json").read_text())
+            context = config.get("currentContext")
+        except (OSError, ValueError, AttributeError):
+            context = None
+    if context and context != "default":
+        import hashlib
+
+        digest = hashlib.sha256(context.encode()).hexdigest()
+        meta_path = docker_config_dir() / "contexts" / "meta" / digest / "meta.json"
+        try:
+            meta = json.loads(meta_path.read_text())
+            return meta["Endpoints"]["docker"]["Host"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    return DEFAULT_HOST
+
+
+class DockerResponse:
+    """Status, headers and body of a Docker Engine API response"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class DockerClient:
+    """HTTP/1.1 client for the Docker Engine API
+
+    Args:
+        host (Optional[str]): Docker host URL, defaults to docker_host()
+        timeout (Optional[float]): Socket timeout in seconds
+
+    Raises:
+        UnsupportedDockerHost: For hosts other than plain unix:// or tcp://
+    """
+
+    def __init__(
+        self, host: Optional[str] = None, timeout: Optional[float] = None
+    ) -> None:
+        self.host = host or docker_host()
+        self.timeout = timeout
+        url = urlparse(self.host)
+        if url.scheme == "unix":
+            self.family = socket.AF_UNIX
+            self.address = url.path
+        elif url.scheme in ("tcp", "http") and not os.getenv("DOCKER_TLS_VERIFY"):
+            self.family = socket.AF_INET
+            self.address = (url.hostname, url.port or 2375)
+        else:
+            raise UnsupportedDockerHost(f"Unsupported docker host: {self.host}")
+
+    def connect(self) -> socket.socket:
+        """Open a connection to the engine
+
+        Raises:
+            DockerAPIError: If the engine can't be reached
+
+        Returns:
+            socket.socket: Connected socket
+        """
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address)
+        except OSError as e:
+            sock.close()
+            raise DockerAPIError(f"Cannot connect to docker at {self.host}: {e}")
+        return sock
+
+    def request(
+        self, method: str, path: str, body: Optional[dict] = None
+    ) -> DockerResponse:
+        """Send a request and read the whole response
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path, e.g. /_ping
+            body (Optional[dict]): JSON request body
+
+        Raises:
+            DockerAPIError: If the engine can't be reached or the response is invalid
+
+        Returns:
+            DockerResponse: The response
+        """
+        with self.connect() as sock:
+            try:
+                send_request(sock, method, path, body)
+                reader = sock.makefile("rb")
+                status, headers = read_response_head(reader)
+                return DockerResponse(status, headers, read_body(reader, headers))
+            except (OSError, ValueError) as e:
+                raise DockerAPIError(f"Docker API request {method} {path} failed: {e}")
+
+    def ping(self) -> bool:
+        """Check the engine is up with GET /_ping
+
+        Returns:
+            bool: True if the engine answered OK
+        """
+        try:
+            response = self.request("GET", "/_ping")
+        except DockerAPIError:
+            return False
+        return response.status == 200
+
+    def _expect(
+        self, response: DockerResponse, *statuses: int, action: str
+    ) -> DockerResponse:
+        if response.status not in statuses:
+            try:
+                message = (response.json() or {}).get("message")
+            except ValueError:
+                message = None
+            raise DockerAPIError(
+                f"Failed to {action}: {message or response.body.decode(errors='replace')}"
+            )
+        return response
+
+    def inspect_image(self, image: str) -> Optional[dict]:
+        """Inspect a local image, with GET /images/{name}/json
+
+        Returns:
+            Optional[dict]: The image's details, or None if there is no such image
+        """
+        response = self.request("GET", f"/images/{quote(image)}/json")
+        if response.status == 404:
+            return None
+        return self._expect(response, 200, action="inspect image").json()
+
+    def image_id(self, image: str) -> Optional[str]:
+        """Look up the ID of a local image
+
+        Returns:
+            Optional[str]: e.g. sha256:..., or None if there is no such image
+        """
+        details = self.inspect_image(image)
+        return details["Id"] if details else None
+
+    def create_container(self, config: dict, name: Optional[str] = None) -> str:
+        """Create a container with POST /containers/create
+
+        Args:
+            config (dict): Container config, in the Engine API's format
+            name (Optional[str]): Container name
+
+        Returns:
+            str: The container id
+        """
+        path = "/containers/create"
+        if name:
+            path += "?" + urlencode({"name": name})
+        response = self.request("POST", path, config)
+        return self._expect(response, 201, action="create container").json()["Id"]
+
+    def start_container(self, container_id: str) -> None:
+        response = self.request("POST", f"/containers/{quote(container_id)}/start")
+        self._expect(response, 204, 304, action="start container")
+
+    def wait_container(self, container_id: str) -> int:
+        """Block until a container exits
+
+        Returns:
+            int: The container's exit code
+        """
+        response = self.request("POST", f"/containers/{quote(container_id)}/wait")
+        body = self._expect(response, 200, action="wait for container").json()
+        return int(body.get("StatusCode", 1))
+
+    def kill_container(self, container_id: str, signal: str = "SIGKILL") -> None:
+        query = urlencode({"signal": signal})
+        response = self.request(
+            "POST", f"/containers/{quote(container_id)}/kill?{query}"
+        )
+        self._expect(response, 204, 409, action="signal container")
+
+    def resize_container(self, container_id: str, height: int, width: int) -> None:
+        query = urlencode({"h": height, "w": width})
+        self.request("POST", f"/containers/{quote(container_id)}/resize?{query}")
+
+    def remove_container(self, container_id: str) -> None:
+        query = urlencode({"force": 1, "v": 1})
+        response = self.request("DELETE", f"/containers/{quote(container_id)}?{query}")
+        self._expect(response, 204, 404, action="remove container")
+
+    def attach(
+        self, container_id: str, stdin: bool = True
+    ) -> Tuple[socket.socket, BinaryIO]:
+        """Attach to a container's stdio, before it is started
+
+        The connection is hijacked for the container's raw stream. Write the
+        container's stdin to the socket, and read its output from the reader,
+        with demux() unless the container has a tty.
+
+        Args:
+            container_id (str): The container id
+            stdin (bool): Attach stdin as well as stdout and stderr
+
+        Returns:
+            Tuple[socket.socket, BinaryIO]: The socket and a reader for it
+        """
+        query = urlencode({"stream": 1, "stdin": int(stdin), "stdout": 1, "stderr": 1})
+        sock = self.connect()
+        try:
+            send_request(
+                sock,
+                "POST",
+                f"/containers/{quote(container_id)}/attach?{query}",
+                headers={"Connection": "Upgrade", "Upgrade": "tcp"},
+            )
+            reader = sock.makefile("rb")
+            status, headers = read_response_head(reader)
+            if status not in (101, 200):
+                body = read_body(reader, headers)
+                raise DockerAPIError(
+                    f"Failed to attach: {body.decode(errors='replace')}"
+                )
+        except (OSError, ValueError) as e:
+            sock.close()
+            raise DockerAPIError(f"Failed to attach: {e}")
+        except DockerAPIError:
+            sock.close()
+            raise
+        return sock, reader
+
+
+def send_request(
+    sock: socket.socket,
+    method: str,
+    path: str,
+    body: Optional[dict] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    """Write an HTTP request to a connected socket"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: docker"]
+    for name, value in (headers or {"Connection": "close"}).items():
+        lines.append(f"{name}: {value}")
+    if body is not None:
+        lines.append("Content-Type: application/json")
+    lines.append(f"Content-Length: {len(payload)}")
+    sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+
+
+def read_response_head(reader) -> Tuple[int, Dict[str, str]]:
+    """Read the status line and headers of an HTTP response
+
+    Returns:
+        Tuple[int, Dict[str, str]]: Status code and headers, with lowercase names
+    """
+    status_line = reader.readline().decode("latin-1")
+    parts = status_line.split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ValueError(f"invalid status line {status_line!r}")
+    headers = {}
+    while True:
+        line = reader.readline().decode("latin-1").rstrip("\r\n")
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+def read_body(reader, headers: Dict[str, str]) -> bytes:
+    """Read an HTTP response body, chunked, sized or until EOF"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int(reader.readline().split(b";")[0].strip(), 16)
+            if size == 0:
+                # Trailer section, ended by a blank line
+                while reader.readline().strip():
+                    pass
+                return b"".join(chunks)
+            chunks.append(reader.read(size))
+            reader.readline()
+    if "content-length" in headers:
+        return reader.read(int(headers["content-length"]))
+    return reader.read()
+
+
+def demux(reader: BinaryIO) -> Iterator[Tuple[int, bytes]]:
+    """Split a multiplexed attach stream into (stream, data) frames
+
+    Args:
+        reader (BinaryIO): Reader returned by DockerClient.attach
+
+    Yields:
+        Tuple[int, bytes]: STDOUT or STDERR, and the frame's data
+    """
+    while True:
+        header = reader.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        stream, size = FRAME_HEADER.unpack(header)
+        data = reader.read(size)
+        yield stream, data
+        if len(data) < size:
+            return
+
+
+def engine_ready(host: Optional[str] = None) -> bool:
+    """Check the Docker engine is running, caching success for READY_TTL seconds
+
+    Args:
+        host (Optional[str]): Docker host URL, defaults to docker_host()
+
+    Raises:
+        UnsupportedDockerHost: If the host can't be probed over the API
+
+    Returns:
+        bool: True if the engine answered /_ping
+    """
+    client = DockerClient(host, timeout=PING_TIMEOUT)
+    cached = cache.read_json(READY_CACHE)
+    if (
+        isinstance(cached, dict)
+        and cached.get("host") == client.host
+        and 0 <= time.time() - cached.get("checked_at", 0) < READY_TTL
+    ):
+        return True
+
+    if not client.ping():
+        cache.remove(READY_CACHE)
+        return False
+    cache.write_json(READY_CACHE, {"host": client.host, "checked_at": time.time()})
+    return True
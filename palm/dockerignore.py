@@ -0,0 +1,132 @@
+"""Match paths against .dockerignore patterns, as the docker CLI does
+
+Patterns are relative to the build context. ``*`` and ``?`` stay within a
+path segment, ``**`` spans any number of segments, and a pattern which
+matches a directory excludes everything under it. Patterns starting with
+``!`` re-include paths, and the last matching pattern wins.
+"""
+import os
+import posixpath
+import re
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+
+def translate(pattern: str) -> "re.Pattern":
+    """Compile a .dockerignore pattern, which also matches everything below it"""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += f"[{pattern[i + 1 : end]}]"
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(f"{regex}(?:/.*)?\\Z")
+
+
+class DockerIgnore:
+    """The exclusion rules of a build context
+
+    Args:
+        patterns (List[str]): Lines of a .dockerignore file
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.patterns: List[str] = []
+        self.rules: List[Tuple[bool, "re.Pattern"]] = []
+        for line in patterns:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            exception = line.startswith("!")
+            if exception:
+                line = line[1:].strip()
+            line = posixpath.normpath(line).lstrip("/")
+            if line in ("", "."):
+                continue
+            self.patterns.append(("!" if exception else "") + line)
+            self.rules.append((exception, translate(line)))
+        self.has_exceptions = any(exception for exception, _ in self.rules)
+
+    @classmethod
+    def load(cls, context: Path, dockerfile: Optional[Path] = None) -> "DockerIgnore":
+        """Read the rules for a build, from <Dockerfile>.dockerignore or .dockerignore
+
+        Args:
+            context (Path): The build context directory
+            dockerfile (Optional[Path]): The Dockerfile, whose own ignore file wins
+
+        Returns:
+            DockerIgnore: The rules, empty if there is no ignore file
+        """
+        candidates = [context / ".dockerignore"]
+        if dockerfile is not None:
+            candidates.insert(
+                0, dockerfile.with_name(dockerfile.name + ".dockerignore")
+            )
+        for candidate in candidates:
+            try:
+                return cls(candidate.read_text().splitlines())
+            except OSError:
+                continue
+        return cls([])
+
+    def is_excluded(self, path: str) -> bool:
+        """Check whether a path, relative to the context, is left out of the build"""
+        excluded = False
+        for exception, rule in self.rules:
+            if exception == excluded and rule.match(path):
+                excluded = not exception
+        return excluded
+
+    def walk(self, root: Path) -> Iterator[str]:
+        """Files in the build context which aren't excluded
+
+        Excluded directories are skipped, unless an exception could re-include
+        something inside them.
+
+        Args:
+            root (Path): The build context directory
+
+        Yields:
+            str: Paths relative to root, with forward slashes
+        """
+        stack = [""]
+        while stack:
+            relative_dir = stack.pop()
+            try:
+                entries = list(os.scandir(root / relative_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                relative = (
+                    f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                )
+                excluded = self.is_excluded(relative)
+                if entry.is_dir(follow_symlinks=False):
+                    if not excluded or self.has_exceptions:
+                        stack.append(relative)
+                elif not excluded:
+                    yield relative
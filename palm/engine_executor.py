@@ -0,0 +1,291 @@
+"""Run palm commands in docker through the Engine API
+
+With ``docker_executor: engine`` in .palm/config.yaml, palm creates, attaches
+to, starts, waits for and removes the command's container itself over the
+Docker socket, instead of running ``docker compose run``. The container is
+configured from the project's resolved compose service (see
+:obj:`palm.compose_spec.ComposeSpec`): image, volumes, environment, env files,
+working directory and ports.
+"""
+import os
+import shlex
+import signal
+import socket
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from palm.cache_volume import CacheVolume
+from palm.compose_spec import (
+    ComposeSpec,
+    entrypoint,
+    service_binds,
+    service_environment,
+    service_ports,
+)
+from palm.docker_api import STDERR, DockerAPIError, DockerClient, demux
+from palm.palm_config import PalmConfig
+
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT")
+
+
+def container_config(
+    service: dict,
+    project_root: Path,
+    argv: List[str],
+    env: Dict[str, str],
+    tty: bool,
+    publish_ports: bool = True,
+) -> dict:
+    """Engine API container config for running argv in a compose service
+
+    Args:
+        service (dict): The resolved compose service
+        project_root (Path): Directory containing the compose file
+        argv (List[str]): Command to run
+        env (Dict[str, str]): Extra environment variables for the command
+        tty (bool): Allocate a tty
+        publish_ports (bool): Publish the service's ports on the host
+
+    Returns:
+        dict: Body for POST /containers/create
+    """
+    environment = {**service_environment(service, project_root), **env}
+    exposed, bindings = service_ports(service) if publish_ports else ({}, {})
+    config = {
+        "Image": service["image"],
+        "Cmd": argv,
+        "Env": [f"{key}={value}" for key, value in environment.items()],
+        "Tty": tty,
+        "OpenStdin": True,
+        "StdinOnce": True,
+        "AttachStdin": True,
+        "AttachStdout": True,
+        "AttachStderr": True,
+        "ExposedPorts": exposed,
+        "HostConfig": {
+            "Binds": service_binds(service, project_root),
+            "PortBindings": bindings,
+        },
+    }
+    if service.get("working_dir"):
+        config["WorkingDir"] = service["working_dir"]
+    if entrypoint(service) is not None:
+        config["Entrypoint"] = entrypoint(service)
+    if service.get("user"):
+        config["User"] = str(service["user"])
+    return config
+
+
+class EngineExecutor:
+    """Runs commands in a new container per command, over the Engine API
+
+    Args:
+        palm_config (PalmConfig): The project's config
+        client (Optional[DockerClient]): Docker API client
+    """
+
+    def __init__(
+        self, palm_config: PalmConfig, client: Optional[DockerClient] = None
+    ) -> None:
+        self.palm = palm_config
+        self.client = client or DockerClient()
+
+    def argv(self, cmd: str, no_bin_bash: bool) -> List[str]:
+        """Container command for a palm command string"""
+        if no_bin_bash:
+            return shlex.split(cmd)
+        return ["/bin/bash", "-c", cmd]
+
+    def run(
+        self,
+        cmd: str,
+        env_vars: Optional[List[str]] = [],
+        no_bin_bash: Optional[bool] = False,
+        capture_output: Optional[bool] = False,
+        silent: Optional[bool] = False,
+        service_ports: Optional[bool] = True,
+    ) -> Tuple[bool, str]:
+        """Run a command in a new container of the project's compose service
+
+        Takes the same arguments and returns the same results as
+        :obj:`palm.utils.run_in_docker`.
+        """
+        if not silent:
+            click.secho(f"Executing command `{cmd}` in docker...", fg="yellow")
+        env = dict(var[len("-e ") :].partition("=")[::2] for var in env_vars)
+        try:
+            exit_code, stdout, stderr = self.execute(
+                self.argv(cmd, no_bin_bash), env, capture_output, service_ports
+            )
+        except DockerAPIError as e:
+            click.secho(str(e), fg="red")
+            return (False, str(e))
+
+        if capture_output:
+            if exit_code == 0:
+                return (True, stdout)
+            return (False, stderr)
+
+        if exit_code == 0:
+            return (True, "Success! Palm completed with exit code 0")
+        return (False, f"Fail! Palm exited with code {exit_code}")
+
+    def execute(
+        self,
+        argv: List[str],
+        env: Dict[str, str],
+        capture_output: bool = False,
+        publish_ports: bool = True,
+    ) -> Tuple[int, str, str]:
+        """Create, attach to, start, wait for and remove a container
+
+        Output is streamed to this process's stdout and stderr as it arrives,
+        unless capture_output is set. Signals received while the container
+        runs are forwarded to it.
+
+        Returns:
+            Tuple[int, str, str]: exit code, stdout, stderr
+        """
+        tty = not capture_output and sys.stdin.isatty() and sys.stdout.isatty()
+        service = CacheVolume(self.palm).apply(ComposeSpec(self.palm).service())
+        config = container_config(
+            service, self.palm.project_root, argv, env, tty, publish_ports
+        )
+        container_id = self.client.create_container(config)
+        try:
+            sock, reader = self.client.attach(container_id)
+            with sock:
+                output = _Output(capture_output)
+                stdin = _StdinPump(sock, tty)
+                self.client.start_container(container_id)
+                if tty:
+                    self._resize(container_id)
+                with _forward_signals(self.client, container_id), stdin:
+                    if tty:
+                        for chunk in iter(lambda: reader.read1(65536), b""):
+                            output.write(1, chunk)
+                    else:
+                        for stream, data in demux(reader):
+                            output.write(stream, data)
+            exit_code = self.client.wait_container(container_id)
+        finally:
+            try:
+                self.client.remove_container(container_id)
+            except DockerAPIError:
+                pass
+        return exit_code, output.stdout(), output.stderr()
+
+    def _resize(self, container_id: str) -> None:
+        try:
+            size = os.get_terminal_size(sys.stdout.fileno())
+            self.client.resize_container(container_id, size.lines, size.columns)
+        except (OSError, DockerAPIError):
+            pass
+
+
+class _Output:
+    """Streams container output to this process, or captures it"""
+
+    def __init__(self, capture: bool) -> None:
+        self.capture = capture
+        self.chunks = {1: [], STDERR: []}
+
+    def write(self, stream: int, data: bytes) -> None:
+        if self.capture:
+            self.chunks[STDERR if stream == STDERR else 1].append(data)
+            return
+        fd = sys.stderr.fileno() if stream == STDERR else sys.stdout.fileno()
+        os.write(fd, data)
+
+    def stdout(self) -> str:
+        return b"".join(self.chunks[1]).decode("utf-8", errors="replace")
+
+    def stderr(self) -> str:
+        return b"".join(self.chunks[STDERR]).decode("utf-8", errors="replace")
+
+
+class _StdinPump:
+    """Copies this process's stdin to the container in a background thread
+
+    With a tty, the terminal is switched to raw mode, so keys (including
+    Ctrl-C) go to the container's tty as they are typed.
+    """
+
+    def __init__(self, sock, tty: bool) -> None:
+        self.sock = sock
+        self.tty = tty
+        self.saved_mode = None
+
+    def __enter__(self) -> "_StdinPump":
+        try:
+            fd = sys.stdin.fileno()
+        except (OSError, ValueError):
+            self._close_stdin()
+            return self
+        if self.tty:
+            import termios
+            import tty
+
+            self.saved_mode = termios.tcgetattr(fd)
+            tty.setraw(fd)
+        elif sys.stdin.isatty():
+            # Nothing is piped in, don't hold the container's stdin open
+            self._close_stdin()
+            return self
+        threading.Thread(target=self._pump, args=(fd,), daemon=True).start()
+        return self
+
+    def _pump(self, fd: int) -> None:
+        try:
+            while True:
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                self.sock.sendall(data)
+        except OSError:
+            return
+        self._close_stdin()
+
+    def _close_stdin(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    def __exit__(self, *exc) -> None:
+        if self.saved_mode is not None:
+            import termios
+
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self.saved_mode)
+
+
+class _forward_signals:
+    """Forwards signals received while a container runs to the container"""
+
+    def __init__(self, client: DockerClient, container_id: str) -> None:
+        self.client = client
+        self.container_id = container_id
+        self.previous = {}
+
+    def _forward(self, signum, frame) -> None:
+        try:
+            self.client.kill_container(self.container_id, signal.Signals(signum).name)
+        except DockerAPIError:
+            pass
+
+    def __enter__(self) -> "_forward_signals":
+        if threading.current_thread() is not threading.main_thread():
+            return self
+        for name in FORWARDED_SIGNALS:
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                self.previous[signum] = signal.signal(signum, self._forward)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for signum, handler in self.previous.items():
+            signal.signal(signum, handler)
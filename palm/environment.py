@@ -1,15 +1,21 @@
-import importlib
+import importlib.util
+import json
+import os
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 import click
-from pydantic import BaseModel
 
 from palm.plugin_manager import PluginManager
 from palm.utils import run_on_host, run_in_docker
 
-from .code_generator import CodeGenerator
 from .palm_config import PalmConfig
+from .palm_exceptions import InvalidConfigError
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from .result_cache import InputSpec, ResultCache
 
 
 class Environment:
@@ -17,6 +23,9 @@ class Environment:
         self.home = Path.cwd()
         self.palm = palm_config
         self.plugin_manager = plugin_manager
+        # Set by palm --no-cache and palm --force
+        self.use_result_cache = True
+        self.force = False
 
     def run_in_docker(
         self,
@@ -24,10 +33,94 @@ class Environment:
         env_vars: Optional[dict] = {},
         no_bin_bash: Optional[bool] = False,
         silent: Optional[bool] = False,
+        service_ports: Optional[bool] = None,
+        cache_inputs: Optional[Union["InputSpec", dict, list]] = None,
     ) -> Tuple[bool, str]:
-        env_vars_list = self._build_env_vars(env_vars)
+        """Run a command in the project's docker service
+
+        Args:
+            cmd (str): The command to run
+            env_vars (Optional[dict]): Env vars to pass to the container
+            no_bin_bash (Optional[bool]): Run cmd directly instead of with /bin/bash -c
+            silent (Optional[bool]): Capture the command's output instead of
+                streaming it, and don't print the command
+            service_ports (Optional[bool]): Publish the service's ports on the host.
+                Defaults to on, unless PALM_NO_SERVICE_PORTS is set (palm run sets
+                it for parallel tasks)
+            cache_inputs (Optional[Union[InputSpec, dict, list]]): Opt in to the
+                result cache, with the files and env vars the result depends on.
+                See :obj:`palm.result_cache.InputSpec`
+
+        Returns:
+            Tuple[bool, str]: Success, and a message or the captured output
+        """
+        if service_ports is None:
+            service_ports = not os.getenv("PALM_NO_SERVICE_PORTS")
+        env_vars_list = self._build_env_vars({**self._task_env(), **env_vars})
+
+        def run() -> Tuple[bool, str]:
+            return self._run_in_docker(
+                cmd, env_vars_list, no_bin_bash, silent, service_ports
+            )
+
+        store = self.result_cache() if cache_inputs is not None else None
+        if store is None:
+            return run()
+        from .result_cache import InputSpec, cached_run
+
+        spec = InputSpec.parse(cache_inputs)
+        image_id = self.docker_image_id() if spec.image else None
+        if spec.image and image_id is None:
+            # Without the image ID a hit could replay a result from another image
+            return run()
+        command = {
+            "kind": "docker",
+            "cmd": cmd,
+            "env_vars": env_vars_list,
+            "no_bin_bash": no_bin_bash,
+            "silent": silent,
+        }
+        return cached_run(store, command, spec, run, image_id, force=self.force)
+
+    def _run_in_docker(
+        self,
+        cmd: str,
+        env_vars_list: List[str],
+        no_bin_bash: bool,
+        silent: bool,
+        service_ports: bool,
+    ) -> Tuple[bool, str]:
+        from .cache_volume import CacheVolume
+
+        try:
+            executor = self.palm.docker_executor
+        except InvalidConfigError as error:
+            raise click.ClickException(error.message)
+        if executor == "warm":
+            from .warm_container import WarmContainer
+
+            # docker exec runs in the warm container, which publishes its ports
+            return WarmContainer(self.palm).run(cmd, env_vars_list, no_bin_bash, silent)
+        if executor == "docker-run":
+            from .compose_spec import DockerRunExecutor
+
+            return DockerRunExecutor(self.palm).run(
+                cmd, env_vars_list, no_bin_bash, silent, service_ports=service_ports
+            )
+        if executor == "engine":
+            from .engine_executor import EngineExecutor
+
+            return EngineExecutor(self.palm).run(
+                cmd, env_vars_list, no_bin_bash, silent, service_ports=service_ports
+            )
         return run_in_docker(
-            cmd, self.palm.image_name, env_vars_list, no_bin_bash, silent
+            cmd,
+            self.palm.image_name,
+            env_vars_list,
+            no_bin_bash,
+            silent,
+            service_ports=service_ports,
+            extra_args=CacheVolume(self.palm).compose_flags(),
         )
 
     def run_on_host(
@@ -35,9 +128,59 @@ class Environment:
         cmd: str,
         check: Optional[bool] = False,
         capture_output: Optional[bool] = False,
+        cache_inputs: Optional[Union["InputSpec", dict, list]] = None,
     ) -> Tuple[int, str, str]:
-        """context wrapper for :obj:`palm.utils.run_on_host`"""
-        return run_on_host(cmd, check, capture_output)
+        """context wrapper for :obj:`palm.utils.run_on_host`
+
+        Pass cache_inputs to opt in to the result cache, as for run_in_docker.
+        """
+        store = self.result_cache() if cache_inputs is not None else None
+        if store is None:
+            return run_on_host(cmd, check, capture_output)
+        from .result_cache import InputSpec, cached_run
+
+        command = {
+            "kind": "host",
+            "cmd": cmd,
+            "check": check,
+            "capture_output": capture_output,
+        }
+        return cached_run(
+            store,
+            command,
+            InputSpec.parse(cache_inputs),
+            lambda: run_on_host(cmd, check, capture_output),
+            capture=not capture_output,
+            force=self.force,
+        )
+
+    def result_cache(self) -> Optional["ResultCache"]:
+        """The command result store, configured by result_cache in .palm/config.yaml
+
+        Returns:
+            Optional[ResultCache]: The store, or None if caching is turned off
+        """
+        from .result_cache import DEFAULT_MAX_SIZE_MB, ResultCache
+
+        settings = self.palm.config.get("result_cache", {})
+        if settings is False:
+            return None
+        settings = settings or {}
+        if not self.use_result_cache or not settings.get("enabled", True):
+            return None
+        max_size_mb = int(settings.get("max_size_mb") or DEFAULT_MAX_SIZE_MB)
+        return ResultCache(self.palm.project_root, max_size_mb)
+
+    def docker_image_id(self) -> Optional[str]:
+        """ID of the image the project's docker commands run in, if it exists"""
+        from .compose_spec import ComposeSpec
+        from .docker_api import DockerAPIError, DockerClient
+
+        try:
+            image = ComposeSpec(self.palm).service()["image"]
+            return DockerClient().image_id(image)
+        except (click.ClickException, DockerAPIError):
+            return None
 
     def import_module(self, module_name: str, module_path: Path):
         """Imports a module from a path
@@ -74,10 +217,31 @@ class Environment:
             target_path (Path): Path to the directory where the generated code will be written
             replacements (dict): Dict of replacements to make in the template
 
+        Templates are rendered and written concurrently if codegen.workers in
+        .palm/config.yaml is more than 1.
+
         Returns:
             str: The path to the generated code
         """
-        return CodeGenerator(template_path, target_path, replacements).run()
+        # jinja2 is only needed for code generation, import it on demand
+        from .code_generator import CodeGenerator
+
+        settings = self.palm.config.get("codegen") or {}
+        return CodeGenerator(
+            template_path,
+            target_path,
+            replacements,
+            workers=int(settings.get("workers") or 1),
+            pool=settings.get("pool") or "thread",
+            writers=int(settings.get("writers") or 4),
+        ).run()
+
+    def _task_env(self) -> dict:
+        """Env vars of the palm run task this process is running, if any"""
+        try:
+            return json.loads(os.getenv("PALM_TASK_ENV") or "{}")
+        except ValueError:
+            return {}
 
     def _build_env_vars(self, env_vars: dict) -> List[str]:
         env_vars_list = []
@@ -85,7 +249,7 @@ class Environment:
             env_vars_list.append(f"-e {key.upper()}={env_vars[key]}")
         return env_vars_list
 
-    def plugin_config(self, plugin_name: str) -> Optional[BaseModel]:
+    def plugin_config(self, plugin_name: str) -> Optional["BaseModel"]:
         """Returns the config for a plugin
 
         Args:
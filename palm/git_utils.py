@@ -0,0 +1,242 @@
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Set
+
+if TYPE_CHECKING:
+    from pygit2 import Repository
+
+# Prefixes stripped from a ref name to get its shorthand, as git and pygit2 do
+SHORTHAND_PREFIXES = ("refs/heads/", "refs/tags/", "refs/remotes/", "refs/")
+
+
+def find_git_dir(start: Path) -> Optional[Path]:
+    """Find the git directory for a path, without loading libgit2
+
+    Walks up from start looking for a .git directory, a .git file pointing at
+    the real git dir (worktrees and submodules), or a bare repository.
+
+    Args:
+        start (Path): Directory to start searching from
+
+    Returns:
+        Optional[Path]: The git directory, or None if start is not in a repository
+    """
+    start = Path(start).absolute()
+    for directory in (start, *start.parents):
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return dot_git
+        if dot_git.is_file():
+            git_dir = _read_gitdir_file(dot_git)
+            if git_dir:
+                return git_dir
+        if _is_bare_repository(directory):
+            return directory
+    return None
+
+
+def _read_gitdir_file(path: Path) -> Optional[Path]:
+    try:
+        content = path.read_text().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    return (path.parent / content[len("gitdir:") :].strip()).resolve()
+
+
+def _is_bare_repository(directory: Path) -> bool:
+    return (
+        (directory / "HEAD").is_file()
+        and (directory / "objects").is_dir()
+        and (directory / "refs").is_dir()
+    )
+
+
+def common_dir(git_dir: Path) -> Path:
+    """Get the directory holding refs shared by all worktrees of a repository
+
+    Args:
+        git_dir (Path): A git directory from find_git_dir
+
+    Returns:
+        Path: The common git directory, git_dir itself unless it is a worktree
+    """
+    try:
+        common = (git_dir / "commondir").read_text().strip()
+    except OSError:
+        return git_dir
+    return (git_dir / common).resolve()
+
+
+def ref_exists(git_dir: Path, ref: str) -> bool:
+    """Check whether a ref exists, as a loose ref or in packed-refs
+
+    Args:
+        git_dir (Path): A git directory from find_git_dir
+        ref (str): Full ref name, e.g. refs/heads/main
+
+    Returns:
+        bool: True if the ref exists
+    """
+    for directory in dict.fromkeys((git_dir, common_dir(git_dir))):
+        if (directory / ref).is_file():
+            return True
+        try:
+            packed_refs = (directory / "packed-refs").read_text()
+        except (OSError, UnicodeDecodeError):
+            continue
+        for line in packed_refs.splitlines():
+            if line.endswith(f" {ref}") and not line.startswith(("#", "^")):
+                return True
+    return False
+
+
+def shorthand(ref: str) -> str:
+    """Short name for a ref, e.g. refs/heads/main -> main"""
+    for prefix in SHORTHAND_PREFIXES:
+        if ref.startswith(prefix):
+            return ref[len(prefix) :]
+    return ref
+
+
+def read_head(git_dir: Path) -> Optional[str]:
+    """Read the current branch name from HEAD
+
+    Args:
+        git_dir (Path): A git directory from find_git_dir
+
+    Returns:
+        Optional[str]: Branch shorthand, "HEAD" if HEAD is detached, or None
+        if HEAD can't be resolved without libgit2 (e.g. an unborn branch or
+        an unfamiliar ref storage format)
+    """
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    if head.startswith("ref:"):
+        ref = head[len("ref:") :].strip()
+        if not ref_exists(git_dir, ref):
+            return None
+        return shorthand(ref)
+    if len(head) in (40, 64) and all(c in "0123456789abcdef" for c in head):
+        return "HEAD"
+    return None
+
+
+def resolve_commit(repo: "Repository", ref: str) -> Optional[str]:
+    """Resolve a ref or revision to a commit ID
+
+    Args:
+        repo (Repository): The pygit2 repository
+        ref (str): Anything git rev-parse accepts, e.g. main, HEAD~2 or a SHA
+
+    Returns:
+        Optional[str]: The commit's hex ID, or None if ref doesn't name a commit
+    """
+    from pygit2 import Commit, GitError
+
+    try:
+        return str(repo.revparse_single(ref).peel(Commit).id)
+    except (KeyError, ValueError, GitError):
+        return None
+
+
+def relative_paths(
+    repo: "Repository", paths: Iterable[str], root: Optional[Path] = None
+) -> Set[str]:
+    """Make paths relative to the repository's working directory relative to root
+
+    Args:
+        repo (Repository): The pygit2 repository
+        paths (Iterable[str]): Paths relative to the working directory
+        root (Optional[Path]): A directory in the working tree, paths outside it
+            are dropped. Defaults to the working directory itself
+
+    Returns:
+        Set[str]: Paths relative to root, with forward slashes
+    """
+    if root is None:
+        return set(paths)
+    relative = set()
+    for path in paths:
+        within = os.path.relpath(os.path.join(repo.workdir, path), root)
+        within = within.replace(os.sep, "/")
+        if within != ".." and not within.startswith("../"):
+            relative.add(within)
+    return relative
+
+
+def tracked_files(repo: "Repository", root: Optional[Path] = None) -> Set[str]:
+    """Files in the index, like ``git ls-files``
+
+    Args:
+        repo (Repository): The pygit2 repository
+        root (Optional[Path]): Only files under this directory, see relative_paths
+
+    Returns:
+        Set[str]: Paths of tracked files
+    """
+    return relative_paths(repo, (entry.path for entry in repo.index), root)
+
+
+def project_files(repo: "Repository", root: Optional[Path] = None) -> Set[str]:
+    """Tracked files, plus untracked files which aren't ignored
+
+    Args:
+        repo (Repository): The pygit2 repository
+        root (Optional[Path]): Only files under this directory, see relative_paths
+
+    Returns:
+        Set[str]: Paths of files in the working tree
+    """
+    from pygit2 import GIT_STATUS_WT_DELETED, GIT_STATUS_WT_NEW
+
+    files = {entry.path for entry in repo.index}
+    for path, status in repo.status().items():
+        if status & GIT_STATUS_WT_NEW:
+            files.add(path)
+        elif status & GIT_STATUS_WT_DELETED:
+            files.discard(path)
+    return relative_paths(repo, files, root)
+
+
+def changed_files(
+    repo: "Repository", base: str, root: Optional[Path] = None
+) -> Set[str]:
+    """Files which differ between a commit and the working tree
+
+    Like ``git diff --name-only base``, plus untracked files, so both staged
+    and unstaged changes are included. Both sides of renames are included.
+
+    Args:
+        repo (Repository): The pygit2 repository
+        base (str): Commit to compare with, anything git rev-parse accepts
+        root (Optional[Path]): Only files under this directory, see relative_paths
+
+    Returns:
+        Set[str]: Paths relative to root, by default the working directory
+
+    Raises:
+        KeyError: If base doesn't name a commit
+    """
+    from pygit2 import (
+        GIT_DIFF_INCLUDE_UNTRACKED,
+        GIT_DIFF_RECURSE_UNTRACKED_DIRS,
+        Commit,
+    )
+
+    commit_id = resolve_commit(repo, base)
+    if commit_id is None:
+        raise KeyError(base)
+    tree = repo[commit_id].peel(Commit).tree
+    diff = tree.diff_to_workdir(
+        GIT_DIFF_INCLUDE_UNTRACKED | GIT_DIFF_RECURSE_UNTRACKED_DIRS
+    )
+    changed = set()
+    for delta in diff.deltas:
+        changed.add(delta.old_file.path)
+        changed.add(delta.new_file.path)
+    return relative_paths(repo, changed, root)
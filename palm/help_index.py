@@ -0,0 +1,279 @@
+import ast
+import os
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional
+
+import click
+
+from palm import cache
+
+# Decorators which turn the `cli` function into a click command
+COMMAND_DECORATORS = ("command", "group")
+# Decorator keywords which only affect how the command runs, not its help entry
+IGNORED_KEYWORDS = ("context_settings", "invoke_without_command", "chain")
+HELP_KEYWORDS = ("name", "help", "short_help", "hidden", "deprecated")
+# What palm prepares before running a command, unless the command module
+# declares a narrower set with a module-level `requires`
+ALL_REQUIREMENTS = frozenset({"config", "docker", "git"})
+
+
+def extract_command_info(source: str) -> Optional[dict]:
+    """Statically extract the help entry for a command module
+
+    Reads the name, help, short_help, hidden and deprecated attributes from the
+    click decorator on the module's ``cli`` function, and its docstring,
+    without executing the module.
+
+    Args:
+        source (str): Source code of a cmd_*.py module
+
+    Returns:
+        Optional[dict]: The extracted attributes, or None if they can't be
+        determined statically (e.g. non-literal arguments or a custom class)
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    functions = [
+        node
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        and node.name == "cli"
+    ]
+    reassigned = any(
+        isinstance(
+            node, (ast.Assign, ast.AnnAssign, ast.ClassDef, ast.Import, ast.ImportFrom)
+        )
+        and "cli" in _bound_names(node)
+        for node in tree.body
+    )
+    if len(functions) != 1 or reassigned:
+        return None
+
+    decorators = [d for d in functions[0].decorator_list if _is_command_decorator(d)]
+    if len(decorators) != 1:
+        return None
+
+    info = _decorator_arguments(decorators[0])
+    if info is None:
+        return None
+    if info.get("help") is None:
+        info["help"] = ast.get_docstring(functions[0], clean=False)
+    return info
+
+
+def extract_requirements(source: str) -> Optional[FrozenSet[str]]:
+    """Statically read the module-level ``requires`` declaration of a command
+
+    e.g. ``requires = {"config", "git"}``. Modules without a declaration
+    require everything.
+
+    Args:
+        source (str): Source code of a cmd_*.py module
+
+    Returns:
+        Optional[FrozenSet[str]]: The declared requirements, or None if they
+        can't be determined statically
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    bindings = [
+        node
+        for node in tree.body
+        if isinstance(
+            node,
+            (
+                ast.Assign,
+                ast.AnnAssign,
+                ast.AugAssign,
+                ast.ClassDef,
+                ast.FunctionDef,
+                ast.Import,
+                ast.ImportFrom,
+            ),
+        )
+        and "requires" in _bound_names(node)
+    ]
+    if not bindings:
+        return ALL_REQUIREMENTS
+    if len(bindings) != 1 or not isinstance(bindings[0], (ast.Assign, ast.AnnAssign)):
+        return None
+
+    try:
+        requires = ast.literal_eval(bindings[0].value)
+    except ValueError:
+        return None
+    if not isinstance(requires, (set, frozenset, list, tuple)) or not all(
+        isinstance(name, str) for name in requires
+    ):
+        return None
+    return frozenset(requires)
+
+
+def _bound_names(node: ast.AST) -> set:
+    if isinstance(node, ast.Assign):
+        return {t.id for t in node.targets if isinstance(t, ast.Name)}
+    if isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(
+        node.target, ast.Name
+    ):
+        return {node.target.id}
+    if isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+        return {node.name}
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in node.names}
+    return set()
+
+
+def _is_command_decorator(node: ast.AST) -> bool:
+    target = node.func if isinstance(node, ast.Call) else node
+    if isinstance(target, ast.Attribute):
+        return (
+            isinstance(target.value, ast.Name)
+            and target.value.id == "click"
+            and target.attr in COMMAND_DECORATORS
+        )
+    return isinstance(target, ast.Name) and target.id in COMMAND_DECORATORS
+
+
+def _decorator_arguments(node: ast.AST) -> Optional[dict]:
+    info = {"name": None}
+    if not isinstance(node, ast.Call):
+        return info
+
+    if len(node.args) > 1:
+        return None
+    try:
+        if node.args:
+            info["name"] = ast.literal_eval(node.args[0])
+        for keyword in node.keywords:
+            if keyword.arg in IGNORED_KEYWORDS:
+                continue
+            # **kwargs, cls=... and anything else we don't understand
+            if keyword.arg not in HELP_KEYWORDS:
+                return None
+            info[keyword.arg] = ast.literal_eval(keyword.value)
+    except ValueError:
+        return None
+
+    if info["name"] is not None and not isinstance(info["name"], str):
+        return None
+    return info
+
+
+class HelpIndex:
+    """On-disk index of command help entries and requirements, keyed on
+    command file path
+
+    Entries are validated against the file's stat signature, so a command
+    module is only parsed again when it changes. Modules which can't be
+    understood statically are recorded as such, and the caller falls back to
+    importing them.
+    """
+
+    FILE_NAME = "help_index.json"
+    VERSION = 2
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        self._loaded = False
+
+    def load(self) -> None:
+        """Read the index from the cache directory, ignoring invalid files"""
+        data = cache.read_json(self.FILE_NAME)
+        if isinstance(data, dict) and data.get("version") == self.VERSION:
+            self.entries = data.get("entries") or {}
+        self._loaded = True
+
+    def _entry(self, path: Path) -> Optional[dict]:
+        if not self._loaded:
+            self.load()
+
+        key = os.path.abspath(path)
+        signature = cache.stat_signature(key)
+        if signature is None:
+            return None
+        entry = self.entries.get(key)
+        if entry and entry.get("signature") == signature:
+            return entry
+
+        try:
+            source = Path(key).read_text()
+        except (OSError, UnicodeDecodeError):
+            return None
+        requires = extract_requirements(source)
+        entry = {
+            "signature": signature,
+            "info": extract_command_info(source),
+            "requires": sorted(requires) if requires is not None else None,
+        }
+        if not cache.is_racy(signature):
+            self.entries[key] = entry
+            self.dirty = True
+        return entry
+
+    def info(self, path: Path) -> Optional[dict]:
+        """Get the statically extracted attributes for a command module
+
+        Args:
+            path (Path): Path to the cmd_*.py module
+
+        Returns:
+            Optional[dict]: Attributes from extract_command_info, or None if
+            the module can't be read or understood statically
+        """
+        entry = self._entry(path)
+        return entry["info"] if entry else None
+
+    def requirements(self, path: Path) -> Optional[FrozenSet[str]]:
+        """Get the statically declared requirements of a command module
+
+        Args:
+            path (Path): Path to the cmd_*.py module
+
+        Returns:
+            Optional[FrozenSet[str]]: Requirements from extract_requirements,
+            or None if the module can't be read or understood statically
+        """
+        entry = self._entry(path)
+        if not entry or entry["requires"] is None:
+            return None
+        return frozenset(entry["requires"])
+
+    def command(self, path: Path) -> Optional[click.Command]:
+        """Build a help-only click Command for a command module
+
+        The returned command has no callback or params, it only supports
+        what is needed to list it on the help page.
+
+        Args:
+            path (Path): Path to the cmd_*.py module
+
+        Returns:
+            Optional[click.Command]: The help-only command, or None if the module
+            must be imported to find out
+        """
+        info = self.info(path)
+        if info is None:
+            return None
+        return click.Command(
+            info["name"],
+            help=info.get("help"),
+            short_help=info.get("short_help"),
+            hidden=bool(info.get("hidden", False)),
+            deprecated=info.get("deprecated", False),
+        )
+
+    def save(self) -> None:
+        """Write the index to the cache directory if it has changed"""
+        if not self.dirty:
+            return
+        cache.write_json(
+            self.FILE_NAME, {"version": self.VERSION, "entries": self.entries}
+        )
+        self.dirty = False
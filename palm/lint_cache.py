@@ -0,0 +1,113 @@
+"""Skip files black has already formatted
+
+``palm lint`` records the content hash of each file once black has formatted
+it, together with a hash of everything else which affects black's output: its
+arguments, the project's pyproject.toml and the docker image (so black's
+version). Files with a
+recorded hash aren't passed to black again until they change.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from palm import cache
+from palm.result_cache import ResultCache
+
+# In the project cache directory
+LIST_FILE = "lint_files"
+# Black's default exclusion for palm projects: templates aren't valid python
+EXCLUDE = r"\.tpl\.py"
+
+
+def is_lintable(path: str) -> bool:
+    return path.endswith((".py", ".pyi")) and not path.endswith(".tpl.py")
+
+
+class LintCache:
+    """Content hashes of the files black has formatted, per project
+
+    Args:
+        project_root (Path): The project's root directory
+        settings (dict): Everything besides the file which affects the result
+    """
+
+    DIRECTORY = "lint"
+    VERSION = 1
+
+    def __init__(self, project_root: Path, settings: dict) -> None:
+        self.project_root = project_root
+        digest = hashlib.sha1(str(project_root).encode()).hexdigest()
+        self.name = f"{self.DIRECTORY}/{digest}.json"
+        try:
+            pyproject = (project_root / "pyproject.toml").read_bytes()
+        except OSError:
+            pyproject = b""
+        document = {
+            "version": self.VERSION,
+            "command": black_command(None, project_root),
+            "settings": settings,
+            "pyproject": hashlib.sha256(pyproject).hexdigest(),
+        }
+        self.settings = hashlib.sha256(
+            json.dumps(document, sort_keys=True).encode()
+        ).hexdigest()
+        stored = cache.read_json(self.name)
+        self.formatted: Dict[str, str] = {}
+        if isinstance(stored, dict) and stored.get("settings") == self.settings:
+            self.formatted = stored["formatted"]
+        self.hashes: Dict[str, str] = {}
+
+    def _hash(self, files: List[str]) -> Dict[str, str]:
+        # Shares the result cache's stat-memoized hashes of project files
+        return ResultCache(self.project_root).hash_files(files)
+
+    def stale(self, files: Iterable[str]) -> List[str]:
+        """Files which aren't recorded as formatted at their current content
+
+        Args:
+            files (Iterable[str]): Paths relative to the project root
+
+        Returns:
+            List[str]: The files black needs to run on, sorted
+        """
+        self.hashes = self._hash(sorted(set(files)))
+        return [
+            name
+            for name, digest in sorted(self.hashes.items())
+            if self.formatted.get(name) != digest
+        ]
+
+    def record(self, files: Iterable[str]) -> None:
+        """Record files as formatted, at their content after black ran"""
+        self.formatted.update(self._hash(sorted(set(files))))
+        cache.write_json(
+            self.name, {"settings": self.settings, "formatted": self.formatted}
+        )
+
+
+def black_command(
+    files: Optional[List[str]], project_root: Path, workers: Optional[int] = None
+) -> str:
+    """The black command line for some files, or the whole tree
+
+    Files are passed through xargs from a NUL separated list in the project
+    cache, so any number of them fits on the command line. Black formats them
+    in parallel worker processes.
+
+    Args:
+        files (Optional[List[str]]): Files to format, None for the whole tree
+        project_root (Path): The project's root directory, mounted in the container
+        workers (Optional[int]): Black's worker processes, defaults to the CPU count
+
+    Returns:
+        str: Shell command to run in the container
+    """
+    black = "black --skip-string-normalization"
+    if workers:
+        black += f" --workers {workers}"
+    if files is None:
+        return f'{black} --exclude="{EXCLUDE}" .'
+    list_file = cache.project_cache_dir(project_root) / LIST_FILE
+    list_file.write_bytes(b"".join(f.encode() + b"\0" for f in files))
+    return f'xargs -0 {black} --force-exclude="{EXCLUDE}" < .palm/cache/{LIST_FILE}'
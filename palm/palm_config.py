@@ -1,14 +1,17 @@
 from pathlib import Path
-from typing import Optional, List, Union
+from typing import TYPE_CHECKING, List, Optional, Union
+
 import yaml
-from xmlrpc.client import Boolean
-from pygit2 import Repository, discover_repository, GitError
+from click import echo, secho
+
+from . import git_utils
+from .config_snapshot import ConfigSnapshot, load_yaml
+from .palm_exceptions import InvalidConfigError, NoRepositoryError
 
-from click import secho, echo
-from deepmerge import always_merger
-from pygit2 import Repository
+if TYPE_CHECKING:
+    from pygit2 import Repository
 
-from .palm_exceptions import NoRepositoryError
+DOCKER_EXECUTORS = ("compose", "warm", "engine", "docker-run")
 
 
 class PalmConfig:
@@ -22,48 +25,83 @@ class PalmConfig:
 
     project_root: Optional["Path"]
     config: dict = {}
-    repo: Optional[Repository] = None
-    branch: str = None
+    git_dir: Optional[Path] = None
     plugins: List[str] = []
 
     def __init__(self, project_path: Optional["Path"] = Path.cwd()):
         self.project_root = project_path
+        self._repo = None
+        self._branch = None
         self._setup()
 
     def _setup(self):
         """Setup the config"""
-        self.config = self._get_config()
-        try:
-            self.repo = self._get_repo()
-        except NoRepositoryError:
-            secho('No git repository found, running in global mode', fg='yellow')
-            self.repo = None
-        if self.repo:
-            self.branch = self._get_current_branch()
+        self.config = self._load_config()
+        self.git_dir = self._find_git_dir()
+        if self.git_dir:
             self._use_repo_plugins()
         else:
+            secho('No git repository found, running in global mode', fg='yellow')
             self._use_global_plugins()
 
-    def _get_repo(self) -> Repository:
+    @property
+    def repo(self) -> Optional["Repository"]:
+        """The pygit2 repository, opened the first time it is used
+
+        Returns:
+            Optional[Repository]: repo object, or None if not in a repo
+        """
+        if self._repo is None and self.git_dir:
+            self._repo = self._get_repo()
+        return self._repo
+
+    @property
+    def branch(self) -> Optional[str]:
+        """The current branch, read the first time it is used
+
+        Returns:
+            Optional[str]: branch name, or None if not in a repo
+        """
+        if self._branch is None and self.git_dir:
+            self._branch = self._get_current_branch()
+        return self._branch
+
+    def _find_git_dir(self) -> Optional[Path]:
+        """Finds the git directory for the project, without loading libgit2
+
+        Returns:
+            Optional[Path]: path to the git directory, or None if not in a repo
+        """
+        return git_utils.find_git_dir(self.project_root)
+
+    def _get_repo(self) -> "Repository":
         """Gets the repo object.
 
         Returns:
             Repository: repo object
         """
-        path = discover_repository(str(self.project_root))
+        from pygit2 import Repository
 
-        if not path:
+        if not self.git_dir:
             raise NoRepositoryError("No git repository found in the current directory")
 
-        return Repository(path)
+        return Repository(str(self.git_dir))
 
     def _get_current_branch(self) -> Union[str, None]:
         """Gets the current branch name.
 
+        HEAD is read directly, pygit2 is only used if that fails.
+
         Returns:
             Union[str, None]: branch name, or None if not in a repo
         """
-        if self.repo:
+        if self.git_dir:
+            branch = git_utils.read_head(self.git_dir)
+            if branch is not None:
+                return branch
+
+            from pygit2 import GitError
+
             try:
                 return self.repo.head.shorthand
             except GitError as e:
@@ -75,23 +113,58 @@ class PalmConfig:
 
         return None
 
+    def _load_config(self) -> dict:
+        """Gets the merged config from its snapshot, if neither config has
+        changed since it was taken, otherwise reads and merges both configs.
+
+        Returns:
+            dict: dict of merged global and repo configs
+        """
+        snapshot = ConfigSnapshot(
+            [self._global_config_path(), self._repo_config_path()]
+        )
+        config = snapshot.load()
+        if config is None:
+            config = self._get_config()
+            snapshot.save(config)
+        return config
+
     def _get_config(self) -> dict:
         """Gets both global and repo configs, merging them together.
 
         Returns:
             dict: dict of merged global and repo configs
         """
-        return always_merger.merge(self._get_global_config(), self._get_repo_config())
+        global_config = self._get_global_config()
+        repo_config = self._get_repo_config()
+        if not repo_config:
+            return global_config
+
+        from deepmerge import always_merger
+
+        return always_merger.merge(global_config, repo_config)
+
+    def _global_config_path(self) -> Path:
+        return Path().home() / ".palm" / "config.yaml"
+
+    def _repo_config_path(self) -> Path:
+        return self.project_root / ".palm" / "config.yaml"
 
     def _get_repo_config(self) -> dict:
         """Gets the repo config, reading yaml and returning a dict.
-        If the config does not exist, prompt the user to create it.
 
         Returns:
             dict: dict of repo config, or empty dict if no config
         """
-        config_path = self.project_root / ".palm" / "config.yaml"
+        config_path = self._repo_config_path()
         if not config_path.exists():
+            return {}
+
+        return load_yaml(config_path)
+
+    def warn_if_unconfigured(self) -> None:
+        """Prompt the user to create the repo config, if the project has none"""
+        if self.git_dir and not self._repo_config_path().exists():
             secho(
                 "No palm config found in .palm/config.yml, please run 'palm scaffold config'",
                 fg="yellow",
@@ -100,9 +173,6 @@ class PalmConfig:
                 "Some palm commands may not work correctly without palm config \n",
                 fg="yellow",
             )
-            return {}
-
-        return yaml.safe_load(config_path.read_text())
 
     def _get_global_config(self, global_config_path: Optional[Path] = None) -> object:
         """Gets the global config, reading yaml and returning a dict.
@@ -114,11 +184,11 @@ class PalmConfig:
         Returns:
             object: dict of global config
         """
-        config_path = global_config_path or Path().home() / ".palm" / "config.yaml"
+        config_path = global_config_path or self._global_config_path()
         if not config_path.exists():
             self._create_global_config_file(config_path)
 
-        return yaml.safe_load(config_path.read_text())
+        return load_yaml(config_path)
 
     def _create_global_config_file(self, config_path) -> None:
         """Creates the global config file."""
@@ -145,13 +215,13 @@ class PalmConfig:
 
         self.plugins = global_plugins + plugins_from_config
 
-    def is_valid_branch(self) -> Boolean:
+    def is_valid_branch(self) -> bool:
         """Validate the current branch against the config
 
         Return:
-            Boolean: True if the branch is valid, False if not
+            bool: True if the branch is valid, False if not
         """
-        if self.repo and self.branch in self.protected_branches:
+        if self.git_dir and self.branch in self.protected_branches:
             return False
 
         return True
@@ -165,6 +235,24 @@ class PalmConfig:
         """
         return self.config.get("protected_branches") or []
 
+    @property
+    def docker_executor(self) -> str:
+        """How commands are run in docker, from docker_executor in .palm/config.yaml
+
+        Returns:
+            str: "compose" for a new container per command (the default), or
+            "warm" for a long-lived container per project, "engine" for a
+            new container per command, driven over the Docker Engine API, or
+            "docker-run" for docker run from the cached compose service
+        """
+        executor = self.config.get("docker_executor") or "compose"
+        if executor not in DOCKER_EXECUTORS:
+            raise InvalidConfigError(
+                f"Invalid docker_executor {executor!r}, expected one of: "
+                + ", ".join(DOCKER_EXECUTORS)
+            )
+        return executor
+
     @property
     def project_root_snake_case(self):
         return self.project_root.name.replace("-", "_")
@@ -1,15 +1,24 @@
-import importlib
-from typing import List
+import importlib.util
+from pathlib import Path
+from typing import List, Optional
 
 from click import secho
 
+from .command_manifest import CommandManifest
+from .plugin_registry import PluginRegistry
 from .plugins.base import BasePlugin as Plugin
 
 
 class PluginManager:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        command_manifest: Optional[CommandManifest] = None,
+        plugin_registry: Optional[PluginRegistry] = None,
+    ) -> None:
         self.plugins = {}
         self.plugin_command_dict = {}
+        self.command_manifest = command_manifest or CommandManifest()
+        self.plugin_registry = plugin_registry or PluginRegistry()
 
     def load_plugins(self, plugins: List) -> None:
         """Loads a list of plugins, typically from palm config
@@ -19,10 +28,15 @@ class PluginManager:
         """
         for plugin in plugins:
             self.load_plugin(plugin)
+        self.command_manifest.save()
+        self.plugin_registry.save()
 
     def load_plugin(self, plugin_name: str) -> Plugin:
         """Load a single plugin by name
 
+        Plugins are found through their palm.plugins entry point. Plugins
+        without one are imported from the palm.plugins namespace package.
+
         Args:
             plugin_name (str): name of the plugin to be loaded
 
@@ -32,19 +46,24 @@ class PluginManager:
         Returns:
             Plugin: Plugin instance
         """
+        plugin = self.plugin_registry.load_plugin(plugin_name)
+        if plugin is None:
+            plugin = self._import_namespace_plugin(plugin_name)
+        self.plugins[plugin_name] = plugin
+        self.extend_plugin_command_mapping(plugin_name)
+
+        return plugin
+
+    def _import_namespace_plugin(self, plugin_name: str) -> Plugin:
+        """Import a plugin which has no entry point from palm.plugins"""
         try:
-            module: Plugin = importlib.import_module("." + plugin_name, "palm.plugins")
+            module = importlib.import_module("." + plugin_name, "palm.plugins")
         except ModuleNotFoundError as e:
             if e.name == "palm.plugins." + plugin_name:
                 secho(f"Could not find plugin: {plugin_name}!", fg="red")
             secho(f"Error importing plugin: {e}", fg="red")
             raise
-
-        plugin = module.Plugin
-        self.plugins[plugin_name] = plugin
-        self.extend_plugin_command_mapping(plugin_name)
-
-        return plugin
+        return module.Plugin
 
     def extend_plugin_command_mapping(self, plugin_name: str) -> None:
         """Merges the plugin commands to the PluginManager plugin_command_dict
@@ -52,14 +71,32 @@ class PluginManager:
         the same command name, the second command will supercede the first,
         replacing it.
 
+        Command names are read from the command manifest, so the plugin's
+        command_dir is only scanned when it has changed since the last run.
+
         Args:
             plugin_name (str): name of the plugin
         """
+        plugin = self.plugins[plugin_name]
+        commands = self.command_manifest.commands(plugin)
         self.plugin_command_dict = {
             **self.plugin_command_dict,
-            **self.plugins[plugin_name].command_map(),
+            **dict.fromkeys(commands, plugin.name),
         }
 
+    def rebuild_command_manifest(self) -> int:
+        """Discard the command manifest and rebuild it from the loaded plugins
+
+        Returns:
+            int: Number of commands found
+        """
+        self.command_manifest.clear()
+        count = 0
+        for plugin in self.plugins.values():
+            count += len(self.command_manifest.commands(plugin))
+        self.command_manifest.save()
+        return count
+
     def is_plugin_command(self, command_name: str) -> bool:
         """Check whether a given command name comes from a plugin
 
@@ -84,6 +121,21 @@ class PluginManager:
         plugin = self.plugins[plugin_name]
         return plugin.get_command(command_name)
 
+    def command_path(self, command_name: str) -> Optional[Path]:
+        """Get the path to the module for a plugin command
+
+        Args:
+            command_name (str): Name of the palm command
+
+        Returns:
+            Optional[Path]: Path to the cmd_*.py module, or None if no plugin
+            provides the command
+        """
+        plugin = self.plugins.get(self.plugin_command_dict.get(command_name))
+        if plugin is None:
+            return None
+        return plugin.command_path(command_name)
+
     @property
     def plugin_command_list(self) -> List:
         """Get all commands for installed plugins
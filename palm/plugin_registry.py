@@ -0,0 +1,185 @@
+import importlib
+import importlib.util
+import os
+import sys
+from types import ModuleType
+from typing import Dict, List, Optional
+
+from palm import cache
+
+ENTRY_POINT_GROUP = "palm.plugins"
+# Attribute holding the plugin instance, unless the entry point names one
+DEFAULT_ATTRIBUTE = "Plugin"
+
+
+def plugin_entry_points() -> list:
+    """Get the installed entry points in the palm.plugins group
+
+    Returns:
+        list: importlib.metadata EntryPoint objects
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        import importlib_metadata as metadata
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return list(entry_points.select(group=ENTRY_POINT_GROUP))
+    # Python < 3.10 returns a dict of group name to entry points
+    return list(entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+def resolve_entry_point(value: str) -> Optional[dict]:
+    """Locate the module for a palm.plugins entry point without importing it
+
+    Args:
+        value (str): Entry point value, e.g. palm.plugins.foo or palm.plugins.foo:Plugin
+
+    Returns:
+        Optional[dict]: module, attribute, origin and search_locations for the
+        plugin module, or None if it can't be found
+    """
+    module_name, _, attribute = value.partition(":")
+    module_name = module_name.strip()
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.has_location or not spec.origin:
+        return None
+    search_locations = spec.submodule_search_locations
+    return {
+        "module": module_name,
+        "attribute": attribute.strip() or DEFAULT_ATTRIBUTE,
+        "origin": spec.origin,
+        "search_locations": list(search_locations) if search_locations else None,
+    }
+
+
+def site_signature(paths: List[str]) -> list:
+    """Stat signatures of the sys.path entries
+
+    Installing or removing a distribution adds or removes its dist-info
+    directory, which changes the mtime of the directory it is installed in.
+
+    Args:
+        paths (List[str]): sys.path entries
+
+    Returns:
+        list: [path, signature] pairs
+    """
+    return [[path, cache.stat_signature(path or ".")] for path in paths]
+
+
+class PluginRegistry:
+    """Map of plugin names to their modules, from palm.plugins entry points
+
+    Plugins declare an entry point such as ``foo = palm.plugins.foo`` and the
+    registry records where that module lives, so loading the plugin is a
+    single file lookup instead of a search of every sys.path entry. The
+    registry is cached on disk for each sys.path, and rebuilt when any of its
+    directories change.
+    """
+
+    FILE_NAME = "plugin_registry.json"
+    VERSION = 1
+    # Number of distinct sys.path configurations (virtualenvs) to remember
+    MAX_ENVIRONMENTS = 16
+
+    def __init__(self) -> None:
+        self.environments: Dict[str, dict] = {}
+        self.dirty = False
+        self._plugins: Optional[Dict[str, dict]] = None
+
+    @property
+    def plugins(self) -> Dict[str, dict]:
+        """Resolved entry points for this interpreter, keyed on plugin name"""
+        if self._plugins is None:
+            self._plugins = self._load()
+        return self._plugins
+
+    def _load(self) -> Dict[str, dict]:
+        data = cache.read_json(self.FILE_NAME)
+        if isinstance(data, dict) and data.get("version") == self.VERSION:
+            self.environments = data.get("environments") or {}
+
+        key = os.pathsep.join(sys.path)
+        signature = site_signature(sys.path)
+        environment = self.environments.get(key)
+        if environment and environment.get("signature") == signature:
+            return environment["plugins"]
+
+        plugins = {}
+        for entry_point in plugin_entry_points():
+            resolved = resolve_entry_point(entry_point.value)
+            if resolved:
+                plugins[entry_point.name] = resolved
+
+        self.environments.pop(key, None)
+        if not any(cache.is_racy(sig) for _, sig in signature):
+            self.environments[key] = {"signature": signature, "plugins": plugins}
+            while len(self.environments) > self.MAX_ENVIRONMENTS:
+                del self.environments[next(iter(self.environments))]
+            self.dirty = True
+        return plugins
+
+    def load_plugin(self, plugin_name: str):
+        """Import a plugin using its registered entry point
+
+        Args:
+            plugin_name (str): Name of the plugin
+
+        Returns:
+            Optional[BasePlugin]: The plugin, or None if it has no entry point
+            (or its module has moved since the registry was built)
+        """
+        entry = self.plugins.get(plugin_name)
+        if entry is None:
+            return None
+        module = self._import(entry)
+        if module is None:
+            return None
+        return getattr(module, entry["attribute"])
+
+    def _import(self, entry: dict) -> Optional[ModuleType]:
+        name = entry["module"]
+        if name in sys.modules:
+            return sys.modules[name]
+        if not os.path.exists(entry["origin"]):
+            return None
+
+        parent_name, _, child_name = name.rpartition(".")
+        parent = importlib.import_module(parent_name) if parent_name else None
+        spec = importlib.util.spec_from_file_location(
+            name, entry["origin"], submodule_search_locations=entry["search_locations"]
+        )
+        if spec is None:
+            return None
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(name, None)
+            raise
+        if parent is not None:
+            setattr(parent, child_name, module)
+        return module
+
+    def save(self) -> None:
+        """Write the registry to the cache directory if it has changed"""
+        if not self.dirty:
+            return
+        cache.write_json(
+            self.FILE_NAME,
+            {"version": self.VERSION, "environments": self.environments},
+        )
+        self.dirty = False
+
+    def clear(self) -> None:
+        """Discard the cached registry, it is resolved again on next use"""
+        self.environments = {}
+        self._plugins = None
+        self.dirty = False
+        cache.remove(self.FILE_NAME)
@@ -1,10 +1,12 @@
-import importlib
+import importlib.util
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from urllib.parse import urlparse
 
 from palm.utils import cmd_name_from_file, is_cmd_file, run_on_host
-from palm.plugins.base_plugin_config import BasePluginConfig
+
+if TYPE_CHECKING:
+    from palm.plugins.base_plugin_config import BasePluginConfig
 
 
 class BasePlugin:
@@ -14,7 +16,7 @@ class BasePlugin:
         command_dir: Path,
         version: Optional[str] = "unknown",
         package_location: Optional[str] = None,
-        config: Optional[BasePluginConfig] = None,
+        config: Optional["BasePluginConfig"] = None,
         **kwargs,
     ) -> None:
         """Initialize a plugin.
@@ -56,6 +58,17 @@ class BasePlugin:
         """
         return dict.fromkeys(self.all_commands(), self.name)
 
+    def command_path(self, command_name: str) -> Path:
+        """Get the path to the module for a given command
+
+        Args:
+            command_name (str): Name of the command
+
+        Returns:
+            Path: Path to the cmd_*.py module
+        """
+        return self.command_dir / f"cmd_{command_name}.py"
+
     def get_command(self, command_name: str) -> importlib.machinery.ModuleSpec:
         """Get the modulespec for a given command
 
@@ -65,7 +78,7 @@ class BasePlugin:
         Returns:
             importlib.ModuleSpec: ModuleSpec for the command
         """
-        command_path = self.command_dir / f"cmd_{command_name}.py"
+        command_path = self.command_path(command_name)
         return importlib.util.spec_from_file_location(command_name, command_path)
 
     def update(self) -> Tuple[bool, str]:
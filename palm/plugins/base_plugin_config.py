@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 from pydantic import BaseModel, ValidationError
 
+from palm.config_snapshot import load_yaml
 from palm.palm_exceptions import InvalidConfigError
 
 
@@ -72,7 +73,7 @@ class BasePluginConfig(ABC):
             raise InvalidConfigError(msg)
 
     def _read(self) -> dict:
-        palm_config = yaml.load(self.config_path.read_text(), Loader=yaml.FullLoader)
+        palm_config = load_yaml(self.config_path)
         plugin_config = palm_config.get('plugin_config', {}).get(self.plugin_name, {})
 
         if not plugin_config:
@@ -87,7 +88,7 @@ class BasePluginConfig(ABC):
             )
             return
 
-        palm_config = yaml.load(self.config_path.read_text(), Loader=yaml.FullLoader)
+        palm_config = load_yaml(self.config_path)
         if not 'plugin_config' in palm_config.keys():
             palm_config['plugin_config'] = {}
 
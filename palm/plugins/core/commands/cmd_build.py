@@ -1,9 +1,52 @@
 import subprocess
+import sys
 
 import click
 
 
+requires = {"config", "docker", "git"}
+
+
 @click.command("build")
-def cli():
+@click.option("--force", is_flag=True, help="Build even if the image is up to date")
+@click.option(
+    "--explain",
+    is_flag=True,
+    help="Show which inputs changed since the image was built",
+)
+@click.pass_obj
+def cli(environment, force, explain):
     """Rebuilds the image for the current working directory"""
-    subprocess.run(["docker", "compose", "build"], check=True)
+    from palm.build_fingerprint import BuildFingerprint
+
+    build = BuildFingerprint(environment.palm)
+    if not build.build:
+        # Nothing palm can fingerprint, e.g. the service uses a registry image
+        subprocess.run(["docker", "compose", "build"], check=True)
+        return
+
+    inputs = build.inputs()
+    fingerprint = build.fingerprint(inputs)
+    image_fingerprint = build.image_fingerprint()
+    up_to_date = image_fingerprint == fingerprint
+
+    if explain:
+        if up_to_date:
+            click.echo(f"{build.image} matches its inputs ({fingerprint[:12]})")
+        else:
+            click.echo(f"{build.image} is out of date:")
+            for reason in build.explain(inputs, image_fingerprint):
+                click.echo(f"  {reason}")
+
+    if up_to_date and not (force or environment.force):
+        click.secho(
+            f"{build.image} is up to date, skipping the build (use --force to rebuild)",
+            fg="green",
+        )
+        return
+
+    try:
+        build.run_build(fingerprint)
+    except subprocess.CalledProcessError as error:
+        sys.exit(error.returncode)
+    build.save(inputs)
@@ -0,0 +1,120 @@
+import click
+
+
+requires = set()
+
+
+@click.group(help="Manage palm's local caches")
+def cli():
+    pass
+
+
+@cli.command()
+@click.pass_obj
+def rebuild(environment):
+    """Rebuild the plugin registry and command manifest for the current project"""
+    environment.plugin_manager.plugin_registry.clear()
+    count = environment.plugin_manager.rebuild_command_manifest()
+    click.secho(f"Command manifest rebuilt with {count} commands", fg="green")
+
+
+@cli.command()
+@click.pass_obj
+def show(environment):
+    """Show what palm has cached for the current project"""
+    import json
+    import os
+    import shlex
+    import time
+
+    from palm.cache import cache_dir
+    from palm.cache_volume import CacheVolume
+    from palm.compose_spec import ComposeSpec, docker_run_args
+
+    click.echo(f"Cache directory: {cache_dir()}")
+
+    store = environment.result_cache()
+    if store is None:
+        click.echo("Result cache: off")
+    else:
+        entries = store.entries()
+        size_mb = sum(stat.st_size for _, stat in entries) / 1024 / 1024
+        click.echo(
+            f"Result cache: {len(entries)} entries, "
+            f"{size_mb:.1f} of {store.max_size / 1024 / 1024:.0f} MB"
+        )
+    volume = CacheVolume(environment.palm)
+    if volume.enabled:
+        click.echo(f"Cache volume: on, limit {volume.max_size_mb} MB")
+    else:
+        click.echo("Cache volume: off")
+
+    spec = ComposeSpec(environment.palm)
+    entry = spec.load()
+    status = "fresh"
+    if entry is None:
+        entry = _read_entry(spec)
+        status = "stale" if entry else "not resolved"
+    click.secho(f"\nCompose service {spec.service_name}: {status}", bold=True)
+    if not entry:
+        return
+
+    resolved_at = time.strftime(
+        "%Y-%m-%d %H:%M:%S", time.localtime(entry["resolved_at"])
+    )
+    inputs = [os.path.relpath(path, spec.project_root) for path in spec.inputs()]
+    click.echo(f"Project: {entry['project']}")
+    click.echo(f"Resolved: {resolved_at}")
+    click.echo(f"Inputs: {', '.join(inputs + entry['env_files'])}")
+    click.echo(json.dumps(entry["service"], indent=2, sort_keys=True))
+    args = docker_run_args(entry["service"], spec.project_root, {}, tty=False)
+    click.echo(" ".join(shlex.quote(arg) for arg in args) + " <command>")
+
+
+@cli.command()
+@click.option(
+    "--max-size",
+    type=int,
+    help="Size limit for the cache volume in MB, defaults to cache_volume.max_size_mb",
+)
+@click.option("--all", "remove", is_flag=True, help="Remove the cache volume")
+@click.pass_obj
+def prune(environment, max_size, remove):
+    """Trim the result cache and the project's cache volume to their size limits"""
+    from palm.cache_volume import CacheVolume
+    from palm.cli import ensure_docker_ready
+
+    store = environment.result_cache()
+    if store is not None:
+        count = store.clear() if remove else store.evict()
+        click.echo(f"Result cache: removed {count} entries")
+
+    # Only the cache volume needs docker, the rest of palm cache works without it
+    ensure_docker_ready()
+    volume = CacheVolume(environment.palm)
+    if remove:
+        if volume.remove():
+            click.secho(f"Removed {volume.name}", fg="green")
+        else:
+            click.echo("No cache volume to remove")
+        return
+
+    result = volume.prune(max_size)
+    if result is None:
+        click.echo("No cache volume to prune")
+        return
+    size, freed = result
+    click.secho(
+        f"{volume.name}: freed {freed / 1024 / 1024:.1f} of "
+        f"{size / 1024 / 1024:.1f} MB",
+        fg="green",
+    )
+
+
+def _read_entry(spec):
+    from palm import cache
+
+    entry = cache.read_json(spec.name)
+    if not isinstance(entry, dict) or entry.get("version") != spec.VERSION:
+        return None
+    return entry
@@ -5,6 +5,9 @@ import click
 from palm.containerizer import PythonContainerizer
 
 
+requires = {"config", "git"}
+
+
 @click.command("containerize")
 @click.option(
     "--version",
@@ -12,9 +15,66 @@ from palm.containerizer import PythonContainerizer
     default="3.8",
     help="Python version to use (default 3.8)",
 )
+@click.option(
+    "--mode",
+    type=click.Choice(PythonContainerizer.MODES),
+    default="standard",
+    show_default=True,
+    help="optimized installs dependencies before copying the source, so source "
+    "edits rebuild quickly; multi-stage also produces a slim runtime image",
+)
+@click.option(
+    "--package-manager",
+    type=click.Choice(PythonContainerizer.PACKAGE_MANAGERS),
+    help="Package manager to install dependencies with, "
+    "detected from the project's lockfile by default",
+)
+@click.option(
+    "--analyze",
+    is_flag=True,
+    help="Report the build context's size per top-level entry, without "
+    "containerizing",
+)
 @click.pass_context
-def cli(ctx, version: str):
+def cli(ctx, version: str, mode: str, package_manager: str, analyze: bool):
+    if analyze:
+        return analyze_context(ctx.obj.palm)
     all_templates_dir = Path(Path(__file__).parents[1], "templates")
     template_dir = all_templates_dir / "containerize"
-    PythonContainerizer(ctx, template_dir, version).run()
+    PythonContainerizer(ctx, template_dir, version, mode, package_manager).run()
     click.secho(f"Containerized {ctx.obj.palm.image_name}", fg="green")
+
+
+def analyze_context(palm):
+    from palm.build_context import ContextScan, format_size
+    from palm.dockerignore import DockerIgnore
+
+    root = palm.project_root
+    ignore = DockerIgnore.load(root, root / "Dockerfile")
+    tracked = None
+    if palm.repo is not None and not palm.repo.is_bare:
+        from palm import git_utils
+
+        tracked = git_utils.tracked_files(palm.repo, root)
+    scan = ContextScan(root, ignore, tracked).run()
+
+    source = f"{len(ignore.patterns)} .dockerignore patterns"
+    click.secho(f"Build context of {root} ({source})", bold=True)
+    click.echo(f"{'size':>10} {'files':>8}  path")
+    for path, (size, files) in sorted(
+        scan.sizes.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        click.echo(f"{format_size(size):>10} {files:>8}  {path}")
+    files = sum(count for _, count in scan.sizes.values())
+    click.echo(f"{format_size(scan.total):>10} {files:>8}  total")
+
+    findings = scan.findings()
+    if not findings:
+        return
+    click.secho("\nIn the context, but probably not needed in the image:", fg="yellow")
+    for path, reason in findings:
+        click.echo(f"  {path} ({reason})")
+    if (root / ".dockerignore").exists():
+        click.echo("Add them to .dockerignore to leave them out.")
+    else:
+        click.echo("palm containerize generates a .dockerignore which leaves them out.")
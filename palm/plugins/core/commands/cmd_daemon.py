@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import time
+
+import click
+
+from palm.cache import cache_dir
+from palm.daemon_client import request, socket_path
+
+requires = set()
+START_TIMEOUT = 10
+
+
+@click.group(help="Manage the palm daemon, which keeps palm warm between runs")
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--foreground", is_flag=True, help="Run the daemon in this terminal")
+def start(foreground: bool):
+    """Start the palm daemon"""
+    if request({"command": "status"}):
+        click.secho("palm daemon is already running", fg="yellow")
+        return
+
+    command = [sys.executable, "-m", "palm.daemon"]
+    if foreground:
+        subprocess.run(command, check=True)
+        return
+
+    log_path = cache_dir() / "daemon.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a") as log:
+        subprocess.Popen(
+            command,
+            cwd=cache_dir(),
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if request({"command": "status"}):
+            click.secho(f"palm daemon started on {socket_path()}", fg="green")
+            return
+        time.sleep(0.1)
+    click.secho(f"palm daemon did not start, see {log_path}", fg="red")
+    sys.exit(1)
+
+
+@cli.command()
+def stop():
+    """Stop the palm daemon"""
+    if request({"command": "stop"}) is None:
+        click.secho("palm daemon is not running", fg="yellow")
+        return
+    click.secho("palm daemon stopped", fg="green")
+
+
+@cli.command()
+def status():
+    """Show the palm daemon status"""
+    reply = request({"command": "status"})
+    if reply is None:
+        click.echo("palm daemon is not running")
+        return
+    click.echo(f"palm daemon is running (pid {reply['pid']}) on {socket_path()}")
+    for project in reply.get("projects", []):
+        click.echo(f"  {project}")
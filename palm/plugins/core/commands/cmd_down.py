@@ -0,0 +1,16 @@
+import click
+
+from palm.warm_container import WarmContainer
+
+requires = {"config", "docker"}
+
+
+@click.command("down")
+@click.pass_obj
+def cli(environment):
+    """Stop the warm dev container for this project"""
+    container = WarmContainer(environment.palm)
+    if container.stop():
+        click.secho(f"Stopped {container.name}", fg="green")
+    else:
+        click.echo(f"{container.name} is not running")
@@ -5,8 +5,8 @@ import click
 
 from palm.plugins.core.create_files import *
 
-palm_target_dir = f"{Path.cwd()}/.palm"
 templates_dir = Path(Path(__file__).parents[1], "templates").resolve()
+requires = {"git"}
 
 
 @click.command()
@@ -39,7 +39,7 @@ def cli(
     """
     template_dir = Path(Path(__file__).parents[1], "templates") / "command"
 
-    if Path(palm_target_dir).exists():
+    if Path(palm_target_dir()).exists():
         click.secho("Palm is already initialized", fg="red")
         return
 
@@ -48,11 +48,11 @@ def cli(
 
     for command in commands:
         click.echo(f"Adding template for {command}...")
-        create_command(environment, command, template_dir, palm_target_dir)
+        create_command(environment, command, template_dir, palm_target_dir())
 
     if not image_name:
         image_name = environment.palm.image_name
 
-    create_config(palm_target_dir, image_name, plugins, protected_branches)
+    create_config(palm_target_dir(), image_name, plugins, protected_branches)
 
     click.secho("Success! Project initialized with Palm CLI", fg="green")
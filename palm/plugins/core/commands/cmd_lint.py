@@ -1,10 +1,74 @@
+import sys
+
 import click
 
 
+requires = {"config", "docker", "git"}
+
+
 @click.command("lint")
+@click.option(
+    "--changed",
+    is_flag=True,
+    help="Only lint files changed since --base, staged or not",
+)
+@click.option(
+    "--base",
+    default="HEAD",
+    show_default=True,
+    help="With --changed, the git ref to compare the working tree with",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Black worker processes, defaults to the number of CPUs",
+)
 @click.pass_obj
-def cli(environment):
+def cli(environment, changed, base, jobs):
     """lint the codebase with black"""
-    environment.run_in_docker(
-        'black --skip-string-normalization --exclude="\.tpl\.py" .'
+    from palm.lint_cache import LintCache, black_command, is_lintable
+
+    palm = environment.palm
+    # Without the image ID, black's version is unknown and the cache unsafe
+    image_id = environment.docker_image_id() if environment.use_result_cache else None
+    if not changed and image_id is None:
+        success, _ = environment.run_in_docker(
+            black_command(None, palm.project_root, jobs)
+        )
+        sys.exit(0 if success else 1)
+
+    from palm import git_utils
+
+    if changed:
+        try:
+            files = git_utils.changed_files(palm.repo, base, palm.project_root)
+        except KeyError:
+            raise click.BadParameter(f"{base} is not a commit", param_hint="--base")
+    else:
+        files = git_utils.project_files(palm.repo, palm.project_root)
+    files = [
+        f for f in sorted(files) if is_lintable(f) and (palm.project_root / f).is_file()
+    ]
+
+    lint_cache = None
+    if image_id is not None:
+        lint_cache = LintCache(palm.project_root, {"image": image_id})
+        stale = files if environment.force else lint_cache.stale(files)
+        if len(stale) < len(files):
+            click.echo(
+                f"{len(files) - len(stale)} files unchanged since black formatted them"
+            )
+        files = stale
+    if not files:
+        click.secho("Nothing to lint", fg="green")
+        return
+
+    click.echo(f"Linting {len(files)} files")
+    success, _ = environment.run_in_docker(
+        black_command(files, palm.project_root, jobs)
     )
+    if not success:
+        sys.exit(1)
+    if lint_cache is not None:
+        lint_cache.record(files)
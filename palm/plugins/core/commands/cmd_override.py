@@ -4,6 +4,9 @@ from pathlib import Path
 import click
 
 
+requires = {"git"}
+
+
 @click.command("override")
 @click.option("--name", multiple=False, required=True, help="Name of the command")
 @click.pass_obj
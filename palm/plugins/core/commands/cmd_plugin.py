@@ -4,6 +4,9 @@ from typing import Optional
 import click
 
 
+requires = {"config"}
+
+
 @click.group(help="Palm plugin utilities")
 def cli():
     pass
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import click
+
+
+requires = {"config", "docker"}
+
+
+@click.command("run")
+@click.argument("targets", nargs=-1)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Maximum tasks to run at once, defaults to the number of CPUs",
+)
+@click.option(
+    "-k",
+    "--keep-going",
+    is_flag=True,
+    help="Keep running independent tasks after a task fails",
+)
+@click.option("--list", "list_tasks", is_flag=True, help="List the tasks")
+@click.option("--in-docker", hidden=True, help="Run a shell step in docker")
+@click.pass_obj
+def cli(environment, targets, jobs, keep_going, list_tasks, in_docker):
+    """Run tasks from .palm/config.yaml, in parallel where possible"""
+    from palm.task_runner import FAILED, PASSED, TaskGraph, TaskRunner
+
+    if in_docker:
+        # Stream the step's output, the task runner prefixes it with the task
+        success, _ = environment.run_in_docker(in_docker)
+        sys.exit(0 if success else 1)
+
+    graph = TaskGraph.from_config(environment.palm.config)
+    if list_tasks or not targets:
+        if not graph.tasks:
+            click.secho("No tasks defined in .palm/config.yaml", fg="yellow")
+        for name, task in graph.tasks.items():
+            step = f"palm {task.command}" if task.command else task.run
+            needs = f"(after {', '.join(task.depends_on)})" if task.depends_on else ""
+            click.echo(" ".join(part for part in (f"{name}:", step, needs) if part))
+        return
+
+    runner = TaskRunner(graph, jobs or os.cpu_count() or 1, keep_going)
+    results = runner.run(list(targets))
+
+    click.echo()
+    colors = {PASSED: "green", FAILED: "red"}
+    for name, result in results.items():
+        click.secho(f"{name}: {result}", fg=colors.get(result, "yellow"))
+    if any(result != PASSED for result in results.values()):
+        sys.exit(1)
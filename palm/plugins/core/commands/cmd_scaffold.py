@@ -5,7 +5,8 @@ import click
 
 from palm.plugins.core.create_files import *
 
-palm_target_dir = f"{Path.cwd()}/.palm"
+
+requires = {"git"}
 
 
 @click.group(help="Scaffold new palm commands")
@@ -26,8 +27,8 @@ def command(environment, name: List[str]):
     template_dir = Path(Path(__file__).parents[1], "templates") / 'command'
     """Add a new palm command to the current repo"""
     for command in name:
-        create_command(environment, command, template_dir, palm_target_dir)
-        click.secho(f"{command} command created in {palm_target_dir}", fg="green")
+        create_command(environment, command, template_dir, palm_target_dir())
+        click.secho(f"{command} command created in {palm_target_dir()}", fg="green")
 
 
 @cli.command()
@@ -50,8 +51,8 @@ def group(environment, group: str, command: List[str]):
         "commands": command,
     }
 
-    environment.generate(template_path, palm_target_dir, replacements)
-    click.secho(f"{group} command group created in {palm_target_dir}", fg="green")
+    environment.generate(template_path, palm_target_dir(), replacements)
+    click.secho(f"{group} command group created in {palm_target_dir()}", fg="green")
 
 
 @cli.command("config")
@@ -72,5 +73,5 @@ def config(
 ):
     """Generate a base .palm/config for existing projects"""
     image_name = image_name or environment.palm.image_name
-    create_config(palm_target_dir, image_name, plugins, protected_branches)
+    create_config(palm_target_dir(), image_name, plugins, protected_branches)
     click.secho("Palm config created!", fg="green")
@@ -1,6 +1,9 @@
 import click
 
 
+requires = {"config", "docker", "git"}
+
+
 @click.command("shell")
 @click.pass_obj
 def cli(environment):
@@ -1,9 +1,106 @@
+import sys
+
 import click
 
 
+requires = {"config", "docker", "git"}
+
+
 @click.command("test")
+@click.option(
+    "--shards",
+    type=click.IntRange(min=1),
+    help="Split the suite across this many containers, run in parallel",
+)
+@click.option(
+    "--junitxml",
+    type=click.Path(dir_okay=False),
+    default=".palm/cache/junit.xml",
+    show_default=True,
+    help="With --shards, where to write the merged JUnit report",
+)
+@click.option(
+    "--affected",
+    is_flag=True,
+    help="Only run tests affected by changes since the last --affected run",
+)
+@click.option(
+    "--base",
+    help="With --affected, the git ref to diff against instead of the last run's HEAD",
+)
 @click.pass_obj
-def cli(environment):
+def cli(environment, shards, junitxml, affected, base):
     """Run tests for your application (pytest)"""
-    click.echo("test command running!")
-    environment.run_in_docker("pytest", {"PALM_TEST": True})
+    if affected and shards:
+        raise click.UsageError("--affected can't be combined with --shards")
+    if affected:
+        run_affected(environment, base)
+        return
+    if not shards:
+        click.echo("test command running!")
+        environment.run_in_docker("pytest", {"PALM_TEST": True})
+        return
+
+    from pathlib import Path
+
+    from palm.test_sharding import ShardedTestRun, merge_junit
+
+    def run_in_docker(cmd, **kwargs):
+        return environment.run_in_docker(cmd, {"PALM_TEST": True}, **kwargs)
+
+    def on_finished(shard, result):
+        passed = result["exit_code"] == 0
+        click.secho(
+            f"shard {shard}: {len(result['tests'])} tests "
+            f"{'passed' if passed else 'failed'} in {result['elapsed']:.1f}s",
+            fg="green" if passed else "red",
+        )
+
+    click.echo(f"Collecting tests to run in {shards} shards...")
+    run = ShardedTestRun(environment.palm.project_root, run_in_docker)
+    results = run.run(shards, on_finished)
+    if not results:
+        click.secho("No tests collected", fg="red")
+        collect_log = run.directory / "collect.log"
+        if collect_log.exists():
+            click.echo(collect_log.read_text())
+        sys.exit(1)
+
+    failed = [i for i, result in enumerate(results) if result["exit_code"] != 0]
+    for shard in failed:
+        click.secho(f"\n===== shard {shard} output =====", fg="red", bold=True)
+        click.echo(results[shard]["log"])
+
+    report = Path(junitxml)
+    if not report.is_absolute():
+        report = environment.palm.project_root / report
+    reports = [run.directory / f"junit-{i}.xml" for i in range(len(results))]
+    totals = merge_junit(reports, report)
+    click.secho(
+        f"{totals['tests']} tests, {totals['failures']} failures, "
+        f"{totals['errors']} errors, {totals['skipped']} skipped "
+        f"({len(results)} shards). JUnit report: {report}",
+        fg="red" if failed else "green",
+    )
+    if failed:
+        sys.exit(1)
+
+
+def run_affected(environment, base):
+    from palm.test_impact import AffectedTestRun
+
+    def run_in_docker(cmd):
+        return environment.run_in_docker(cmd, {"PALM_TEST": True})
+
+    run = AffectedTestRun(environment.palm.project_root, run_in_docker)
+    repo = environment.palm.repo
+    selection = run.select(repo, base)
+    if selection["full"]:
+        click.secho(f"Running all tests: {selection['reason']}", fg="yellow")
+    else:
+        click.echo(
+            f"{len(selection['changed'])} files changed, running "
+            f"{len(selection['affected'])} affected tests and any new tests"
+        )
+    if not run.run(selection, repo):
+        sys.exit(1)
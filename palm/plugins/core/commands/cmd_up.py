@@ -0,0 +1,33 @@
+import click
+
+from palm.warm_container import WarmContainer
+
+requires = {"config", "docker"}
+
+
+@click.command("up")
+@click.option("--status", is_flag=True, help="Show the status without starting")
+@click.pass_obj
+def cli(environment, status: bool):
+    """Start the warm dev container for this project"""
+    container = WarmContainer(environment.palm)
+    if not status and not container.start():
+        raise SystemExit(1)
+    show_status(container)
+    if environment.palm.docker_executor != "warm":
+        click.secho(
+            "Set docker_executor: warm in .palm/config.yaml to run commands in it",
+            fg="yellow",
+        )
+
+
+def show_status(container: WarmContainer) -> None:
+    details = container.inspect()
+    if details is None:
+        click.echo(f"{container.name}: not running")
+        return
+    state = details.get("State", {})
+    click.echo(f"{container.name}: {state.get('Status', 'unknown')}")
+    if state.get("Running"):
+        click.echo(f"  started at {state.get('StartedAt')}")
+        click.echo(f"  stops after {container.idle_timeout}s without use")
@@ -4,6 +4,9 @@ import subprocess
 import click
 
 
+requires = set()
+
+
 @click.command("update")
 @click.option("--local", is_flag=True, help="attempts to install from cwd")
 def cli(local: bool):
@@ -4,6 +4,11 @@ from typing import List, Optional
 import yaml
 
 
+def palm_target_dir() -> str:
+    """The .palm directory of the current working directory"""
+    return f"{Path.cwd()}/.palm"
+
+
 def create_config(
     palm_dir,
     image_name,
@@ -1,13 +1,16 @@
 from pathlib import Path
 from palm.plugins.base import BasePlugin
-import pkg_resources
+
+try:
+    from importlib.metadata import PackageNotFoundError, version
+except ImportError:  # Python < 3.8
+    from importlib_metadata import PackageNotFoundError, version
 
 def get_version():
     try:
-        version = pkg_resources.require("palm-{{plugin_name}}")[0].version
-    except pkg_resources.DistributionNotFound:
-        version = 'unknown'
-    return version
+        return version("palm-{{plugin_name}}")
+    except PackageNotFoundError:
+        return 'unknown'
 
 
 {{plugin_class_name}} = BasePlugin(
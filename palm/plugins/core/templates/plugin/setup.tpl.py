@@ -30,6 +30,7 @@ setup(
     url='',
     packages=find_namespace_packages(include=['palm', 'palm.*']),
     package_data={'': ['*.yaml', '*.yml']},
+    entry_points={'palm.plugins': ['{{plugin_name}} = palm.plugins.{{plugin_name}}']},
     install_requires=['palm>=2.0.0'],
     license='',
     classifiers=[],
@@ -3,6 +3,9 @@ import sys
 from pathlib import Path
 
 
+requires = {"config"}
+
+
 @click.command("new")
 @click.option(
     '--global-template', '-g', help='Name of a global cookecutter template to use'
@@ -0,0 +1,402 @@
+"""Content-addressed cache of command results
+
+Commands opt in by passing an inputs spec to ``run_in_docker`` or
+``run_on_host``:
+
+.. code:: python
+
+    environment.run_in_docker(
+        "black --check .",
+        cache_inputs={"files": ["**/*.py", "pyproject.toml"], "env": ["BLACK_ARGS"]},
+    )
+
+palm hashes the command, the files matching the globs, the named env vars
+and (for docker commands) the image ID. If a result is cached for that hash,
+its exit status and output are replayed instead of running the command.
+Entries are kept in the user cache directory, least recently used first out
+once the store outgrows its size limit.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from palm import cache
+from palm.palm_exceptions import InvalidConfigError
+
+DEFAULT_MAX_SIZE_MB = 256
+# Directories never searched for input files
+EXCLUDED_DIRS = {
+    ".git",
+    ".hg",
+    ".venv",
+    "venv",
+    "node_modules",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".tox",
+}
+
+
+def glob_pattern(pattern: str) -> "re.Pattern":
+    """Compile a path glob: ``*`` and ``?`` stay within a directory, ``**`` spans any"""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r"\Z")
+
+
+class InputSpec:
+    """What a command's result depends on, besides the command itself
+
+    Args:
+        files (Iterable[str]): Globs relative to the project root, e.g. "src/**/*.py"
+        env (Iterable[str]): Names of host env vars
+        image (bool): Include the docker image ID (docker commands only)
+    """
+
+    def __init__(
+        self, files: Iterable[str] = (), env: Iterable[str] = (), image: bool = True
+    ) -> None:
+        self.files = sorted(files)
+        self.env = sorted(env)
+        self.image = image
+
+    @classmethod
+    def parse(cls, spec: Union["InputSpec", dict, List[str]]) -> "InputSpec":
+        """Build a spec from an InputSpec, a dict of its arguments or a list of globs
+
+        Raises:
+            InvalidConfigError: If the spec is malformed
+        """
+        if isinstance(spec, InputSpec):
+            return spec
+        if isinstance(spec, (list, tuple)):
+            return cls(files=spec)
+        if isinstance(spec, dict) and set(spec) <= {"files", "env", "image"}:
+            return cls(**spec)
+        raise InvalidConfigError(f"Invalid cache inputs: {spec!r}")
+
+
+class ResultCache:
+    """Size-bounded LRU store of command results in the user cache directory
+
+    Args:
+        project_root (Path): Root for input file globs
+        max_size_mb (int): Total size of stored results to keep
+    """
+
+    DIRECTORY = "result_cache"
+    VERSION = 1
+
+    def __init__(self, project_root: Path, max_size_mb: int = DEFAULT_MAX_SIZE_MB):
+        self.project_root = project_root
+        self.max_size = max_size_mb * 1024 * 1024
+        digest = hashlib.sha1(str(project_root).encode()).hexdigest()
+        self.file_hashes_name = f"{self.DIRECTORY}/files-{digest}.json"
+
+    @property
+    def path(self) -> Path:
+        return cache.cache_dir() / self.DIRECTORY
+
+    def input_files(self, patterns: List[str]) -> List[str]:
+        """Files under the project root matching any of the globs
+
+        Returns:
+            List[str]: Sorted paths, relative to the project root
+        """
+        if not patterns:
+            return []
+        compiled = [glob_pattern(pattern) for pattern in patterns]
+        matches = []
+        for dirpath, dirnames, filenames in os.walk(self.project_root):
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+            relative_dir = os.path.relpath(dirpath, self.project_root)
+            for filename in filenames:
+                relative = (
+                    filename
+                    if relative_dir == "."
+                    else f"{relative_dir}/{filename}".replace(os.sep, "/")
+                )
+                if any(pattern.match(relative) for pattern in compiled):
+                    matches.append(relative)
+        return sorted(matches)
+
+    def hash_files(self, files: List[str]) -> Dict[str, str]:
+        """Content hashes of files, reusing hashes of files which haven't changed
+
+        Args:
+            files (List[str]): Paths relative to the project root
+
+        Returns:
+            Dict[str, str]: sha256 hex digest for each file
+        """
+        known = cache.read_json(self.file_hashes_name)
+        if not isinstance(known, dict):
+            known = {}
+        hashes, updated, changed = {}, {}, False
+        for name in files:
+            path = self.project_root / name
+            signature = cache.stat_signature(path)
+            entry = known.get(name)
+            if entry and entry[0] == signature:
+                digest = entry[1]
+            else:
+                try:
+                    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+                except OSError:
+                    continue
+                changed = True
+            hashes[name] = digest
+            if not cache.is_racy(signature):
+                updated[name] = [signature, digest]
+        if changed or len(updated) != len(known):
+            cache.write_json(self.file_hashes_name, updated)
+        return hashes
+
+    def key(
+        self, command: dict, spec: InputSpec, image_id: Optional[str] = None
+    ) -> str:
+        """Hash of a command and its inputs
+
+        Args:
+            command (dict): Everything identifying the command, e.g. kind and cmd
+            spec (InputSpec): The command's declared inputs
+            image_id (Optional[str]): Docker image ID, if the command runs in docker
+
+        Returns:
+            str: Hex digest, used as the entry name
+        """
+        files = self.hash_files(self.input_files(spec.files))
+        document = {
+            "version": self.VERSION,
+            "project": str(self.project_root),
+            "command": command,
+            "files": files,
+            "env": {name: os.environ.get(name) for name in spec.env},
+            "image": image_id,
+        }
+        return hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+
+    def _entry_name(self, key: str) -> str:
+        return f"{self.DIRECTORY}/{key[:2]}/{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """Get a stored result, marking it as recently used
+
+        Returns:
+            Optional[dict]: The entry, or None on a miss
+        """
+        entry = cache.read_json(self._entry_name(key))
+        if not isinstance(entry, dict) or entry.get("version") != self.VERSION:
+            return None
+        try:
+            os.utime(cache.cache_dir() / self._entry_name(key))
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, result: list, stdout: str = "", stderr: str = "") -> None:
+        """Store a result, then evict the least recently used entries over the limit
+
+        Args:
+            key (str): Entry key from key()
+            result (list): The run function's return value
+            stdout (str): Output to replay on stdout
+            stderr (str): Output to replay on stderr
+        """
+        cache.write_json(
+            self._entry_name(key),
+            {
+                "version": self.VERSION,
+                "result": result,
+                "stdout": stdout,
+                "stderr": stderr,
+                "created": time.time(),
+            },
+        )
+        self.evict()
+
+    def entries(self) -> List[Tuple[Path, os.stat_result]]:
+        """Stored entries with their stats, least recently used first"""
+        found = []
+        for path in self.path.glob("??/*.json"):
+            try:
+                found.append((path, path.stat()))
+            except OSError:
+                pass
+        return sorted(found, key=lambda item: item[1].st_mtime)
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the store fits max_size
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = self.entries()
+        total = sum(stat.st_size for _, stat in entries)
+        removed = 0
+        for path, stat in entries:
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= stat.st_size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """Remove every stored result
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        for path, _ in self.entries():
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class tee_output:
+    """Captures this process's stdout and stderr, while still writing them out
+
+    Works at the file descriptor level, so output of subprocesses is captured
+    too. Subprocesses see pipes instead of a terminal.
+    """
+
+    def __enter__(self) -> "tee_output":
+        self.chunks = {1: [], 2: []}
+        self.saved = {}
+        self.threads = []
+        for fd in (1, 2):
+            stream = sys.stdout if fd == 1 else sys.stderr
+            stream.flush()
+            self.saved[fd] = os.dup(fd)
+            read_end, write_end = os.pipe()
+            os.dup2(write_end, fd)
+            os.close(write_end)
+            thread = threading.Thread(
+                target=self._copy, args=(read_end, fd), daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _copy(self, read_end: int, fd: int) -> None:
+        with os.fdopen(read_end, "rb", buffering=0) as reader:
+            for data in iter(lambda: reader.read(65536), b""):
+                self.chunks[fd].append(data)
+                os.write(self.saved[fd], data)
+
+    def __exit__(self, *exc) -> None:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, saved in self.saved.items():
+            os.dup2(saved, fd)
+        for thread in self.threads:
+            # Background processes may hold the pipe open, don't wait on them
+            thread.join(timeout=5)
+        for saved in self.saved.values():
+            os.close(saved)
+
+    @property
+    def stdout(self) -> str:
+        return b"".join(self.chunks[1]).decode("utf-8", errors="replace")
+
+    @property
+    def stderr(self) -> str:
+        return b"".join(self.chunks[2]).decode("utf-8", errors="replace")
+
+
+def replay(entry: dict) -> None:
+    """Write a cached entry's output to stdout and stderr"""
+    sys.stdout.write(entry.get("stdout", ""))
+    sys.stdout.flush()
+    sys.stderr.write(entry.get("stderr", ""))
+    sys.stderr.flush()
+
+
+def succeeded(result: tuple) -> bool:
+    """Whether a run_in_docker or run_on_host result is a success"""
+    status = result[0]
+    return status if isinstance(status, bool) else status == 0
+
+
+def cached_run(
+    store: ResultCache,
+    command: dict,
+    spec: InputSpec,
+    run: Callable[[], tuple],
+    image_id: Optional[str] = None,
+    capture: bool = True,
+    force: bool = False,
+) -> tuple:
+    """Run a command through the result cache
+
+    Only successful results are stored, so a failed or flaky run is always
+    run again.
+
+    Args:
+        store (ResultCache): The result store
+        command (dict): Everything identifying the command
+        spec (InputSpec): The command's declared inputs
+        run (Callable[[], tuple]): Runs the command, returning its result
+        image_id (Optional[str]): Docker image ID, for docker commands
+        capture (bool): Tee and store the command's output
+        force (bool): Run even on a hit, replacing the stored result
+
+    Returns:
+        tuple: The command's result, live or replayed
+    """
+    key = store.key(command, spec, image_id)
+    if not force:
+        entry = store.get(key)
+        if entry is not None and succeeded(entry["result"]):
+            import click
+
+            click.secho(
+                f"Cached result for `{command.get('cmd')}`, replaying output "
+                "(use palm --force to run it)",
+                fg="yellow",
+                err=True,
+            )
+            replay(entry)
+            return tuple(entry["result"])
+
+    if not capture:
+        result = run()
+        if succeeded(result):
+            store.put(key, list(result))
+        return result
+    with tee_output() as output:
+        result = run()
+    if succeeded(result):
+        store.put(key, list(result), output.stdout, output.stderr)
+    return result
@@ -0,0 +1,329 @@
+"""Task graph for palm run
+
+Tasks are declared under ``tasks`` in .palm/config.yaml:
+
+.. code:: yaml
+
+    tasks:
+      lint: lint                  # shorthand for a palm command
+      typecheck:
+        run: mypy src             # shell step, run in docker
+      unit:
+        command: test             # palm command, with arguments
+        depends_on: [lint]
+        env: {PYTEST_ADDOPTS: -x}
+      docs:
+        run: make -C docs html
+        host: true                # shell step, run on the host
+      ci:
+        depends_on: [typecheck, unit, docs]
+
+Each task runs in its own palm subprocess, so independent tasks run
+concurrently and their output can be prefixed with the task name.
+"""
+import itertools
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import click
+
+from palm.palm_exceptions import InvalidConfigError
+
+PREFIX_COLORS = ("cyan", "magenta", "yellow", "blue", "green", "bright_cyan")
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+
+def palm_argv() -> List[str]:
+    """Command line which runs palm with the current interpreter"""
+    return [sys.executable, "-m", "palm"]
+
+
+class Task:
+    """A task in the palm run graph
+
+    Args:
+        name (str): Task name
+        command (Optional[str]): palm command and its arguments, e.g. "test -x"
+        run (Optional[str]): Shell step
+        host (bool): Run the shell step on the host instead of in docker
+        depends_on (List[str]): Tasks which must pass first
+        env (Dict[str, str]): Env vars for the task
+    """
+
+    def __init__(
+        self,
+        name: str,
+        command: Optional[str] = None,
+        run: Optional[str] = None,
+        host: bool = False,
+        depends_on: List[str] = [],
+        env: Dict[str, str] = {},
+    ) -> None:
+        self.name = name
+        self.command = command
+        self.run = run
+        self.host = host
+        self.depends_on = list(depends_on)
+        self.env = {str(key): str(value) for key, value in env.items()}
+
+    @classmethod
+    def from_config(cls, name: str, spec) -> "Task":
+        """Build a task from its .palm/config.yaml entry
+
+        Raises:
+            InvalidConfigError: If the entry is malformed
+        """
+        if isinstance(spec, str):
+            return cls(name, command=spec)
+        if spec is None:
+            spec = {}
+        if not isinstance(spec, dict):
+            raise InvalidConfigError(f"Task {name} must be a command or a mapping")
+        unknown = set(spec) - {"command", "run", "host", "depends_on", "env"}
+        if unknown:
+            raise InvalidConfigError(
+                f"Unknown keys for task {name}: {', '.join(sorted(unknown))}"
+            )
+        if spec.get("command") and spec.get("run"):
+            raise InvalidConfigError(f"Task {name} has both command and run")
+        depends_on = spec.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        return cls(
+            name,
+            command=spec.get("command"),
+            run=spec.get("run"),
+            host=bool(spec.get("host")),
+            depends_on=depends_on,
+            env=spec.get("env") or {},
+        )
+
+    def argv(self) -> Optional[List[str]]:
+        """Command line for the task's subprocess, None for pure aggregates"""
+        if self.command:
+            return palm_argv() + shlex.split(self.command)
+        if self.run and self.host:
+            return ["/bin/sh", "-c", self.run]
+        if self.run:
+            return palm_argv() + ["run", "--in-docker", self.run]
+        return None
+
+    def environ(self) -> Dict[str, str]:
+        """Environment for the task's subprocess
+
+        Task env vars are set on the subprocess, and passed on to docker
+        through PALM_TASK_ENV. Service ports are not published, so parallel
+        containers don't compete for them.
+        """
+        return {
+            **os.environ,
+            **self.env,
+            "PALM_TASK_ENV": json.dumps(self.env),
+            "PALM_NO_SERVICE_PORTS": "1",
+        }
+
+
+class TaskGraph:
+    """Tasks and their dependencies
+
+    Args:
+        tasks (Dict[str, Task]): Tasks by name
+
+    Raises:
+        InvalidConfigError: If a task depends on an unknown task
+    """
+
+    def __init__(self, tasks: Dict[str, Task]) -> None:
+        self.tasks = tasks
+        for task in tasks.values():
+            for dependency in task.depends_on:
+                if dependency not in tasks:
+                    raise InvalidConfigError(
+                        f"Task {task.name} depends on unknown task {dependency}"
+                    )
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TaskGraph":
+        """Build the graph from the tasks section of .palm/config.yaml"""
+        tasks = config.get("tasks") or {}
+        if not isinstance(tasks, dict):
+            raise InvalidConfigError("tasks must be a mapping of task names")
+        return cls({name: Task.from_config(name, spec) for name, spec in tasks.items()})
+
+    def plan(self, targets: List[str]) -> List[str]:
+        """Tasks needed for the targets, dependencies first
+
+        Args:
+            targets (List[str]): Task names
+
+        Raises:
+            click.BadParameter: If a target is not a task
+            InvalidConfigError: If the dependencies have a cycle
+
+        Returns:
+            List[str]: Task names in a valid execution order
+        """
+        order: List[str] = []
+        visiting: List[str] = []
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                cycle = visiting[visiting.index(name) :] + [name]
+                raise InvalidConfigError(f"Task cycle: {' -> '.join(cycle)}")
+            visiting.append(name)
+            for dependency in self.tasks[name].depends_on:
+                visit(dependency)
+            visiting.pop()
+            order.append(name)
+
+        for target in targets:
+            if target not in self.tasks:
+                raise click.BadParameter(
+                    f"Unknown task {target}, expected one of: "
+                    + ", ".join(sorted(self.tasks))
+                )
+            visit(target)
+        return order
+
+
+class TaskRunner:
+    """Runs tasks concurrently, as soon as their dependencies pass
+
+    Args:
+        graph (TaskGraph): The task graph
+        jobs (int): Maximum tasks running at once
+        keep_going (bool): Keep running independent tasks after a failure
+        echo (Callable[[str], None]): Writes a line of output
+    """
+
+    def __init__(
+        self,
+        graph: TaskGraph,
+        jobs: int,
+        keep_going: bool = False,
+        echo: Callable[[str], None] = click.echo,
+    ) -> None:
+        self.graph = graph
+        self.jobs = max(1, jobs)
+        self.keep_going = keep_going
+        self.echo = echo
+        self.lock = threading.Lock()
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.stopping = False
+
+    def run(self, targets: List[str]) -> Dict[str, str]:
+        """Run the targets and their dependencies
+
+        Args:
+            targets (List[str]): Task names
+
+        Returns:
+            Dict[str, str]: Result of each planned task: passed, failed,
+            skipped (a dependency failed) or cancelled (stopped by a failure)
+        """
+        plan = self.graph.plan(targets)
+        width = max(len(name) for name in plan)
+        colors = itertools.cycle(PREFIX_COLORS)
+        self.prefixes = {
+            name: click.style(f"{name:<{width}} |", fg=next(colors)) for name in plan
+        }
+        results: Dict[str, str] = {}
+        pending = list(plan)
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            try:
+                while pending or running:
+                    for name in list(pending):
+                        dependencies = [
+                            results.get(d) for d in self.graph.tasks[name].depends_on
+                        ]
+                        if self.stopping:
+                            results[name] = CANCELLED
+                        elif any(
+                            r in (FAILED, SKIPPED, CANCELLED) for r in dependencies
+                        ):
+                            results[name] = SKIPPED
+                        elif all(r == PASSED for r in dependencies):
+                            if len(running) >= self.jobs:
+                                continue
+                            running[pool.submit(self.execute, name)] = name
+                        else:
+                            continue
+                        pending.remove(name)
+
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if future.result() == 0:
+                            results[name] = PASSED
+                        elif self.stopping:
+                            results[name] = CANCELLED
+                        else:
+                            results[name] = FAILED
+                            if not self.keep_going:
+                                self.stop()
+            except BaseException:
+                # e.g. Ctrl-C: the tasks run in their own sessions and don't get
+                # it, so terminate them before the pool waits for them
+                self.stop()
+                raise
+        return {name: results[name] for name in plan}
+
+    def execute(self, name: str) -> int:
+        """Run one task, echoing its output prefixed with the task name
+
+        Returns:
+            int: The task's exit code
+        """
+        task = self.graph.tasks[name]
+        argv = task.argv()
+        if argv is None:
+            return 0
+        with self.lock:
+            if self.stopping:
+                return -1
+            process = subprocess.Popen(
+                argv,
+                env=task.environ(),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                # Own process group, so stop() reaches docker and other children
+                start_new_session=True,
+            )
+            self.processes[name] = process
+        for line in iter(process.stdout.readline, b""):
+            text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            with self.lock:
+                self.echo(f"{self.prefixes[name]} {text}")
+        process.stdout.close()
+        code = process.wait()
+        with self.lock:
+            del self.processes[name]
+        return code
+
+    def stop(self) -> None:
+        """Stop scheduling tasks and terminate the running ones"""
+        with self.lock:
+            self.stopping = True
+            for process in self.processes.values():
+                try:
+                    os.killpg(process.pid, signal.SIGTERM)
+                except OSError:
+                    pass
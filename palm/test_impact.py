@@ -0,0 +1,348 @@
+"""Run only the tests affected by a change
+
+``palm test --affected`` keeps a map from each test to the project files it
+ran code from, recorded in the container while the tests run. The map is kept
+in ``.palm/cache/test_impact.json``. The working tree is diffed against a
+base commit, by default the HEAD of the map's last run, and only these tests
+run:
+
+* tests which ran code from a changed file, or are defined in one
+* tests which aren't in the map yet, e.g. new tests
+* tests which failed last time
+
+Without a usable map, or when a file every test depends on (conftest.py,
+pytest or dependency config) has changed, the whole suite runs and the map is
+recorded again.
+"""
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from palm import cache
+from palm.result_cache import glob_pattern
+
+IMPACT_DIRECTORY = Path(".palm") / "cache" / "impact"
+MAP_FILE = Path(".palm") / "cache" / "test_impact.json"
+# Changes to these files can affect any test
+GLOBAL_FILES = (
+    "**/conftest.py",
+    "pytest.ini",
+    "tox.ini",
+    "setup.cfg",
+    "setup.py",
+    "pyproject.toml",
+    "**/requirements*.txt",
+    "Pipfile.lock",
+    "poetry.lock",
+    "Dockerfile",
+)
+
+# Runs inside the container, from the project root
+IMPACT_SCRIPT = '''\
+"""Generated by palm test --affected, do not edit"""
+import json
+import os
+import sys
+
+import pytest
+
+directory = os.path.dirname(os.path.abspath(__file__))
+root = os.getcwd() + os.sep
+
+
+def path(name):
+    return os.path.join(directory, name)
+
+
+class Tracer:
+    """Records the files each test runs code from"""
+
+    def __init__(self):
+        self.files = set()
+        self.monitoring = getattr(sys, "monitoring", None)
+        if self.monitoring:
+            try:
+                self.monitoring.use_tool_id(self.monitoring.COVERAGE_ID, "palm")
+            except ValueError:
+                self.monitoring = None
+
+    def start(self):
+        self.files = set()
+        if self.monitoring:
+            # Each function start is reported once, then disabled until restart
+            events = self.monitoring.events
+            self.monitoring.register_callback(
+                self.monitoring.COVERAGE_ID, events.PY_START, self.on_start
+            )
+            self.monitoring.set_events(self.monitoring.COVERAGE_ID, events.PY_START)
+            self.monitoring.restart_events()
+        else:
+            sys.settrace(self.on_call)
+
+    def stop(self):
+        if self.monitoring:
+            self.monitoring.set_events(self.monitoring.COVERAGE_ID, 0)
+        else:
+            sys.settrace(None)
+        return sorted(
+            f[len(root):]
+            for f in self.files
+            if f.startswith(root) and not f.startswith(directory)
+        )
+
+    def on_start(self, code, offset):
+        self.files.add(code.co_filename)
+        return self.monitoring.DISABLE
+
+    def on_call(self, frame, event, arg):
+        self.files.add(frame.f_code.co_filename)
+
+
+class Impact:
+    def __init__(self, selection):
+        self.selection = selection
+        self.tracer = Tracer()
+        self.collected = []
+        self.coverage = {}
+        self.failed = set()
+
+    def pytest_collection_modifyitems(self, config, items):
+        self.collected = [item.nodeid for item in items]
+        if self.selection is None:
+            return
+        known = set(self.selection["known"])
+        affected = set(self.selection["affected"])
+        selected, deselected = [], []
+        for item in items:
+            if item.nodeid in affected or item.nodeid not in known:
+                selected.append(item)
+            else:
+                deselected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.tracer.start()
+        try:
+            yield
+        finally:
+            self.coverage[item.nodeid] = self.tracer.stop()
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            self.failed.add(report.nodeid)
+
+
+selection = None
+if len(sys.argv) > 1:
+    with open(path(sys.argv[1])) as f:
+        selection = json.load(f)
+impact = Impact(selection)
+code = int(pytest.main([], plugins=[impact]))
+with open(path("coverage.json"), "w") as f:
+    json.dump(
+        {
+            "exit_code": code,
+            "collected": impact.collected,
+            "coverage": impact.coverage,
+            "failed": sorted(impact.failed),
+        },
+        f,
+    )
+if selection is not None and code == pytest.ExitCode.NO_TESTS_COLLECTED:
+    # Every collected test was deselected, nothing was affected
+    code = 0
+sys.exit(code)
+'''
+
+
+class ImpactMap:
+    """Which project files each test ran code from
+
+    Stored compactly: each file path once, and each test as indexes into the
+    file list.
+
+    Args:
+        project_root (Path): The project's root directory
+    """
+
+    VERSION = 1
+
+    def __init__(self, project_root: Path) -> None:
+        self.path = project_root / MAP_FILE
+        self.commit: Optional[str] = None
+        self.tests: Dict[str, Set[str]] = {}
+        self.failed: Set[str] = set()
+
+    def load(self) -> bool:
+        """Read the map
+
+        Returns:
+            bool: False if there is no usable map
+        """
+        try:
+            document = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return False
+        if not isinstance(document, dict) or document.get("version") != self.VERSION:
+            return False
+        files = document["files"]
+        self.commit = document["commit"]
+        self.tests = {
+            test_id: {files[i] for i in indexes}
+            for test_id, indexes in document["tests"].items()
+        }
+        self.failed = set(document["failed"])
+        return True
+
+    def save(self) -> None:
+        files = sorted({f for test_files in self.tests.values() for f in test_files})
+        index = {name: i for i, name in enumerate(files)}
+        document = {
+            "version": self.VERSION,
+            "commit": self.commit,
+            "files": files,
+            "tests": {
+                test_id: sorted(index[f] for f in test_files)
+                for test_id, test_files in sorted(self.tests.items())
+            },
+            "failed": sorted(self.failed),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(document, separators=(",", ":")))
+
+    def update(self, result: dict, full: bool) -> None:
+        """Merge the coverage recorded by a run
+
+        Args:
+            result (dict): coverage.json written by the impact script
+            full (bool): The whole suite ran, so tests not collected are gone
+        """
+        collected = set(result["collected"])
+        if full:
+            self.tests = {}
+        else:
+            self.tests = {t: f for t, f in self.tests.items() if t in collected}
+        for test_id, test_files in result["coverage"].items():
+            self.tests[test_id] = set(test_files)
+        ran = set(result["coverage"])
+        self.failed = (self.failed - ran) & collected | set(result["failed"])
+
+    def affected(self, changed: Iterable[str]) -> List[str]:
+        """Tests which ran code from, or are defined in, a changed file
+
+        Args:
+            changed (Iterable[str]): Changed paths, relative to the project root
+
+        Returns:
+            List[str]: Affected test IDs, including tests which failed last time
+        """
+        changed = set(changed)
+        return sorted(
+            test_id
+            for test_id, test_files in self.tests.items()
+            if test_id in self.failed
+            or test_id.split("::", 1)[0] in changed
+            or not changed.isdisjoint(test_files)
+        )
+
+
+def global_changes(changed: Iterable[str]) -> List[str]:
+    """Changed files which can affect any test, see GLOBAL_FILES"""
+    patterns = [glob_pattern(pattern) for pattern in GLOBAL_FILES]
+    return sorted(f for f in changed if any(p.match(f) for p in patterns))
+
+
+class AffectedTestRun:
+    """One run of the tests affected by the working tree's changes
+
+    Args:
+        project_root (Path): The project's root directory, mounted in the container
+        run_in_docker (Callable): Runs a command in docker, like
+            :obj:`palm.environment.Environment.run_in_docker`
+    """
+
+    def __init__(self, project_root: Path, run_in_docker: Callable) -> None:
+        self.project_root = project_root
+        self.run_in_docker = run_in_docker
+        self.directory = project_root / IMPACT_DIRECTORY
+        self.map = ImpactMap(project_root)
+
+    def prepare(self) -> None:
+        """Clear results of earlier runs and write the impact script"""
+        cache.project_cache_dir(self.project_root)
+        self.directory.mkdir(exist_ok=True)
+        for path in self.directory.iterdir():
+            path.unlink()
+        (self.directory / "run_impact.py").write_text(IMPACT_SCRIPT)
+
+    def select(self, repo, base: Optional[str] = None) -> dict:
+        """Decide which tests to run
+
+        Args:
+            repo (Repository): The project's pygit2 repository
+            base (Optional[str]): Commit to diff the working tree against,
+                defaults to HEAD as of the map's last run
+
+        Returns:
+            dict: ``full`` and a ``reason`` if the whole suite must run,
+            otherwise the ``known`` and ``affected`` test IDs and ``changed`` files
+        """
+        from palm import git_utils
+
+        if not self.map.load():
+            return {"full": True, "reason": "no test impact map recorded yet"}
+        base = base or self.map.commit
+        if not base or git_utils.resolve_commit(repo, base) is None:
+            return {"full": True, "reason": f"base commit {base} not found"}
+
+        changed = git_utils.changed_files(repo, base, self.project_root)
+        changed = {f for f in changed if not f.startswith(".palm/cache/")}
+        global_changed = global_changes(changed)
+        if global_changed:
+            return {
+                "full": True,
+                "reason": f"{', '.join(global_changed)} changed",
+            }
+        return {
+            "full": False,
+            "changed": sorted(changed),
+            "known": sorted(self.map.tests),
+            "affected": self.map.affected(changed),
+        }
+
+    def run(self, selection: dict, repo) -> bool:
+        """Run the selected tests in docker, recording their coverage
+
+        Args:
+            selection (dict): From select()
+            repo (Repository): The project's pygit2 repository
+
+        Returns:
+            bool: True if the tests passed
+        """
+        from palm import git_utils
+
+        self.prepare()
+        args = [(IMPACT_DIRECTORY / "run_impact.py").as_posix()]
+        if not selection["full"]:
+            (self.directory / "selection.json").write_text(
+                json.dumps(
+                    {"known": selection["known"], "affected": selection["affected"]}
+                )
+            )
+            args.append("selection.json")
+        success, _ = self.run_in_docker(" ".join(["python", *args]))
+
+        try:
+            result = json.loads((self.directory / "coverage.json").read_text())
+        except (OSError, ValueError):
+            return False
+        # Tests affected by changes since the old commit have just run, so
+        # the map is current for HEAD
+        self.map.commit = git_utils.resolve_commit(repo, "HEAD")
+        self.map.update(result, selection["full"])
+        self.map.save()
+        return success
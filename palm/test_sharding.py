@@ -0,0 +1,292 @@
+"""Split a pytest suite across parallel containers
+
+``palm test --shards N`` collects the test IDs in docker, splits them into N
+buckets of about equal expected duration and runs each bucket in its own
+container at the same time. Durations recorded by each run are kept in the
+palm cache directory, so the split gets better over time.
+
+The containers and palm exchange files through ``.palm/cache/shards``, which
+is inside the project directory mounted into the container.
+"""
+import hashlib
+import heapq
+import json
+import statistics
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import click
+
+from palm import cache
+
+SHARD_DIRECTORY = Path(".palm") / "cache" / "shards"
+# Expected duration of tests which have never been timed, if nothing is known
+DEFAULT_DURATION = 1.0
+
+# Runs inside the container, from the project root
+SHARD_SCRIPT = '''\
+"""Generated by palm test --shards, do not edit"""
+import json
+import os
+import sys
+
+import pytest
+
+directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def path(name):
+    return os.path.join(directory, name)
+
+
+class Collector:
+    def pytest_collection_finish(self, session):
+        with open(path("collected.json"), "w") as f:
+            json.dump([item.nodeid for item in session.items], f)
+
+
+class Recorder:
+    def __init__(self):
+        self.durations = {}
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = (
+            self.durations.get(report.nodeid, 0) + report.duration
+        )
+
+
+def redirect_output(name):
+    log = os.open(path(name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(log, 1)
+    os.dup2(log, 2)
+
+
+mode = sys.argv[1]
+if mode == "collect":
+    redirect_output("collect.log")
+    sys.exit(int(pytest.main(["--collect-only", "-q"], plugins=[Collector()])))
+
+shard = sys.argv[2]
+with open(path(f"shard-{shard}.json")) as f:
+    test_ids = json.load(f)
+redirect_output(f"shard-{shard}.log")
+recorder = Recorder()
+code = int(
+    pytest.main(
+        ["-p", "no:cacheprovider", f"--junitxml={path(f'junit-{shard}.xml')}"]
+        + test_ids,
+        plugins=[recorder],
+    )
+)
+with open(path(f"result-{shard}.json"), "w") as f:
+    json.dump({"exit_code": code, "durations": recorder.durations}, f)
+sys.exit(code)
+'''
+
+
+class DurationHistory:
+    """Recorded test durations for a project, in the palm cache directory
+
+    Args:
+        project_root (Path): The project's root directory
+    """
+
+    DIRECTORY = "test_durations"
+
+    def __init__(self, project_root: Path) -> None:
+        digest = hashlib.sha1(str(project_root).encode()).hexdigest()
+        self.name = f"{self.DIRECTORY}/{digest}.json"
+        durations = cache.read_json(self.name)
+        self.durations: Dict[str, float] = (
+            durations if isinstance(durations, dict) else {}
+        )
+
+    def expected(self, test_ids: List[str]) -> Dict[str, float]:
+        """Expected duration of each test, the median for tests never timed"""
+        known = [self.durations[i] for i in test_ids if i in self.durations]
+        default = statistics.median(known) if known else DEFAULT_DURATION
+        return {i: self.durations.get(i, default) for i in test_ids}
+
+    def update(self, durations: Dict[str, float]) -> None:
+        """Record new durations, smoothing them with the previous ones"""
+        for test_id, duration in durations.items():
+            previous = self.durations.get(test_id)
+            self.durations[test_id] = (
+                duration if previous is None else (previous + duration) / 2
+            )
+
+    def save(self, test_ids: Optional[List[str]] = None) -> None:
+        """Write the history, dropping tests which no longer exist
+
+        Args:
+            test_ids (Optional[List[str]]): All current test IDs
+        """
+        if test_ids is not None:
+            current = set(test_ids)
+            self.durations = {i: d for i, d in self.durations.items() if i in current}
+        cache.write_json(self.name, self.durations)
+
+
+def partition(expected: Dict[str, float], shards: int) -> List[List[str]]:
+    """Split tests into buckets of about equal total duration
+
+    Longest tests first, each into the currently shortest bucket (LPT). Each
+    bucket keeps the collection order, so module and class fixtures are still
+    shared where tests stay together.
+
+    Args:
+        expected (Dict[str, float]): Expected duration of each test, in collection order
+        shards (int): Number of buckets
+
+    Returns:
+        List[List[str]]: Non-empty buckets of test IDs
+    """
+    order = {test_id: index for index, test_id in enumerate(expected)}
+    heap = [(0.0, shard) for shard in range(shards)]
+    buckets: List[List[str]] = [[] for _ in range(shards)]
+    for test_id in sorted(expected, key=lambda i: (-expected[i], order[i])):
+        total, shard = heapq.heappop(heap)
+        buckets[shard].append(test_id)
+        heapq.heappush(heap, (total + expected[test_id], shard))
+    return [sorted(b, key=order.__getitem__) for b in buckets if b]
+
+
+def merge_junit(reports: List[Path], target: Path) -> Dict[str, int]:
+    """Merge JUnit XML reports into one testsuites document
+
+    Args:
+        reports (List[Path]): Per-shard reports, missing ones are skipped
+        target (Path): Where to write the merged report
+
+    Returns:
+        Dict[str, int]: Totals of tests, failures, errors and skipped
+    """
+    merged = ET.Element("testsuites")
+    totals = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+    for report in reports:
+        try:
+            root = ET.parse(report).getroot()
+        except (OSError, ET.ParseError):
+            continue
+        suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+        for suite in suites:
+            merged.append(suite)
+            for name in totals:
+                totals[name] += int(suite.get(name, 0))
+    for name, value in totals.items():
+        merged.set(name, str(value))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(merged).write(target, encoding="utf-8", xml_declaration=True)
+    return totals
+
+
+class ShardedTestRun:
+    """One sharded run of a project's test suite
+
+    Args:
+        project_root (Path): The project's root directory, mounted in the container
+        run_in_docker (Callable): Runs a command in docker, like
+            :obj:`palm.environment.Environment.run_in_docker`
+    """
+
+    def __init__(self, project_root: Path, run_in_docker: Callable) -> None:
+        self.project_root = project_root
+        self.run_in_docker = run_in_docker
+        self.directory = project_root / SHARD_DIRECTORY
+        self.history = DurationHistory(project_root)
+
+    def prepare(self) -> None:
+        """Clear results of earlier runs and write the shard script"""
+        cache.project_cache_dir(self.project_root)
+        self.directory.mkdir(exist_ok=True)
+        for path in self.directory.iterdir():
+            path.unlink()
+        (self.directory / "run_shard.py").write_text(SHARD_SCRIPT)
+
+    def script(self, *args: str) -> str:
+        return " ".join(
+            ["python", (SHARD_DIRECTORY / "run_shard.py").as_posix(), *args]
+        )
+
+    def read(self, name: str) -> str:
+        """Text of a file the containers wrote, empty if there is none"""
+        try:
+            return (self.directory / name).read_text()
+        except OSError:
+            return ""
+
+    def collect(self) -> List[str]:
+        """Collect the suite's test IDs in docker
+
+        Returns:
+            List[str]: Test node IDs, in collection order
+
+        Raises:
+            click.ClickException: If collection fails, with pytest's output
+        """
+        success, output = self.run_in_docker(self.script("collect"), silent=True)
+        try:
+            test_ids = json.loads(self.read("collected.json"))
+        except ValueError:
+            test_ids = None
+        # pytest exits non-zero with no tests too, but collects some on errors
+        if not isinstance(test_ids, list) or (test_ids and not success):
+            log = self.read("collect.log") or output
+            raise click.ClickException(f"Failed to collect tests\n{log}")
+        return test_ids
+
+    def run_shard(self, shard: int) -> dict:
+        """Run one shard in its own container
+
+        Returns:
+            dict: exit_code, durations and elapsed seconds
+        """
+        start = time.perf_counter()
+        _, output = self.run_in_docker(
+            self.script("run", str(shard)), silent=True, service_ports=False
+        )
+        try:
+            result = json.loads(self.read(f"result-{shard}.json"))
+        except ValueError:
+            # The container failed before pytest finished, keep its output
+            result = {"exit_code": None, "durations": {}, "output": output}
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    def run(
+        self, shards: int, on_finished: Callable[[int, dict], None] = lambda s, r: None
+    ) -> List[dict]:
+        """Collect, split and run the suite
+
+        Args:
+            shards (int): Number of containers to run at once
+            on_finished (Callable[[int, dict], None]): Called as each shard finishes
+
+        Returns:
+            List[dict]: Each shard's result, with its tests and log
+        """
+        self.prepare()
+        test_ids = self.collect()
+        if not test_ids:
+            return []
+        buckets = partition(self.history.expected(test_ids), shards)
+        for shard, bucket in enumerate(buckets):
+            (self.directory / f"shard-{shard}.json").write_text(json.dumps(bucket))
+
+        def run(shard: int) -> dict:
+            result = self.run_shard(shard)
+            result["tests"] = buckets[shard]
+            result["log"] = self.read(f"shard-{shard}.log") + result.pop("output", "")
+            on_finished(shard, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=len(buckets)) as pool:
+            results = list(pool.map(run, range(len(buckets))))
+
+        for result in results:
+            self.history.update(result["durations"])
+        self.history.save(test_ids)
+        return results
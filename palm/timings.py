@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+
+class Timings:
+    """Records how long each startup phase took, for --timings output"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, Optional[float], str]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of a with block as a named phase
+
+        Args:
+            name (str): Name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start, ""))
+
+    def skip(self, name: str, reason: str = "skipped") -> None:
+        """Record a phase which didn't run
+
+        Args:
+            name (str): Name of the phase
+            reason (str): Why it didn't run
+        """
+        self.phases.append((name, None, reason))
+
+    def report(self) -> str:
+        """Format the recorded phases, one per line
+
+        Returns:
+            str: The timings report
+        """
+        width = max([len(name) for name, _, _ in self.phases] + [len("total")])
+        lines = []
+        for name, elapsed, note in self.phases:
+            value = f"{elapsed * 1000:8.1f}ms" if elapsed is not None else f"{'-':>10}"
+            lines.append(f"{name:<{width}} {value}  {note}".rstrip())
+        total = (time.perf_counter() - self.started) * 1000
+        lines.append(f"{'total':<{width}} {total:8.1f}ms")
+        return "\n".join(lines)
+
+
+timings = Timings()
@@ -64,17 +64,27 @@ def run_in_docker(
     no_bin_bash: Optional[bool] = False,
     capture_output: Optional[bool] = False,
     silent: Optional[bool] = False,
+    service_ports: Optional[bool] = True,
+    extra_args: Optional[List[str]] = None,
 ) -> Tuple[bool, str]:
     """Shells out and runs the cmd in docker
 
     Args:
         cmd (str): The command you want to run
         env_vars (Optional[dict], optional): Dict of env vars to pass to the docker container.
+        service_ports (Optional[bool], optional): Publish the service's ports on the host.
+            Parallel runs leave this off, so their containers don't compete for ports.
+        extra_args (Optional[List[str]], optional): More docker compose run flags,
+            e.g. the cache volume's.
     """
     if not silent:
         click.secho(f"Executing command `{cmd}` in compose...", fg="yellow")
 
-    docker_cmd = ["docker compose run --service-ports --rm"]
+    docker_cmd = ["docker compose run"]
+    if service_ports:
+        docker_cmd.append("--service-ports")
+    docker_cmd.append("--rm")
+    docker_cmd.extend(extra_args or [])
     docker_cmd.extend(env_vars)
     docker_cmd.append(image_name)
     if no_bin_bash:
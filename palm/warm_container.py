@@ -0,0 +1,212 @@
+"""Long-lived service container for running palm commands in docker
+
+With ``docker_executor: warm`` in .palm/config.yaml, palm starts one container
+per project with ``docker compose run`` and runs commands in it with
+``docker exec``, instead of creating a new container for every command.
+
+The container's main process exits once nothing has been run in it for
+``docker_idle_timeout`` seconds. Every command touches a marker file while it
+runs, which keeps the container alive.
+"""
+import hashlib
+import re
+import shlex
+import sys
+from typing import List, Optional, Tuple
+
+import click
+
+from palm.docker_api import DockerAPIError, DockerClient, UnsupportedDockerHost
+from palm.palm_config import PalmConfig
+from palm.utils import run_on_host
+
+DEFAULT_IDLE_TIMEOUT = 1800
+MARKER = "/tmp/.palm-last-used"
+HEARTBEAT_INTERVAL = 30
+
+# Main process of the warm container: exit after idle_timeout without use
+KEEPALIVE = (
+    "touch {marker}; "
+    "while [ $(( $(date +%s) - $(date -r {marker} +%s) )) -lt {timeout} ]; "
+    "do sleep {interval}; done"
+)
+# Wraps each command, touching the marker while it runs
+HEARTBEAT = (
+    "touch {marker}; "
+    "(while sleep {interval}; do touch {marker}; done) </dev/null >/dev/null 2>&1 & "
+    'hb=$!; "$@"; rc=$?; kill $hb 2>/dev/null; touch {marker}; exit $rc'
+)
+
+
+def container_name(palm_config: PalmConfig) -> str:
+    """Name of the warm container for a project
+
+    Includes a hash of the project root, so separate checkouts of the same
+    project get their own container.
+
+    Args:
+        palm_config (PalmConfig): The project's config
+
+    Returns:
+        str: e.g. palm-my_project-1a2b3c4d
+    """
+    digest = hashlib.sha1(str(palm_config.project_root).encode()).hexdigest()[:8]
+    image_name = re.sub(r"[^a-zA-Z0-9_.-]", "-", palm_config.image_name)
+    return f"palm-{image_name}-{digest}"
+
+
+class WarmContainer:
+    """The warm service container for a project
+
+    Args:
+        palm_config (PalmConfig): The project's config
+        client (Optional[DockerClient]): Docker API client, for status checks
+    """
+
+    def __init__(
+        self, palm_config: PalmConfig, client: Optional[DockerClient] = None
+    ) -> None:
+        self.palm = palm_config
+        self.service = palm_config.image_name
+        self.name = container_name(palm_config)
+        self.idle_timeout = int(
+            palm_config.config.get("docker_idle_timeout") or DEFAULT_IDLE_TIMEOUT
+        )
+        self._client = client
+
+    def inspect(self) -> Optional[dict]:
+        """Get the container's details from the docker engine
+
+        Returns:
+            Optional[dict]: Container details, or None if it doesn't exist
+        """
+        try:
+            client = self._client or DockerClient()
+            response = client.request("GET", f"/containers/{self.name}/json")
+        except UnsupportedDockerHost:
+            return self._inspect_with_cli()
+        except DockerAPIError:
+            return None
+        if response.status != 200:
+            return None
+        return response.json()
+
+    def _inspect_with_cli(self) -> Optional[dict]:
+        import json
+
+        code, stdout, _ = run_on_host(f"docker inspect {self.name}", False, True)
+        if code != 0:
+            return None
+        details = json.loads(stdout)
+        return details[0] if details else None
+
+    def status(self) -> str:
+        """Get the container's state
+
+        Returns:
+            str: "missing", or the docker state, e.g. "running" or "exited"
+        """
+        details = self.inspect()
+        if details is None:
+            return "missing"
+        return details.get("State", {}).get("Status", "unknown")
+
+    def start(self) -> bool:
+        """Start the container, unless it is already running
+
+        A stopped container is removed and started again, so it picks up any
+        changes to the compose file.
+
+        Returns:
+            bool: True if the container is running
+        """
+        status = self.status()
+        if status == "running":
+            return True
+        if status != "missing":
+            self.stop()
+
+        keepalive = KEEPALIVE.format(
+            marker=MARKER,
+            timeout=self.idle_timeout,
+            interval=min(HEARTBEAT_INTERVAL, self.idle_timeout),
+        )
+        from palm.cache_volume import CacheVolume
+
+        cmd = [
+            "docker compose run -d --service-ports",
+            *CacheVolume(self.palm).compose_flags(),
+            f"--name {self.name}",
+            self.service,
+            "sh -c",
+            shlex.quote(keepalive),
+        ]
+        code, _, stderr = run_on_host(" ".join(cmd), False, True)
+        if code != 0:
+            click.secho(f"Failed to start {self.name}: {stderr}", fg="red")
+            return False
+        return True
+
+    def stop(self) -> bool:
+        """Stop and remove the container
+
+        Returns:
+            bool: True if a container was removed
+        """
+        code, _, _ = run_on_host(f"docker rm -f {self.name}", False, True)
+        return code == 0
+
+    def exec_command(
+        self, cmd: str, env_vars: List[str], no_bin_bash: bool = False
+    ) -> str:
+        """Build the docker exec command line for a palm command
+
+        Args:
+            cmd (str): The command to run
+            env_vars (List[str]): docker -e flags
+            no_bin_bash (bool): Run cmd directly instead of with /bin/bash -c
+
+        Returns:
+            str: Shell command line
+        """
+        heartbeat = HEARTBEAT.format(marker=MARKER, interval=HEARTBEAT_INTERVAL)
+        docker_cmd = ["docker exec -i"]
+        if sys.stdin.isatty() and sys.stdout.isatty():
+            docker_cmd.append("-t")
+        docker_cmd.extend(env_vars)
+        docker_cmd.extend([self.name, "sh -c", shlex.quote(heartbeat), "palm"])
+        if no_bin_bash:
+            docker_cmd.append(cmd)
+        else:
+            docker_cmd.append(f'/bin/bash -c "{cmd}" ')
+        return " ".join(docker_cmd)
+
+    def run(
+        self,
+        cmd: str,
+        env_vars: Optional[List[str]] = [],
+        no_bin_bash: Optional[bool] = False,
+        capture_output: Optional[bool] = False,
+        silent: Optional[bool] = False,
+    ) -> Tuple[bool, str]:
+        """Run a command in the warm container, starting it if needed
+
+        Takes the same arguments and returns the same results as
+        :obj:`palm.utils.run_in_docker`.
+        """
+        if not silent:
+            click.secho(f"Executing command `{cmd}` in {self.name}...", fg="yellow")
+        if not self.start():
+            return (False, f"Fail! Could not start {self.name}")
+
+        ex_code, std_out, std_err = run_on_host(
+            self.exec_command(cmd, env_vars, no_bin_bash), False, capture_output
+        )
+        if capture_output:
+            if ex_code == 0:
+                return (True, std_out)
+            return (False, std_err)
+
+        if ex_code == 0:
+            return (True, "Success! Palm completed with exit code 0")
+        return (False, f"Fail! Palm exited with code {ex_code}")
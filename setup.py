@@ -33,7 +33,12 @@ setup(
     package_data={"": ["*.yaml", "*.txt"]},
     entry_points="""
     [console_scripts]
-    palm=palm.cli:cli
+    palm=palm.daemon_client:main
+
+    [palm.plugins]
+    core=palm.plugins.core
+    repo=palm.plugins.repo
+    setup=palm.plugins.setup
   """,
     license="Apache License 2.0",
     install_requires=Path("requirements.txt").read_text().splitlines(),
@@ -1,11 +1,13 @@
+import json
 import shutil
+import socketserver
 import sys
+import threading
 import zipfile
 from pathlib import Path
 from unittest import mock
 from pydantic import BaseModel
 
-import pygit2
 import pytest
 import yaml
 
@@ -19,6 +21,14 @@ from palm.plugins.base_plugin_config import BasePluginConfig
 sys.modules["palm.plugins.mock"] = mock.Mock()
 
 
+@pytest.fixture(autouse=True)
+def palm_cache_dir(tmp_path, monkeypatch):
+    """Keep palm's user cache isolated for each test"""
+    cache_dir = tmp_path / "palm-cache"
+    monkeypatch.setenv("PALM_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
 def test_command():
     return """import click
 
@@ -85,7 +95,7 @@ def mock_plugin_config(
     return MockPluginConfig(plugin_name, model, config)
 
 
-def mock_repository(tmp_path):
+def mock_git_dir(tmp_path):
     class TemporaryRepository:
         def __init__(self, name, tmp_path):
             self.name = name
@@ -109,7 +119,7 @@ def mock_repository(tmp_path):
 
     # Note barerepo head is set to test branch
     with TemporaryRepository("barerepo.zip", tmp_path) as path:
-        return pygit2.Repository(path)
+        return path
 
 
 def write_config_to_path(path, config):
@@ -121,14 +131,16 @@ def write_config_to_path(path, config):
 # TODO: parametrize the palm_config fixture for different configs
 @pytest.fixture
 def no_palm_config(tmp_path, monkeypatch):
-    monkeypatch.setattr(PalmConfig, "_get_repo", lambda self: mock_repository(tmp_path))
+    monkeypatch.setattr(
+        PalmConfig, "_find_git_dir", lambda self: mock_git_dir(tmp_path)
+    )
 
     return PalmConfig(Path(tmp_path))
 
 
 @pytest.fixture
 def no_repo_palm_config(tmp_path, monkeypatch):
-    monkeypatch.setattr(PalmConfig, '_get_repo', lambda self: None)
+    monkeypatch.setattr(PalmConfig, '_find_git_dir', lambda self: None)
 
     return PalmConfig(Path(tmp_path))
 
@@ -142,7 +154,9 @@ def palm_config(tmp_path, monkeypatch):
         "protected_branches": ["main"],
     }
     write_config_to_path(palm_config_path, mock_config)
-    monkeypatch.setattr(PalmConfig, "_get_repo", lambda self: mock_repository(tmp_path))
+    monkeypatch.setattr(
+        PalmConfig, "_find_git_dir", lambda self: mock_git_dir(tmp_path)
+    )
     return PalmConfig(Path(tmp_path))
 
 
@@ -155,14 +169,126 @@ def palm_config_protected(tmp_path, monkeypatch):
     def mock_current_branch(self):
         return "main"
 
-    monkeypatch.setattr(PalmConfig, "_get_repo", lambda self: mock_repository(tmp_path))
+    monkeypatch.setattr(
+        PalmConfig, "_find_git_dir", lambda self: mock_git_dir(tmp_path)
+    )
     monkeypatch.setattr(PalmConfig, "_get_current_branch", mock_current_branch)
     return PalmConfig(Path(tmp_path))
 
 
 @pytest.fixture
 def environment(tmp_path, monkeypatch):
-    monkeypatch.setattr(PalmConfig, "_get_repo", lambda self: mock_repository(tmp_path))
+    monkeypatch.setattr(
+        PalmConfig, "_find_git_dir", lambda self: mock_git_dir(tmp_path)
+    )
     pm = mock_plugin_manager(tmp_path)
     config = PalmConfig(Path(tmp_path))
     return Environment(pm, config)
+
+
+class FakeDockerEngine:
+    """Stand-in for the Docker Engine API, served on a Unix socket
+
+    Routes map (method, path) to a (status, body) tuple, or to a callable
+    taking (handler, request) which writes its own response.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.host = f"unix://{path}"
+        self.requests = []
+        self.routes = {("GET", "/_ping"): (200, b"OK")}
+        engine = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                request_line = self.rfile.readline().decode().split()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = self.rfile.readline().decode().rstrip("\r\n")
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = self.rfile.read(int(headers.get("content-length", 0)))
+                request = {
+                    "method": request_line[0],
+                    "path": request_line[1],
+                    "headers": headers,
+                    "body": json.loads(body) if body else None,
+                }
+                engine.requests.append(request)
+                engine.respond(self, request)
+
+        self.server = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+        self.server.daemon_threads = True
+
+    def route(self, method: str, path: str, response) -> None:
+        self.routes[(method, path)] = response
+
+    def respond(self, handler, request) -> None:
+        path = request["path"]
+        response = self.routes.get((request["method"], path)) or self.routes.get(
+            (request["method"], path.split("?")[0]), (404, {"message": "not found"})
+        )
+        if callable(response):
+            return response(handler, request)
+        status, body = response
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        handler.wfile.write(
+            f"HTTP/1.1 {status} X\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+
+    def calls(self, method: str, path: str) -> list:
+        return [
+            r
+            for r in self.requests
+            if r["method"] == method and r["path"].split("?")[0] == path
+        ]
+
+
+@pytest.fixture
+def docker_engine(tmp_path, monkeypatch):
+    engine = FakeDockerEngine(tmp_path / "docker.sock")
+    thread = threading.Thread(
+        target=engine.server.serve_forever, args=(0.01,), daemon=True
+    )
+    thread.start()
+    monkeypatch.setenv("DOCKER_HOST", engine.host)
+    yield engine
+    engine.server.shutdown()
+    engine.server.server_close()
+
+
+class FakeCompose:
+    """Stand-in for the docker CLI on the host
+
+    ``docker compose config`` prints ``config``, every other command
+    succeeds without output. All commands are recorded.
+    """
+
+    def __init__(self):
+        self.config = {"name": "palm-test", "services": {}}
+        self.commands = []
+
+    def run_on_host(self, cmd, check=False, capture_output=False):
+        self.commands.append(cmd)
+        if "docker compose config" in cmd:
+            return (0, json.dumps(self.config), "")
+        return (0, "", "")
+
+    def resolutions(self) -> int:
+        return len([cmd for cmd in self.commands if "docker compose config" in cmd])
+
+
+@pytest.fixture
+def compose(monkeypatch):
+    from palm import compose_spec
+
+    fake = FakeCompose()
+    monkeypatch.setattr(compose_spec, "run_on_host", fake.run_on_host)
+    return fake
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from palm.build_context import ContextScan, generate_dockerignore, gitignore_patterns
+from palm.dockerignore import DockerIgnore
+from palm.plugins.core.commands.cmd_containerize import cli as containerize_cli
+
+
+def make_project(root: Path) -> None:
+    (root / ".git" / "objects").mkdir(parents=True)
+    (root / ".git" / "objects" / "pack").write_bytes(b"x" * 4000)
+    (root / "env" / "lib").mkdir(parents=True)
+    (root / "env" / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    (root / "env" / "lib" / "site.py").write_bytes(b"x" * 2000)
+    (root / "app" / "logs").mkdir(parents=True)
+    (root / "app" / "main.py").write_text("print('hi')\n")
+    (root / "app" / "logs" / "run.log").write_text("log\n")
+    (root / "app" / ".gitignore").write_text("/logs/\n")
+    (root / "dump.sql").write_bytes(b"x" * 2 * 1024 * 1024)
+    (root / "requirements.txt").write_text("click\n")
+    (root / ".gitignore").write_text("*.lock\n!keep.lock\n/out/\n\\#notes\n")
+
+
+def test_gitignore_patterns(tmp_path):
+    make_project(tmp_path)
+    assert gitignore_patterns(tmp_path / ".gitignore") == [
+        "**/*.lock",
+        "!**/keep.lock",
+        "out",
+        "**/#notes",
+    ]
+    assert gitignore_patterns(tmp_path / "app" / ".gitignore", "app") == ["app/logs"]
+    assert gitignore_patterns(tmp_path / "missing") == []
+
+
+def test_scan(tmp_path):
+    make_project(tmp_path)
+    scan = ContextScan(tmp_path, DockerIgnore(["app/logs"]), large_file_mb=1).run()
+
+    assert scan.sizes[".git/"] == [4000, 1]
+    assert scan.sizes["env/"] == [2000 + len("home = /usr/bin\n"), 2]
+    assert scan.sizes["app/"][1] == 2
+    assert scan.sizes["dump.sql"] == [2 * 1024 * 1024, 1]
+    assert scan.findings() == [
+        (".git/", "version control"),
+        ("env/", "virtualenv"),
+        ("dump.sql", "2.0 MB, untracked"),
+    ]
+
+    scan = ContextScan(
+        tmp_path, DockerIgnore([]), tracked={"dump.sql"}, large_file_mb=1
+    ).run()
+    assert scan.large_files == []
+
+
+def test_generate_dockerignore(tmp_path):
+    make_project(tmp_path)
+    (tmp_path / "poetry.lock").write_text("")
+    content = generate_dockerignore(tmp_path, large_file_mb=1)
+    lines = content.splitlines()
+
+    assert lines[0] == "# Generated by palm containerize"
+    assert lines[lines.index("# Virtualenvs found in the project") + 1] == "env"
+    assert lines[lines.index("# Untracked files over 1 MB") + 1] == "dump.sql"
+    assert "app/logs" in lines
+    assert lines[-2:] == ["# Needed by the Dockerfile", "!poetry.lock"]
+
+    ignore = DockerIgnore(lines)
+    for path in (".git/HEAD", "env/lib/site.py", "app/logs/run.log", "dump.sql"):
+        assert ignore.is_excluded(path), path
+    for path in ("app/main.py", "requirements.txt", "poetry.lock"):
+        assert not ignore.is_excluded(path), path
+
+
+def test_containerize_analyze(tmp_path, environment):
+    make_project(tmp_path)
+    os.chdir(tmp_path)
+    result = CliRunner().invoke(containerize_cli, ["--analyze"], obj=environment)
+
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[1].split() == ["size", "files", "path"]
+    assert lines[2].split() == ["2.0", "MB", "1", "dump.sql"]
+    assert "  env/ (virtualenv)" in lines
+    assert not (tmp_path / "Dockerfile").exists()
@@ -0,0 +1,153 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from palm import build_fingerprint
+from palm.build_fingerprint import LABEL, BuildFingerprint, copied_sources
+from palm.plugins.core.commands.cmd_build import cli as build_cli
+
+DOCKERFILE = """\
+# syntax=docker/dockerfile:1
+FROM python:3.11 AS base
+COPY requirements.txt /app/
+RUN --mount=type=cache,target=/root/.cache pip install -r /app/requirements.txt
+COPY --chown=app:app \\
+    app/ /app/app/
+FROM base
+COPY --from=base /app /srv
+"""
+
+
+@pytest.fixture
+def build_project(environment, compose, tmp_path, monkeypatch):
+    environment.palm.config["image_name"] = "palm-test"
+    (tmp_path / "docker-compose.yaml").write_text("services: {}\n")
+    (tmp_path / "Dockerfile").write_text(DOCKERFILE)
+    (tmp_path / "requirements.txt").write_text("click\n")
+    (tmp_path / "README.md").write_text("readme\n")
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "main.py").write_text("print('hi')\n")
+    (tmp_path / "app" / "notes.txt").write_text("")
+    (tmp_path / ".dockerignore").write_text("**/*.txt\n!requirements.txt\n")
+    compose.config["services"]["palm-test"] = {
+        "image": "palm-test",
+        "build": {"context": str(tmp_path), "dockerfile": "Dockerfile"},
+    }
+    # The default docker driver, which can't export its cache
+    monkeypatch.setattr(
+        build_fingerprint,
+        "run_on_host",
+        lambda cmd, check, capture: (0, "Name: default\nDriver: docker\n", ""),
+    )
+    return environment
+
+
+def test_copied_sources():
+    assert copied_sources(DOCKERFILE) == ["requirements.txt", "app/"]
+    assert copied_sources('COPY ["a b.txt", "c", "/dst/"]\n') == ["a b.txt", "c"]
+    assert copied_sources("RUN --mount=type=bind,source=setup.py,target=/s true") == [
+        "setup.py"
+    ]
+    assert copied_sources("ADD https://example.com/x.tgz /x\n") == []
+    assert copied_sources("ARG SRC\nCOPY $SRC /app\n") is None
+    assert copied_sources("# escape=`\nCOPY a `\n    /b\n") == ["a"]
+
+
+def test_fingerprint_covers_copied_files(build_project, tmp_path):
+    build = BuildFingerprint(build_project.palm)
+    inputs = build.inputs()
+    assert sorted(inputs["files"]) == ["app/main.py", "requirements.txt"]
+    fingerprint = build.fingerprint(inputs)
+
+    # Not copied, or ignored
+    (tmp_path / "README.md").write_text("changed\n")
+    (tmp_path / "app" / "notes.txt").write_text("changed\n")
+    assert build.fingerprint(build.inputs()) == fingerprint
+
+    (tmp_path / "app" / "main.py").write_text("print('bye')\n")
+    assert build.fingerprint(build.inputs()) != fingerprint
+
+
+def test_explain(build_project, tmp_path):
+    build = BuildFingerprint(build_project.palm)
+    inputs = build.inputs()
+    assert build.explain(inputs, None) == ["there is no image palm-test built by palm"]
+    assert build.explain(inputs, "other") == [
+        "the image was built from inputs palm has no record of"
+    ]
+
+    build.save(inputs)
+    (tmp_path / "app" / "main.py").write_text("print('bye')\n")
+    (tmp_path / "app" / "util.py").write_text("")
+    (tmp_path / "Dockerfile").write_text(DOCKERFILE + "ENV X=1\n")
+    assert build.explain(build.inputs(), build.fingerprint(inputs)) == [
+        "dockerfile changed",
+        "changed app/main.py",
+        "added app/util.py",
+    ]
+
+
+class FakeBuilds:
+    def __init__(self, monkeypatch):
+        self.commands = []
+        self.labels = {}
+        monkeypatch.setattr(subprocess, "run", self.run)
+        monkeypatch.setattr(
+            BuildFingerprint, "image_fingerprint", lambda build: self.labels.get(LABEL)
+        )
+
+    def run(self, command, check=False, cwd=None, env=None):
+        self.commands.append(command)
+        self.env = env
+        override = json.loads(Path(command[command.index("build") - 1]).read_text())
+        self.labels = override["services"]["palm-test"]["build"]["labels"]
+
+
+def test_build_skips_unchanged_image(build_project, tmp_path, monkeypatch):
+    builds = FakeBuilds(monkeypatch)
+    result = CliRunner().invoke(build_cli, [], obj=build_project)
+    assert result.exit_code == 0, result.output
+    assert len(builds.commands) == 1
+    assert builds.commands[0][:4] == [
+        "docker",
+        "compose",
+        "-f",
+        str(tmp_path / "docker-compose.yaml"),
+    ]
+    assert builds.env["DOCKER_BUILDKIT"] == "1"
+
+    result = CliRunner().invoke(build_cli, [], obj=build_project)
+    assert "is up to date, skipping the build" in result.output
+    assert len(builds.commands) == 1
+
+    result = CliRunner().invoke(build_cli, ["--force"], obj=build_project)
+    assert len(builds.commands) == 2
+
+    (tmp_path / "requirements.txt").write_text("click\njinja2\n")
+    result = CliRunner().invoke(build_cli, ["--explain"], obj=build_project)
+    assert "changed requirements.txt" in result.output
+    assert len(builds.commands) == 3
+
+
+def test_build_uses_local_cache_with_exporting_builder(
+    build_project, tmp_path, monkeypatch, palm_cache_dir
+):
+    builds = FakeBuilds(monkeypatch)
+    monkeypatch.setattr(
+        build_fingerprint,
+        "run_on_host",
+        lambda cmd, check, capture: (0, "Driver: docker-container\n", ""),
+    )
+    CliRunner().invoke(build_cli, [], obj=build_project)
+
+    override = json.loads(
+        (tmp_path / ".palm" / "cache" / "build-override.json").read_text()
+    )
+    build = override["services"]["palm-test"]["build"]
+    assert "cache_from" not in build
+    assert build["cache_to"][0].startswith(
+        f"type=local,dest={palm_cache_dir}/buildkit/"
+    )
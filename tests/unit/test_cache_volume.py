@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from palm import cache_volume, utils
+from palm.cache_volume import PRUNE_SCRIPT, CacheVolume, has_own_cache
+from palm.plugins.core.commands.cmd_cache import cli as cache_cli
+
+
+@pytest.fixture
+def cache_project(environment, compose, tmp_path):
+    environment.palm.config["image_name"] = "palm-test"
+    (tmp_path / "docker-compose.yaml").write_text("services: {}\n")
+    compose.config["services"]["palm-test"] = {
+        "image": "palm-test:latest",
+        "volumes": [{"type": "bind", "source": str(tmp_path), "target": "/app"}],
+        "environment": {"PIP_CACHE_DIR": "/pip"},
+    }
+    return environment
+
+
+@pytest.fixture
+def host_commands(monkeypatch):
+    commands = []
+
+    def run_on_host(cmd, check=False, capture_output=False):
+        commands.append(cmd)
+        return (0, "", "")
+
+    monkeypatch.setattr(utils, "run_on_host", run_on_host)
+    return commands
+
+
+def test_has_own_cache():
+    assert not has_own_cache({"volumes": ["./:/app"]})
+    assert has_own_cache({"volumes": ["palm-cache:/cache"]})
+    assert has_own_cache({"volumes": [{"type": "volume", "target": "/root/.cache"}]})
+    assert has_own_cache({"environment": ["XDG_CACHE_HOME=/tmp"]})
+
+
+def test_compose_run_mounts_cache_volume(cache_project, host_commands):
+    cache_project.run_in_docker("pytest")
+
+    (run,) = host_commands
+    assert run.startswith(
+        "docker compose run --service-ports --rm "
+        "-v palm-test_palm-cache:/cache -e XDG_CACHE_HOME=/cache "
+    )
+    # The service's own setting wins
+    assert "PIP_CACHE_DIR" not in run
+    assert "-e PRE_COMMIT_HOME=/cache/pre-commit" in run
+
+
+def test_cache_volume_off(cache_project, host_commands, compose):
+    cache_project.palm.config["cache_volume"] = False
+    cache_project.run_in_docker("pytest")
+    assert "/cache" not in host_commands[0]
+
+    cache_project.palm.config["cache_volume"] = {"enabled": True}
+    compose.config["services"]["palm-test"]["volumes"].append("palm-cache:/cache")
+    CacheVolume(cache_project.palm).spec.clear()
+    cache_project.run_in_docker("pytest")
+    assert "/cache" not in host_commands[1]
+
+
+def test_prune_script(tmp_path):
+    for index, name in enumerate(["old", "new"]):
+        path = tmp_path / "pip" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (1000 + index, 1000 + index))
+
+    result = subprocess.run(
+        [sys.executable, "-c", PRUNE_SCRIPT, str(tmp_path), "1500"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ["2000", "1000"]
+    assert sorted(os.listdir(tmp_path / "pip")) == ["new"]
+
+
+def test_prune_command(cache_project, monkeypatch):
+    commands = []
+
+    def run_on_host(cmd, check=False, capture_output=False):
+        commands.append(cmd)
+        return (0, "3145728 1048576\n", "")
+
+    monkeypatch.setenv("PALM_TEST", "1")
+    monkeypatch.setattr(cache_volume, "run_on_host", run_on_host)
+    result = CliRunner().invoke(
+        cache_cli, ["prune", "--max-size", "2"], obj=cache_project
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "palm-test_palm-cache: freed 1.0 of 3.0 MB" in result.output
+    inspect, run = commands
+    assert inspect == "docker volume inspect palm-test_palm-cache"
+    assert run.startswith(
+        "docker run --rm --entrypoint python3 "
+        "-v palm-test_palm-cache:/cache palm-test:latest -c "
+    )
+    assert run.endswith(f" /cache {2 * 1024 * 1024}")
+
+
+def test_prune_without_docker(cache_project, monkeypatch):
+    import shutil
+
+    monkeypatch.delenv("PALM_TEST", raising=False)
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    result = CliRunner().invoke(cache_cli, ["prune"], obj=cache_project)
+
+    assert result.exit_code == 1
+    assert "Docker is not installed" in result.output
@@ -1,6 +1,10 @@
+import os
+from pathlib import Path
+
+import pytest
 import yaml
 
-from palm.code_generator import CodeGenerator
+from palm.code_generator import CodeGenerator, TemplateSet
 
 
 def setup_templates(path):
@@ -52,3 +56,127 @@ def test_run_generator(tmp_path):
     file_contents = expected_file.read_text()
     assert file_contents.startswith("def foo():")
     assert "print(f'Hello Murphy Moulds')" in file_contents
+
+
+def test_template_set_is_shared(tmp_path, palm_cache_dir, monkeypatch):
+    monkeypatch.setattr(TemplateSet, "_sets", {})
+    template_path, target_path = setup_templates(tmp_path)
+    for filename in ("a", "b"):
+        replacements = {"name": "x", "dirname": "team", "filename": filename}
+        CodeGenerator(template_path, target_path, replacements).run()
+
+    assert list(TemplateSet._sets) == [str(template_path)]
+    templates = TemplateSet.get(template_path)
+    # One compiled template per distinct string, reused across runs
+    assert sorted(templates.strings) == [
+        "{{dirname}}",
+        "{{dirname}}/generated_{{filename}}.py",
+    ]
+    assert (target_path / "team" / "generated_b.py").exists()
+    assert len(list((palm_cache_dir / "jinja").iterdir())) == 1
+
+
+def test_template_set_reloads_changed_templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(TemplateSet, "_sets", {})
+    template_path, _ = setup_templates(tmp_path)
+    templates = TemplateSet.get(template_path)
+    assert "Hello x" in templates.render("template.py", {"name": "x"})
+
+    (template_path / "template.py").write_text("Bye {{name}}\n")
+    stat = (template_path / "template.py").stat()
+    os.utime(template_path / "template.py", (stat.st_atime, stat.st_mtime + 10))
+    assert templates.render("template.py", {"name": "x"}) == "Bye x"
+
+    # A new process loads the bytecode instead of compiling the source
+    monkeypatch.setattr(TemplateSet, "_sets", {})
+    fresh = TemplateSet.get(template_path)
+    monkeypatch.setattr(fresh.env, "compile", lambda *args, **kwargs: 1 / 0)
+    assert fresh.render("template.py", {"name": "y"}) == "Bye y"
+
+
+def setup_large_templates(path, count):
+    template_path = path / "templates"
+    template_path.mkdir()
+    (template_path / "module.py").write_text(
+        "{% for i in range(50) %}\ndef {{name}}_{{ i }}():\n    return {{ i }}\n"
+        "{% endfor %}\n"
+    )
+    (template_path / "other.py").write_text("# {{name}}\n")
+    files = [{"module.py": f"pkg/sub{i % 7}/mod_{i}.py"} for i in range(count)]
+    # Same destination twice, the last entry wins
+    files.append({"other.py": "pkg/sub0/mod_0.py"})
+    config = {
+        "directories": [f"pkg/sub{i}" for i in range(7)] + ["pkg"],
+        "files": files,
+    }
+    (template_path / "template-config.yaml").write_text(yaml.dump(config))
+    return template_path
+
+
+def generated(root):
+    return {
+        str(path.relative_to(root)): path.read_text()
+        for path in sorted(root.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.mark.parametrize("pool", CodeGenerator.POOLS)
+def test_concurrent_output_matches_serial(tmp_path, pool, capsys):
+    template_path = setup_large_templates(tmp_path, 60)
+    serial, concurrent = tmp_path / "serial", tmp_path / "concurrent"
+    serial.mkdir()
+    concurrent.mkdir()
+
+    CodeGenerator(template_path, serial, {"name": "f"}).run()
+    capsys.readouterr()
+    codegen = CodeGenerator(
+        template_path, concurrent, {"name": "f"}, workers=4, pool=pool, writers=2
+    )
+    assert codegen.run() == "Generated successfully"
+
+    assert generated(concurrent) == generated(serial)
+    assert generated(concurrent)["pkg/sub0/mod_0.py"] == "# f"
+    assert len(codegen.timings) == 60
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("Generating module.py to pkg/sub1/mod_1.py (")
+    assert lines[-2].startswith("Generating other.py to pkg/sub0/mod_0.py (")
+    assert lines[-1].startswith("Generated 60 files in ")
+
+
+def test_concurrent_errors(tmp_path):
+    template_path = setup_large_templates(tmp_path, 3)
+    (template_path / "other.py").write_text("{{ undefined_filter | nope }}\n")
+    (tmp_path / "target").mkdir()
+
+    codegen = CodeGenerator(template_path, tmp_path / "target", {}, workers=2)
+    with pytest.raises(Exception, match="nope"):
+        codegen.run()
+
+
+def test_concurrent_errors_stop_generation(tmp_path):
+    template_path = setup_large_templates(tmp_path, 200)
+    (template_path / "broken.py").write_text("{{ undefined_filter | nope }}\n")
+    config = yaml.safe_load((template_path / "template-config.yaml").read_text())
+    config["files"].insert(0, {"broken.py": "pkg/broken.py"})
+    (template_path / "template-config.yaml").write_text(yaml.dump(config))
+    (tmp_path / "target").mkdir()
+
+    codegen = CodeGenerator(
+        template_path, tmp_path / "target", {"name": "x"}, workers=2, writers=1
+    )
+    with pytest.raises(Exception, match="nope"):
+        codegen.run()
+    # Only the files already rendering when the error came were written
+    assert len(generated(tmp_path / "target")) < 20
+
+
+def test_make_directories(tmp_path, capsys):
+    (tmp_path / "a").mkdir()
+    CodeGenerator.make_directories(
+        [tmp_path / "a", tmp_path / "b", tmp_path / "b" / "c", tmp_path / "d"]
+    )
+
+    assert capsys.readouterr().out == f"{tmp_path / 'a'} already exists\n"
+    assert (tmp_path / "b" / "c").is_dir()
+    assert (tmp_path / "d").is_dir()
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+from palm.command_loader import CommandLoader, command_module_name
+
+
+def test_command_module_name():
+    assert command_module_name("core", "build") == "palm._cmd.core.build"
+    assert command_module_name("my-plugin", "do.it") == "palm._cmd.my_plugin.do_it"
+
+
+def test_load_registers_module(test_plugin):
+    loader = CommandLoader()
+    mod = loader.load("mock", "foo", test_plugin.command_path("foo"))
+
+    assert mod.cli.name == "foo"
+    assert sys.modules["palm._cmd.mock.foo"] is mod
+    assert (loader.hits, loader.misses) == (0, 1)
+
+
+def test_load_is_memoized(test_plugin):
+    loader = CommandLoader()
+    path = test_plugin.command_path("foo")
+    first = loader.load("mock", "foo", path)
+    second = loader.load("mock", "foo", path)
+
+    assert first is second
+    assert (loader.hits, loader.misses) == (1, 1)
+    assert "1 hits, 1 misses" in loader.stats()
+
+
+def test_changed_module_is_executed_again(test_plugin):
+    loader = CommandLoader()
+    path = test_plugin.command_path("foo")
+    first = loader.load("mock", "foo", path)
+
+    path.write_text(path.read_text().replace("'foo'", "'changed'"))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    second = loader.load("mock", "foo", path)
+    assert second is not first
+    assert second.cli.name == "changed"
+
+
+def test_load_missing_command(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CommandLoader().load("mock", "missing", tmp_path / "cmd_missing.py")
@@ -0,0 +1,63 @@
+import os
+
+from palm import cache
+from palm.command_manifest import CommandManifest
+
+
+def age(path, seconds=60):
+    """Move mtime out of the racy window so the manifest will trust it"""
+    old = os.stat(path).st_mtime - seconds
+    os.utime(path, (old, old))
+
+
+def test_commands_lists_plugin_commands(test_plugin):
+    manifest = CommandManifest()
+    assert manifest.commands(test_plugin) == ["foo"]
+
+
+def test_commands_are_saved_and_reused(test_plugin, monkeypatch):
+    age(test_plugin.command_dir)
+    manifest = CommandManifest()
+    manifest.commands(test_plugin)
+    manifest.save()
+    assert (cache.cache_dir() / CommandManifest.FILE_NAME).exists()
+
+    def fail():
+        raise AssertionError("command_dir should not be scanned")
+
+    monkeypatch.setattr(test_plugin, "all_commands", fail)
+    assert CommandManifest().commands(test_plugin) == ["foo"]
+
+
+def test_changed_command_dir_is_rescanned(test_plugin):
+    age(test_plugin.command_dir)
+    manifest = CommandManifest()
+    manifest.commands(test_plugin)
+    manifest.save()
+
+    (test_plugin.command_dir / "cmd_bar.py").write_text("")
+    assert sorted(CommandManifest().commands(test_plugin)) == ["bar", "foo"]
+
+
+def test_racy_command_dir_is_not_cached(test_plugin):
+    manifest = CommandManifest()
+    manifest.commands(test_plugin)
+    assert manifest.entries == {}
+    assert not manifest.dirty
+
+
+def test_invalid_manifest_is_ignored(test_plugin, palm_cache_dir):
+    palm_cache_dir.mkdir()
+    (palm_cache_dir / CommandManifest.FILE_NAME).write_text("{not json")
+    assert CommandManifest().commands(test_plugin) == ["foo"]
+
+
+def test_clear_removes_manifest(test_plugin):
+    age(test_plugin.command_dir)
+    manifest = CommandManifest()
+    manifest.commands(test_plugin)
+    manifest.save()
+
+    manifest.clear()
+    assert manifest.entries == {}
+    assert not (cache.cache_dir() / CommandManifest.FILE_NAME).exists()
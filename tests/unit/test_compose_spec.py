@@ -0,0 +1,156 @@
+import pytest
+from click.testing import CliRunner
+
+from palm.compose_spec import (
+    ComposeSpec,
+    compose_files,
+    docker_run_args,
+    service_binds,
+    service_environment,
+    service_ports,
+)
+from palm.plugins.core.commands.cmd_cache import cli as cache_cli
+
+
+@pytest.fixture
+def compose_project(environment, compose, tmp_path):
+    environment.palm.config["image_name"] = "palm-test"
+    (tmp_path / "docker-compose.yaml").write_text("services: {}\n")
+    compose.config["services"]["palm-test"] = {
+        "build": {"context": str(tmp_path)},
+        "working_dir": "/app",
+        "volumes": [
+            {"type": "bind", "source": str(tmp_path), "target": "/app"},
+            {"type": "volume", "source": "cache", "target": "/root/.cache"},
+        ],
+        "environment": {"FOO": "bar"},
+        "ports": [{"target": 8000, "published": "8000", "protocol": "tcp"}],
+    }
+    compose.config["volumes"] = {"cache": {"name": "palm-test_cache"}}
+    return environment
+
+
+def test_resolve_is_cached(compose_project, compose):
+    spec = ComposeSpec(compose_project.palm)
+    service = spec.service()
+
+    assert service["image"] == "palm-test-palm-test"
+    assert service["volumes"][1]["source"] == "palm-test_cache"
+    assert ComposeSpec(compose_project.palm).service() == service
+    assert compose.resolutions() == 1
+
+
+def test_resolve_again_when_inputs_change(compose_project, compose, tmp_path):
+    spec = ComposeSpec(compose_project.palm)
+    spec.service()
+    (tmp_path / ".env").write_text("TAG=2\n")
+    spec.service()
+
+    assert compose.resolutions() == 2
+
+
+def test_resolve_again_when_interpolated_variable_changes(
+    compose_project, compose, tmp_path, monkeypatch
+):
+    (tmp_path / "docker-compose.yaml").write_text("services: {}\n# ${TAG}\n")
+    spec = ComposeSpec(compose_project.palm)
+    spec.service()
+    spec.service()
+    monkeypatch.setenv("TAG", "2")
+    spec.service()
+
+    assert compose.resolutions() == 2
+
+
+def test_resolve_missing_service(compose_project, compose):
+    del compose.config["services"]["palm-test"]
+    with pytest.raises(Exception, match="palm-test not found"):
+        ComposeSpec(compose_project.palm).service()
+
+
+def test_compose_files(tmp_path, monkeypatch):
+    assert compose_files(tmp_path) == []
+    (tmp_path / "docker-compose.override.yml").touch()
+    assert compose_files(tmp_path) == []
+    (tmp_path / "docker-compose.yaml").touch()
+    assert compose_files(tmp_path) == [
+        tmp_path / "docker-compose.yaml",
+        tmp_path / "docker-compose.override.yml",
+    ]
+    monkeypatch.setenv("COMPOSE_FILE", "a.yaml:b.yaml")
+    assert compose_files(tmp_path) == [tmp_path / "a.yaml", tmp_path / "b.yaml"]
+
+
+def test_docker_run_executor(compose_project, compose, tmp_path):
+    compose_project.palm.config["docker_executor"] = "docker-run"
+    success, _ = compose_project.run_in_docker("pytest", {"palm_test": True})
+
+    assert success
+    run = compose.commands[-1]
+    assert run == (
+        f"docker run --rm -i -w /app -v {tmp_path}:/app "
+        "-v palm-test_cache:/root/.cache -e FOO=bar -e PALM_TEST=True "
+        '-p 8000:8000/tcp palm-test-palm-test /bin/bash -c "pytest" '
+    )
+
+
+def test_docker_run_args_entrypoint(tmp_path):
+    service = {"image": "img", "entrypoint": ["tini", "--"]}
+    args = docker_run_args(service, tmp_path, {}, tty=True)
+
+    assert args[-4:] == ["--entrypoint", "tini", "img", "--"]
+    assert "-t" in args
+
+
+def test_service_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("FROM_HOST", "host")
+    (tmp_path / ".env").write_text("# comment\nA=1\nB='quoted'\nexport C=3\n")
+    service = {
+        "env_file": ".env",
+        "environment": {"A": "2", "FROM_HOST": None},
+    }
+
+    assert service_environment(service, tmp_path) == {
+        "A": "2",
+        "B": "quoted",
+        "C": "3",
+        "FROM_HOST": "host",
+    }
+
+
+def test_service_binds(tmp_path):
+    service = {
+        "volumes": [
+            "./src:/app/src:ro",
+            "cache:/root/.cache",
+            "/anonymous",
+            {"type": "bind", "source": ".", "target": "/app"},
+        ]
+    }
+
+    assert service_binds(service, tmp_path) == [
+        f"{tmp_path / 'src'}:/app/src:ro",
+        "cache:/root/.cache",
+        f"{tmp_path}:/app",
+    ]
+
+
+def test_service_ports():
+    exposed, bindings = service_ports(
+        {"ports": ["8000:8000", "127.0.0.1:5432:5432", "9000/udp"]}
+    )
+
+    assert set(exposed) == {"8000/tcp", "5432/tcp", "9000/udp"}
+    assert bindings["5432/tcp"] == [{"HostIp": "127.0.0.1", "HostPort": "5432"}]
+    assert bindings["9000/udp"] == [{"HostIp": "", "HostPort": ""}]
+
+
+def test_cache_show(compose_project, compose):
+    runner = CliRunner()
+    result = runner.invoke(cache_cli, ["show"], obj=compose_project)
+    assert "Compose service palm-test: not resolved" in result.output
+
+    ComposeSpec(compose_project.palm).service()
+    result = runner.invoke(cache_cli, ["show"], obj=compose_project)
+    assert "Compose service palm-test: fresh" in result.output
+    assert "docker run --rm -i" in result.output
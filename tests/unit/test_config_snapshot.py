@@ -0,0 +1,97 @@
+import os
+
+import pytest
+import yaml
+
+from palm import config_snapshot
+from palm.config_snapshot import ConfigSnapshot, load_yaml
+from palm.palm_config import PalmConfig
+
+
+def age(path, seconds=60):
+    old = os.stat(path).st_mtime - seconds
+    os.utime(path, (old, old))
+
+
+def write_yaml(path, data, aged=True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml.dump(data))
+    if aged:
+        age(path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_documents():
+    config_snapshot.clear()
+    yield
+    config_snapshot.clear()
+
+
+@pytest.fixture
+def forbid_parsing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML should not be parsed")
+
+    return lambda: monkeypatch.setattr(config_snapshot.yaml, "load", fail)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    global_path = tmp_path / "home" / ".palm" / "config.yaml"
+    monkeypatch.setattr(PalmConfig, "_global_config_path", lambda self: global_path)
+    monkeypatch.setattr(PalmConfig, "_find_git_dir", lambda self: None)
+    write_yaml(global_path, {"plugins": ["a"], "excluded_commands": []})
+    write_yaml(tmp_path / ".palm" / "config.yaml", {"plugins": ["b"], "x": 1})
+    return tmp_path
+
+
+def test_load_yaml_reuses_parsed_document(tmp_path, forbid_parsing):
+    path = write_yaml(tmp_path / "config.yaml", {"a": {"b": 1}})
+    assert load_yaml(path) == {"a": {"b": 1}}
+
+    forbid_parsing()
+    document = load_yaml(path)
+    document["a"]["b"] = 2
+    assert load_yaml(path) == {"a": {"b": 1}}
+
+
+def test_load_yaml_does_not_cache_racy_files(tmp_path):
+    path = write_yaml(tmp_path / "config.yaml", {"a": 1}, aged=False)
+    load_yaml(path)
+    assert config_snapshot._documents == {}
+
+
+def test_load_yaml_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_yaml(tmp_path / "missing.yaml")
+
+
+def test_snapshot_skips_yaml(project, forbid_parsing):
+    config = PalmConfig(project).config
+    assert config["plugins"] == ["a", "b"]
+
+    config_snapshot.clear()
+    forbid_parsing()
+    assert PalmConfig(project).config == config
+    # Source documents are seeded from the snapshot for other consumers
+    assert load_yaml(project / ".palm" / "config.yaml")["x"] == 1
+
+
+def test_snapshot_invalidated_by_edit(project):
+    PalmConfig(project)
+    write_yaml(project / ".palm" / "config.yaml", {"plugins": ["c"]})
+    assert PalmConfig(project).config["plugins"] == ["a", "c"]
+
+
+def test_snapshot_not_saved_for_racy_sources(project, palm_cache_dir):
+    write_yaml(project / ".palm" / "config.yaml", {"plugins": []}, aged=False)
+    PalmConfig(project)
+    assert not (palm_cache_dir / ConfigSnapshot.DIRECTORY).exists()
+
+
+def test_corrupt_snapshot_is_ignored(project, palm_cache_dir):
+    config = PalmConfig(project).config
+    for snapshot in (palm_cache_dir / ConfigSnapshot.DIRECTORY).iterdir():
+        snapshot.write_bytes(b"not a pickle")
+    assert PalmConfig(project).config == config
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+
+from palm.daemon import PalmDaemon, project_root, watch_signature, watched_paths
+from palm.daemon_client import forward, request
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = tmp_path / "daemon.sock"
+    daemon = PalmDaemon(path)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if path.exists():
+            break
+        threading.Event().wait(0.01)
+    yield path
+    request({"command": "stop"}, path)
+    thread.join(timeout=5)
+
+
+def run_in_daemon(socket_path, cwd, argv):
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    with open(os.devnull) as devnull:
+        env = {**os.environ, "PALM_TEST": "1"}
+        code = forward(
+            argv, str(cwd), env, (devnull.fileno(), out_w, err_w), socket_path
+        )
+    os.close(out_w)
+    os.close(err_w)
+    with open(out_r) as out, open(err_r) as err:
+        return code, out.read(), err.read()
+
+
+def test_forward_without_daemon(tmp_path):
+    assert forward(["--help"], path=tmp_path / "missing.sock") is None
+
+
+def test_status(daemon):
+    reply = request({"command": "status"}, daemon)
+    assert reply["pid"] == os.getpid()
+    assert reply["projects"] == []
+
+
+def test_run_command_in_daemon(daemon, tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    code, out, _ = run_in_daemon(daemon, project, ["--help"])
+
+    assert code == 0
+    assert "Usage: palm" in out
+    assert request({"command": "status"}, daemon)["projects"] == [
+        str(project.resolve())
+    ]
+
+
+def test_socket_is_private(daemon):
+    assert daemon.stat().st_mode & 0o777 == 0o600
+
+
+def test_subdirectories_share_project_state(daemon, tmp_path):
+    project = tmp_path / "project"
+    (project / ".palm").mkdir(parents=True)
+    (project / ".git").mkdir()
+    for subdirectory in ("src", "tests"):
+        (project / subdirectory).mkdir()
+        code, _, _ = run_in_daemon(daemon, project / subdirectory, ["--help"])
+        assert code == 0
+    assert request({"command": "status"}, daemon)["projects"] == [
+        str(project.resolve())
+    ]
+
+
+def test_project_root(tmp_path):
+    project = tmp_path / "project"
+    (project / ".palm").mkdir(parents=True)
+    (project / "src" / "app").mkdir(parents=True)
+    assert project_root(project / "src" / "app") == project.resolve()
+
+    # The search stops at the top of the worktree
+    (project / "vendor" / ".git").mkdir(parents=True)
+    assert project_root(project / "vendor") == (project / "vendor").resolve()
+
+
+def test_exit_code_is_returned(daemon, tmp_path):
+    code, _, err = run_in_daemon(daemon, tmp_path, ["not-a-command"])
+    assert code == 2
+    assert "No such command" in err
+
+
+def test_watched_paths_include_worktree_head(tmp_path):
+    worktree = tmp_path / "worktree"
+    worktree.mkdir()
+    (worktree / ".git").write_text("gitdir: ../repo/.git/worktrees/wt\n")
+    expected = tmp_path / "repo" / ".git" / "worktrees" / "wt" / "HEAD"
+    assert expected in watched_paths(worktree)
+
+
+def test_watch_signature_changes_with_config(tmp_path):
+    (tmp_path / ".palm").mkdir()
+    before = watch_signature(tmp_path)
+    (tmp_path / ".palm" / "config.yaml").write_text("image_name: test\n")
+    assert watch_signature(tmp_path) != before
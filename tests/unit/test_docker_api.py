@@ -0,0 +1,140 @@
+import hashlib
+import io
+import json
+import struct
+
+import pytest
+
+from palm import cache, docker_api
+from palm.docker_api import (
+    STDERR,
+    STDOUT,
+    DockerAPIError,
+    DockerClient,
+    UnsupportedDockerHost,
+    demux,
+)
+
+
+def test_ping(docker_engine):
+    assert DockerClient().ping()
+    assert docker_engine.calls("GET", "/_ping")
+
+
+def test_ping_without_engine(tmp_path):
+    assert not DockerClient(f"unix://{tmp_path}/missing.sock").ping()
+
+
+def test_request_json(docker_engine):
+    docker_engine.route("GET", "/version", (200, {"ApiVersion": "1.43"}))
+    response = DockerClient().request("GET", "/version")
+    assert response.status == 200
+    assert response.json() == {"ApiVersion": "1.43"}
+
+
+def test_chunked_response(docker_engine):
+    def chunked(handler, request):
+        handler.wfile.write(
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n"
+        )
+
+    docker_engine.route("GET", "/chunked", chunked)
+    assert DockerClient().request("GET", "/chunked").body == b"abcde"
+
+
+def test_demux():
+    stream = io.BytesIO(
+        struct.pack(">BxxxL", STDOUT, 3)
+        + b"out"
+        + struct.pack(">BxxxL", STDERR, 3)
+        + b"err"
+    )
+    assert list(demux(stream)) == [(STDOUT, b"out"), (STDERR, b"err")]
+
+
+def test_create_container_error(docker_engine):
+    docker_engine.route("POST", "/containers/create", (409, {"message": "name in use"}))
+    with pytest.raises(DockerAPIError, match="name in use"):
+        DockerClient().create_container({"Image": "x"}, name="taken")
+    (create,) = docker_engine.calls("POST", "/containers/create")
+    assert create["path"] == "/containers/create?name=taken"
+
+
+def test_attach_upgrades_connection(docker_engine):
+    def attach(handler, request):
+        handler.wfile.write(
+            b"HTTP/1.1 101 UPGRADED\r\nConnection: Upgrade\r\nUpgrade: tcp\r\n\r\n"
+            + struct.pack(">BxxxL", STDOUT, 2)
+            + b"hi"
+        )
+
+    docker_engine.route("POST", "/containers/abc/attach", attach)
+    sock, reader = DockerClient().attach("abc")
+    with sock:
+        assert list(demux(reader)) == [(STDOUT, b"hi")]
+    (request,) = docker_engine.calls("POST", "/containers/abc/attach")
+    assert request["headers"]["upgrade"] == "tcp"
+
+
+def test_request_without_engine(tmp_path):
+    with pytest.raises(DockerAPIError):
+        DockerClient(f"unix://{tmp_path}/missing.sock").request("GET", "/_ping")
+
+
+@pytest.mark.parametrize("host", ["ssh://user@host", "npipe:////./pipe/docker"])
+def test_unsupported_hosts(host):
+    with pytest.raises(UnsupportedDockerHost):
+        DockerClient(host)
+
+
+def test_tls_hosts_are_unsupported(monkeypatch):
+    monkeypatch.setenv("DOCKER_TLS_VERIFY", "1")
+    with pytest.raises(UnsupportedDockerHost):
+        DockerClient("tcp://127.0.0.1:2376")
+
+
+def test_docker_host_from_context(tmp_path, monkeypatch):
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    monkeypatch.delenv("DOCKER_CONTEXT", raising=False)
+    monkeypatch.setenv("DOCKER_CONFIG", str(tmp_path))
+    (tmp_path / "config.json").write_text(json.dumps({"currentContext": "colima"}))
+    meta = (
+        tmp_path
+        / "contexts"
+        / "meta"
+        / hashlib.sha256(b"colima").hexdigest()
+        / "meta.json"
+    )
+    meta.parent.mkdir(parents=True)
+    host = "unix:///home/me/.colima/docker.sock"
+    meta.write_text(json.dumps({"Endpoints": {"docker": {"Host": host}}}))
+    assert docker_api.docker_host() == host
+
+
+def test_docker_host_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    monkeypatch.delenv("DOCKER_CONTEXT", raising=False)
+    monkeypatch.setenv("DOCKER_CONFIG", str(tmp_path))
+    assert docker_api.docker_host() == docker_api.DEFAULT_HOST
+
+
+def test_engine_ready_is_cached(docker_engine):
+    assert docker_api.engine_ready()
+    assert docker_api.engine_ready()
+    assert len(docker_engine.calls("GET", "/_ping")) == 1
+
+
+def test_engine_ready_cache_expires(docker_engine, monkeypatch):
+    assert docker_api.engine_ready()
+    cached = cache.read_json(docker_api.READY_CACHE)
+    cached["checked_at"] -= docker_api.READY_TTL
+    cache.write_json(docker_api.READY_CACHE, cached)
+    assert docker_api.engine_ready()
+    assert len(docker_engine.calls("GET", "/_ping")) == 2
+
+
+def test_engine_not_ready_is_not_cached(docker_engine):
+    docker_engine.route("GET", "/_ping", (500, b"down"))
+    assert not docker_api.engine_ready()
+    assert cache.read_json(docker_api.READY_CACHE) is None
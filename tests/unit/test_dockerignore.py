@@ -0,0 +1,55 @@
+from palm.dockerignore import DockerIgnore
+
+
+def test_patterns():
+    ignore = DockerIgnore(
+        [
+            "# comment",
+            "",
+            "*.md",
+            "!README.md",
+            "/build",
+            "**/__pycache__",
+            "docs/**/*.png",
+            "data/[a-c]*.csv",
+        ]
+    )
+    assert ignore.is_excluded("CHANGES.md")
+    assert not ignore.is_excluded("README.md")
+    assert not ignore.is_excluded("docs/CHANGES.md")
+    assert ignore.is_excluded("build/lib/app.py")
+    assert ignore.is_excluded("src/pkg/__pycache__/app.cpython-311.pyc")
+    assert ignore.is_excluded("docs/img/a/logo.png")
+    assert ignore.is_excluded("docs/logo.png")
+    assert ignore.is_excluded("data/b1.csv")
+    assert not ignore.is_excluded("data/d1.csv")
+    assert not ignore.is_excluded("src/app.py")
+
+
+def test_last_matching_pattern_wins():
+    ignore = DockerIgnore(["logs", "!logs/keep.log", "logs/keep.log"])
+    assert ignore.is_excluded("logs/keep.log")
+    ignore = DockerIgnore(["logs", "!logs/keep.log"])
+    assert not ignore.is_excluded("logs/keep.log")
+    assert ignore.is_excluded("logs/other.log")
+
+
+def test_walk(tmp_path):
+    for path in ("app/main.py", "node_modules/x/index.js", "logs/a.log", "logs/keep"):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    (tmp_path / ".dockerignore").write_text("node_modules\nlogs\n!logs/keep\n")
+
+    ignore = DockerIgnore.load(tmp_path)
+    assert sorted(ignore.walk(tmp_path)) == [
+        ".dockerignore",
+        "app/main.py",
+        "logs/keep",
+    ]
+
+
+def test_dockerfile_ignore_file_wins(tmp_path):
+    (tmp_path / ".dockerignore").write_text("a\n")
+    (tmp_path / "Dockerfile.dockerignore").write_text("b\n")
+    assert DockerIgnore.load(tmp_path, tmp_path / "Dockerfile").patterns == ["b"]
+    assert DockerIgnore.load(tmp_path, tmp_path / "Other").patterns == ["a"]
@@ -0,0 +1,124 @@
+import struct
+
+import click
+import pytest
+
+from palm.docker_api import DockerClient
+from palm.engine_executor import EngineExecutor, container_config
+
+CONTAINER = "c0ffee"
+
+
+def frame(stream, data):
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+@pytest.fixture
+def engine_environment(environment, docker_engine, compose, tmp_path):
+    environment.palm.config["docker_executor"] = "engine"
+    environment.palm.config["image_name"] = "palm-test"
+    (tmp_path / "docker-compose.yaml").write_text("services: {}\n")
+    compose.config["services"]["palm-test"] = {
+        "image": "palm-test:latest",
+        "working_dir": "/app",
+        "volumes": [{"type": "bind", "source": str(tmp_path), "target": "/app"}],
+        "environment": {"FOO": "bar"},
+    }
+    return environment
+
+
+def engine_container(docker_engine, output=(), exit_code=0):
+    def attach(handler, request):
+        handler.wfile.write(
+            b"HTTP/1.1 101 UPGRADED\r\n"
+            b"Content-Type: application/vnd.docker.raw-stream\r\n"
+            b"Connection: Upgrade\r\nUpgrade: tcp\r\n\r\n"
+        )
+        for stream, data in output:
+            handler.wfile.write(frame(stream, data))
+
+    docker_engine.route("POST", "/containers/create", (201, {"Id": CONTAINER}))
+    docker_engine.route("POST", f"/containers/{CONTAINER}/attach", attach)
+    docker_engine.route("POST", f"/containers/{CONTAINER}/start", (204, b""))
+    docker_engine.route(
+        "POST", f"/containers/{CONTAINER}/wait", (200, {"StatusCode": exit_code})
+    )
+    docker_engine.route("DELETE", f"/containers/{CONTAINER}", (204, b""))
+
+
+def test_run_streams_output(engine_environment, docker_engine, capfd):
+    engine_container(docker_engine, [(1, b"hello\n"), (2, b"oops\n")])
+    success, message = engine_environment.run_in_docker("pytest", {"palm_test": 1})
+
+    assert success
+    assert message == "Success! Palm completed with exit code 0"
+    out, err = capfd.readouterr()
+    assert "hello\n" in out
+    assert err == "oops\n"
+
+    (create,) = docker_engine.calls("POST", "/containers/create")
+    config = create["body"]
+    assert config["Image"] == "palm-test:latest"
+    assert config["Cmd"] == ["/bin/bash", "-c", "pytest"]
+    assert config["WorkingDir"] == "/app"
+    assert config["Env"][-2:] == ["FOO=bar", "PALM_TEST=1"]
+    assert "PIP_CACHE_DIR=/cache/pip" in config["Env"]
+    assert config["HostConfig"]["Binds"][-1] == "palm-test_palm-cache:/cache"
+    assert docker_engine.calls("DELETE", f"/containers/{CONTAINER}")
+
+
+def test_run_attaches_before_start(engine_environment, docker_engine):
+    engine_container(docker_engine)
+    engine_environment.run_in_docker("true")
+
+    paths = [r["path"].split("?")[0] for r in docker_engine.requests]
+    assert paths.index(f"/containers/{CONTAINER}/attach") < paths.index(
+        f"/containers/{CONTAINER}/start"
+    )
+
+
+def test_run_returns_exit_code(engine_environment, docker_engine):
+    engine_container(docker_engine, exit_code=3)
+    success, message = engine_environment.run_in_docker("false")
+
+    assert not success
+    assert message == "Fail! Palm exited with code 3"
+    assert docker_engine.calls("DELETE", f"/containers/{CONTAINER}")
+
+
+def test_run_captures_output(engine_environment, docker_engine):
+    engine_container(docker_engine, [(1, b"out"), (2, b"err")])
+    executor = EngineExecutor(engine_environment.palm, DockerClient())
+
+    assert executor.run("echo", capture_output=True, silent=True) == (True, "out")
+
+
+def test_run_no_bin_bash(engine_environment, docker_engine):
+    engine_container(docker_engine)
+    engine_environment.run_in_docker("python -c 'print(1)'", no_bin_bash=True)
+
+    (create,) = docker_engine.calls("POST", "/containers/create")
+    assert create["body"]["Cmd"] == ["python", "-c", "print(1)"]
+
+
+def test_run_reports_create_failure(engine_environment, docker_engine):
+    docker_engine.route(
+        "POST", "/containers/create", (404, {"message": "No such image"})
+    )
+    success, message = engine_environment.run_in_docker("pytest")
+
+    assert not success
+    assert "No such image" in message
+
+
+def test_run_without_compose_file(environment, docker_engine):
+    environment.palm.config["docker_executor"] = "engine"
+    with pytest.raises(click.ClickException):
+        environment.run_in_docker("pytest")
+
+
+def test_container_config_tty(tmp_path):
+    config = container_config({"image": "img"}, tmp_path, ["ls"], {}, tty=True)
+
+    assert config["Tty"]
+    assert config["OpenStdin"] and config["StdinOnce"]
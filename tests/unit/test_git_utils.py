@@ -0,0 +1,137 @@
+from pathlib import Path
+
+import pygit2
+import pytest
+
+from palm import git_utils
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = pygit2.init_repository(str(tmp_path / "project"))
+    signature = pygit2.Signature("palm", "palm@example.com")
+    tree = repo.TreeBuilder().write()
+    repo.create_commit("HEAD", signature, signature, "initial", tree, [])
+    return repo
+
+
+def test_find_git_dir_from_subdirectory(repo, tmp_path):
+    subdirectory = tmp_path / "project" / "a" / "b"
+    subdirectory.mkdir(parents=True)
+    assert git_utils.find_git_dir(subdirectory) == tmp_path / "project" / ".git"
+
+
+def test_find_git_dir_outside_repository(tmp_path):
+    assert git_utils.find_git_dir(tmp_path) is None
+
+
+def test_find_git_dir_follows_gitdir_file(tmp_path):
+    worktree = tmp_path / "worktree"
+    (worktree / "sub").mkdir(parents=True)
+    (worktree / ".git").write_text("gitdir: ../repo/.git/worktrees/wt\n")
+    expected = tmp_path / "repo" / ".git" / "worktrees" / "wt"
+    assert git_utils.find_git_dir(worktree) == expected
+    assert git_utils.find_git_dir(worktree / "sub") == expected
+
+
+def test_read_head_matches_pygit2(repo):
+    git_dir = git_utils.find_git_dir(repo.workdir)
+    assert git_utils.read_head(git_dir) == repo.head.shorthand
+
+    repo.branches.local.create("feature/x", repo.head.peel())
+    repo.checkout("refs/heads/feature/x")
+    assert git_utils.read_head(git_dir) == "feature/x"
+
+
+def test_read_head_packed_ref(repo):
+    git_dir = git_utils.find_git_dir(repo.workdir)
+    branch = repo.head.shorthand
+    loose_ref = git_dir / "refs" / "heads" / branch
+    (git_dir / "packed-refs").write_text(
+        f"# pack-refs with: peeled\n{loose_ref.read_text().strip()} refs/heads/{branch}\n"
+    )
+    loose_ref.unlink()
+    assert git_utils.read_head(git_dir) == branch
+
+
+def test_read_head_detached(repo):
+    git_dir = git_utils.find_git_dir(repo.workdir)
+    repo.set_head(repo.head.target)
+    assert repo.head_is_detached
+    assert git_utils.read_head(git_dir) == "HEAD" == repo.head.shorthand
+
+
+def test_read_head_unborn_branch_is_unresolved(tmp_path):
+    repo = pygit2.init_repository(str(tmp_path / "empty"))
+    assert git_utils.read_head(git_utils.find_git_dir(repo.workdir)) is None
+
+
+def test_read_head_worktree(repo, tmp_path):
+    repo.add_worktree("wt", str(tmp_path / "wt"))
+    git_dir = git_utils.find_git_dir(tmp_path / "wt")
+    assert git_dir == tmp_path / "project" / ".git" / "worktrees" / "wt"
+    assert git_utils.read_head(git_dir) == "wt"
+
+
+def test_changed_files(repo):
+    workdir = Path(repo.workdir)
+    (workdir / "kept.py").write_text("a = 1\n")
+    (workdir / "edited.py").write_text("b = 1\n")
+    (workdir / "removed.py").write_text("c = 1\n")
+    repo.index.add_all()
+    repo.index.write()
+    signature = pygit2.Signature("palm", "palm@example.com")
+    repo.create_commit(
+        "HEAD",
+        signature,
+        signature,
+        "files",
+        repo.index.write_tree(),
+        [repo.head.target],
+    )
+    assert git_utils.changed_files(repo, "HEAD") == set()
+
+    (workdir / "edited.py").write_text("b = 2\n")
+    (workdir / "removed.py").unlink()
+    (workdir / "pkg").mkdir()
+    (workdir / "pkg" / "new.py").write_text("")
+    assert git_utils.changed_files(repo, "HEAD") == {
+        "edited.py",
+        "removed.py",
+        "pkg/new.py",
+    }
+    # Against the initial, empty commit everything is new
+    assert "kept.py" in git_utils.changed_files(repo, "HEAD~1")
+
+
+def test_changed_files_unknown_base(repo):
+    assert git_utils.resolve_commit(repo, "no-such-ref") is None
+    with pytest.raises(KeyError):
+        git_utils.changed_files(repo, "no-such-ref")
+
+
+def test_project_files(repo):
+    workdir = Path(repo.workdir)
+    (workdir / "src").mkdir()
+    (workdir / "src" / "tracked.py").write_text("")
+    (workdir / "src" / "gone.py").write_text("")
+    (workdir / ".gitignore").write_text("*.log\n")
+    repo.index.add_all()
+    repo.index.write()
+    (workdir / "src" / "gone.py").unlink()
+    (workdir / "src" / "untracked.py").write_text("")
+    (workdir / "src" / "debug.log").write_text("")
+
+    assert git_utils.project_files(repo) == {
+        ".gitignore",
+        "src/tracked.py",
+        "src/untracked.py",
+    }
+    assert git_utils.project_files(repo, workdir / "src") == {
+        "tracked.py",
+        "untracked.py",
+    }
+    assert git_utils.tracked_files(repo, workdir / "src") == {
+        "tracked.py",
+        "gone.py",
+    }
@@ -0,0 +1,107 @@
+import os
+
+from palm.help_index import (
+    ALL_REQUIREMENTS,
+    HelpIndex,
+    extract_command_info,
+    extract_requirements,
+)
+
+
+def test_extract_command_info_from_decorator_and_docstring():
+    source = '''import click
+
+@click.command("build", hidden=True)
+@click.option("--force", is_flag=True)
+@click.pass_obj
+def cli(environment, force):
+    """Rebuilds the image"""
+'''
+    info = extract_command_info(source)
+    assert info == {"name": "build", "hidden": True, "help": "Rebuilds the image"}
+
+
+def test_extract_command_info_help_keyword_wins():
+    source = '''import click
+
+@click.group(help="Palm plugin utilities")
+def cli():
+    """Not this one"""
+'''
+    assert extract_command_info(source)["help"] == "Palm plugin utilities"
+
+
+def test_extract_command_info_without_name():
+    source = '''import click
+
+@click.command()
+def cli():
+    pass
+'''
+    assert extract_command_info(source) == {"name": None, "help": None}
+
+
+def test_extract_command_info_is_ambiguous():
+    ambiguous = [
+        # Non-literal name
+        'import click\nNAME = "x"\n@click.command(NAME)\ndef cli():\n    pass\n',
+        # Custom command class
+        'import click\n@click.command("x", cls=Custom)\ndef cli():\n    pass\n',
+        # cli bound somewhere else
+        'from elsewhere import cli\n',
+        'import click\n@click.command("x")\ndef cli():\n    pass\ncli = wrap(cli)\n',
+        # Not a module we can parse
+        "def cli(:\n",
+    ]
+    for source in ambiguous:
+        assert extract_command_info(source) is None
+
+
+def test_help_index_command(test_plugin):
+    cmd = HelpIndex().command(test_plugin.command_path("foo"))
+    assert cmd.name == "foo"
+    assert cmd.hidden is False
+
+
+def test_help_index_is_cached_and_reused(test_plugin, monkeypatch):
+    path = test_plugin.command_path("foo")
+    old = os.stat(path).st_mtime - 60
+    os.utime(path, (old, old))
+    index = HelpIndex()
+    index.command(path)
+    index.save()
+
+    monkeypatch.setattr(
+        "palm.help_index.extract_command_info",
+        lambda source: (_ for _ in ()).throw(AssertionError("should not parse")),
+    )
+    assert HelpIndex().command(path).name == "foo"
+
+
+def test_help_index_missing_file(tmp_path):
+    assert HelpIndex().command(tmp_path / "cmd_missing.py") is None
+
+
+def test_extract_requirements():
+    assert extract_requirements('requires = {"git", "config"}') == {"git", "config"}
+    assert extract_requirements("requires = set()") == set()
+    assert extract_requirements("requires: list = ['docker']") == {"docker"}
+    assert extract_requirements("import click") == ALL_REQUIREMENTS
+
+
+def test_extract_requirements_is_ambiguous():
+    ambiguous = [
+        "requires = BASE | {'git'}",
+        "from somewhere import requires",
+        "requires = {'git'}\nrequires |= {'docker'}",
+        "requires = {1, 2}",
+    ]
+    for source in ambiguous:
+        assert extract_requirements(source) is None, source
+
+
+def test_help_index_requirements(test_plugin):
+    path = test_plugin.command_dir / "cmd_foo.py"
+    assert HelpIndex().requirements(path) == ALL_REQUIREMENTS
+    path.write_text(path.read_text() + "\nrequires = {'git'}\n")
+    assert HelpIndex().requirements(path) == {"git"}
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Total self-time of all imports for a cold `palm --version`, in microseconds.
+# Raise this deliberately (and say why in the PR) if a new import is justified.
+IMPORT_BUDGET_US = 400_000
+
+# Heavy modules which must only be imported by the code paths that need them
+DEFERRED_MODULES = (
+    "deepmerge",
+    "jinja2",
+    "pydantic",
+    "pkg_resources",
+    "pygit2",
+    "xmlrpc",
+)
+
+REPO_ROOT = Path(__file__).parents[2]
+
+
+def import_times(cwd: Path) -> dict:
+    """Run `palm --version` with -X importtime and parse the self time per module"""
+    env = {
+        **os.environ,
+        "HOME": str(cwd / "home"),
+        "PYTHONPATH": str(REPO_ROOT),
+        "PYTHONDONTWRITEBYTECODE": "",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "palm.cli", "--version"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "version" in result.stdout
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(self_us)
+    return times
+
+
+def test_version_does_not_import_deferred_modules(tmp_path):
+    modules = import_times(tmp_path)
+    imported = [m for m in modules if m.split(".")[0] in DEFERRED_MODULES]
+    assert imported == []
+
+
+def test_version_import_budget(tmp_path):
+    total = sum(import_times(tmp_path).values())
+    assert total < IMPORT_BUDGET_US, f"{total}us spent importing for palm --version"
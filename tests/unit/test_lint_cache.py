@@ -0,0 +1,102 @@
+import subprocess
+
+import pygit2
+import pytest
+from click.testing import CliRunner
+
+from palm.lint_cache import LintCache, black_command
+from palm.plugins.core.commands.cmd_lint import cli
+
+
+@pytest.fixture
+def lint_environment(environment, tmp_path, monkeypatch):
+    (tmp_path / "app.py").write_text("x = {  'a':1 }\n")
+    (tmp_path / "util.py").write_text("y = 1\n")
+    (tmp_path / "page.tpl.py").write_text("{{ not python }}\n")
+    (tmp_path / ".gitignore").write_text(".palm/\nmock/\npalm-cache/\n")
+    repo = pygit2.init_repository(str(tmp_path))
+    repo.index.add_all()
+    repo.index.write()
+    signature = pygit2.Signature("palm", "palm@example.com")
+    repo.create_commit(
+        "HEAD", signature, signature, "initial", repo.index.write_tree(), []
+    )
+    environment.palm._repo = repo
+
+    commands = []
+
+    def run_in_docker(cmd, *args, **kwargs):
+        commands.append(cmd)
+        result = subprocess.run(cmd, shell=True, cwd=tmp_path)
+        return (result.returncode == 0, "")
+
+    monkeypatch.setattr(environment, "run_in_docker", run_in_docker)
+    monkeypatch.setattr(environment, "docker_image_id", lambda: "sha256:1")
+    environment.commands = commands
+    return environment
+
+
+def lint(environment, *args):
+    return CliRunner().invoke(cli, list(args), obj=environment)
+
+
+def test_lint_skips_formatted_files(lint_environment, tmp_path):
+    result = lint(lint_environment)
+    assert result.exit_code == 0, result.output
+    assert "Linting 2 files" in result.output
+    assert lint_environment.commands[0].startswith("xargs -0 black")
+    assert (tmp_path / "app.py").read_text() == "x = {'a': 1}\n"
+    listed = (tmp_path / ".palm" / "cache" / "lint_files").read_bytes()
+    assert listed == b"app.py\0util.py\0"
+
+    result = lint(lint_environment)
+    assert "2 files unchanged" in result.output
+    assert "Nothing to lint" in result.output
+    assert len(lint_environment.commands) == 1
+
+
+def test_lint_changed_files(lint_environment, tmp_path):
+    (tmp_path / "util.py").write_text("y  =  2\n")
+    (tmp_path / "new.py").write_text("z=3\n")
+    result = lint(lint_environment, "--changed")
+    assert "Linting 2 files" in result.output
+    listed = (tmp_path / ".palm" / "cache" / "lint_files").read_bytes()
+    assert listed == b"new.py\0util.py\0"
+
+    result = lint(lint_environment, "--changed")
+    assert "Nothing to lint" in result.output
+
+    result = lint(lint_environment, "--changed", "--base", "nope")
+    assert result.exit_code == 2
+    assert "nope is not a commit" in result.output
+
+
+def test_lint_without_cache_runs_on_the_tree(lint_environment):
+    lint_environment.use_result_cache = False
+    result = lint(lint_environment)
+    assert result.exit_code == 0
+    assert lint_environment.commands == [
+        'black --skip-string-normalization --exclude="\\.tpl\\.py" .'
+    ]
+
+
+def test_lint_cache_settings(tmp_path):
+    (tmp_path / "a.py").write_text("a = 1\n")
+    lint_cache = LintCache(tmp_path, {"image": "sha256:1"})
+    assert lint_cache.stale(["a.py"]) == ["a.py"]
+    lint_cache.record(["a.py"])
+    assert LintCache(tmp_path, {"image": "sha256:1"}).stale(["a.py"]) == []
+
+    # A new image or black config invalidates everything
+    assert LintCache(tmp_path, {"image": "sha256:2"}).stale(["a.py"]) == ["a.py"]
+    (tmp_path / "pyproject.toml").write_text("[tool.black]\nline-length = 100\n")
+    assert LintCache(tmp_path, {"image": "sha256:1"}).stale(["a.py"]) == ["a.py"]
+
+
+def test_black_command_workers(tmp_path):
+    command = black_command(["a.py"], tmp_path, workers=4)
+    assert command == (
+        'xargs -0 black --skip-string-normalization --workers 4 '
+        '--force-exclude="\\.tpl\\.py" < .palm/cache/lint_files'
+    )
+    assert (tmp_path / ".palm" / "cache" / ".gitignore").read_text() == "*\n"
@@ -2,8 +2,13 @@ from unittest import mock
 
 import pytest
 from click import HelpFormatter
+from click.testing import CliRunner
 
+import palm.cli as palm_cli
+from palm import cache
 from palm.cli import PalmCLI
+from palm.docker_api import READY_CACHE
+from palm.help_index import ALL_REQUIREMENTS
 
 
 @pytest.fixture
@@ -76,3 +81,70 @@ def test_format_commands_handles_multiple_groups(mock_help_formatter, monkeypatc
     call_args = [str(call) for call in m.call_args_list]
     assert "call('Core')" in call_args
     assert "call('Bar')" in call_args
+
+
+def test_format_commands_does_not_import_commands(mock_help_formatter, monkeypatch):
+    PalmCLIInstance = PalmCLI()
+    monkeypatch.setattr(PalmCLIInstance, "list_commands", lambda x: ["test"])
+
+    def fail(ctx, cmd_name):
+        raise AssertionError(f"{cmd_name} should not be imported")
+
+    monkeypatch.setattr(PalmCLIInstance, "get_command", fail)
+    m = mock.Mock()
+    monkeypatch.setattr(mock_help_formatter, "write_dl", m)
+    PalmCLIInstance.format_commands({}, mock_help_formatter)
+    m.assert_called_with([("test", "Run tests for your application (pytest)")])
+
+
+def test_get_command_reuses_loaded_module():
+    PalmCLIInstance = PalmCLI()
+    assert PalmCLIInstance.get_command({}, "test") is PalmCLIInstance.get_command(
+        {}, "test"
+    )
+
+
+def test_requirements_are_read_statically(monkeypatch):
+    PalmCLIInstance = PalmCLI()
+
+    def fail(*args):
+        raise AssertionError("command should not be imported")
+
+    monkeypatch.setattr(PalmCLIInstance.command_loader, "load", fail)
+    assert PalmCLIInstance.requirements("scaffold") == {"git"}
+    assert PalmCLIInstance.requirements("cache") == set()
+    assert PalmCLIInstance.requirements("test") == {"config", "docker", "git"}
+    assert PalmCLIInstance.requirements(None) == set()
+
+
+def test_requirements_default_to_everything(plugin_manager, monkeypatch):
+    PalmCLIInstance = PalmCLI()
+    monkeypatch.setattr(PalmCLIInstance, "plugin_manager", plugin_manager)
+    assert PalmCLIInstance.requirements("foo") == ALL_REQUIREMENTS
+
+
+def test_cli_skips_unneeded_checks(monkeypatch):
+    def fail(*args):
+        raise AssertionError("check should not run")
+
+    monkeypatch.delenv("PALM_TEST", raising=False)
+    monkeypatch.setattr(palm_cli, "ensure_valid_branch", fail)
+    monkeypatch.setattr(palm_cli, "required_dependencies_ready", fail)
+    result = CliRunner().invoke(palm_cli.cli, ["--timings", "cache", "--help"])
+    assert result.exit_code == 0, result.output
+    assert "git" in result.stderr and "docker" in result.stderr
+
+
+def test_required_dependencies_ready(docker_engine, monkeypatch):
+    monkeypatch.setattr(palm_cli.shutil, "which", lambda name: "/usr/bin/docker")
+    assert palm_cli.required_dependencies_ready()
+
+    docker_engine.route("GET", "/_ping", (500, b""))
+    cache.remove(READY_CACHE)
+    assert not palm_cli.required_dependencies_ready()
+
+
+def test_required_dependencies_ready_without_docker(monkeypatch, capsys):
+    monkeypatch.setattr(palm_cli.shutil, "which", lambda name: None)
+    assert not palm_cli.required_dependencies_ready()
+    assert "Docker is not installed" in capsys.readouterr().out
@@ -84,3 +84,21 @@ def test_get_config_merges_repo_and_global(no_palm_config, monkeypatch):
 def test_global_plugins_are_loaded_without_repo(no_repo_palm_config, monkeypatch):
     plugins = no_repo_palm_config.plugins
     assert plugins == ['setup']
+
+
+# Git
+
+
+def test_branch_is_read_without_opening_repo(no_palm_config):
+    assert no_palm_config.branch == "test"
+    assert no_palm_config._repo is None
+
+
+def test_repo_is_opened_lazily(no_palm_config):
+    assert no_palm_config.repo.head.shorthand == "test"
+    assert no_palm_config.repo is no_palm_config.repo
+
+
+def test_no_repo_without_git_dir(no_repo_palm_config):
+    assert no_repo_palm_config.repo is None
+    assert no_repo_palm_config.branch is None
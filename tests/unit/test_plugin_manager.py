@@ -45,3 +45,8 @@ def test_plugin_command_list(plugin_manager):
     command_list = plugin_manager.plugin_command_list
     assert len(command_list) == 1
     assert "foo" in command_list
+
+
+def test_rebuild_command_manifest(plugin_manager):
+    assert plugin_manager.rebuild_command_manifest() == 1
+    assert plugin_manager.plugin_command_dict["foo"] == "mock"
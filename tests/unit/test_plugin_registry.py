@@ -0,0 +1,121 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from palm import cache, plugin_registry
+from palm.plugin_manager import PluginManager
+from palm.plugin_registry import PluginRegistry
+
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    import importlib_metadata as metadata
+
+PLUGIN_SOURCE = """
+from pathlib import Path
+
+from palm.plugins.base import BasePlugin
+
+Plugin = BasePlugin(name="{name}", command_dir=Path(__file__).parent / "commands")
+"""
+
+
+def age(path, seconds=60):
+    old = os.stat(path).st_mtime - seconds
+    os.utime(path, (old, old))
+
+
+def install(site, name):
+    """Install a fake plugin distribution with a palm.plugins entry point"""
+    package = site / f"{name}_palm_plugin"
+    (package / "commands").mkdir(parents=True)
+    (package / "__init__.py").write_text(PLUGIN_SOURCE.format(name=name))
+    (package / "commands" / "cmd_hello.py").write_text("")
+    dist_info = site / f"{name}_palm_plugin-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(f"Name: {name}-palm-plugin\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text(
+        f"[palm.plugins]\n{name} = {name}_palm_plugin\n"
+    )
+    return package
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    site = tmp_path / "site-packages"
+    site.mkdir()
+    monkeypatch.setattr(sys, "path", [str(site)])
+    yield site
+    for name in list(sys.modules):
+        if name.endswith("_palm_plugin"):
+            del sys.modules[name]
+
+
+def test_load_plugin_from_entry_point(site):
+    package = install(site, "alpha")
+    plugin = PluginRegistry().load_plugin("alpha")
+
+    assert plugin.name == "alpha"
+    assert plugin.command_dir == package / "commands"
+    assert "alpha_palm_plugin" in sys.modules
+
+
+def test_unregistered_plugin_returns_none(site):
+    assert PluginRegistry().load_plugin("missing") is None
+
+
+def test_registry_is_cached(site, monkeypatch):
+    install(site, "alpha")
+    age(site)
+    registry = PluginRegistry()
+    registry.load_plugin("alpha")
+    registry.save()
+    assert (cache.cache_dir() / PluginRegistry.FILE_NAME).exists()
+
+    def fail():
+        raise AssertionError("entry points should not be resolved")
+
+    monkeypatch.setattr(plugin_registry, "plugin_entry_points", fail)
+    assert "alpha" in PluginRegistry().plugins
+
+
+def test_installing_a_plugin_invalidates_registry(site):
+    install(site, "alpha")
+    age(site)
+    registry = PluginRegistry()
+    assert list(registry.plugins) == ["alpha"]
+    registry.save()
+
+    install(site, "beta")
+    assert sorted(PluginRegistry().plugins) == ["alpha", "beta"]
+
+
+def test_racy_site_is_not_cached(site):
+    install(site, "alpha")
+    registry = PluginRegistry()
+    assert "alpha" in registry.plugins
+    assert not registry.dirty
+
+
+def test_moved_plugin_module_returns_none(site):
+    package = install(site, "alpha")
+    registry = PluginRegistry()
+    registry.plugins["alpha"]["origin"] = str(package / "gone.py")
+    assert registry.load_plugin("alpha") is None
+
+
+def test_dict_entry_points_api(monkeypatch):
+    entry_point = SimpleNamespace(name="alpha", value="alpha_palm_plugin")
+    monkeypatch.setattr(
+        metadata, "entry_points", lambda: {"palm.plugins": [entry_point]}
+    )
+    assert plugin_registry.plugin_entry_points() == [entry_point]
+
+
+def test_plugin_manager_uses_registry(site):
+    install(site, "alpha")
+    pm = PluginManager()
+    pm.load_plugin("alpha")
+    assert pm.plugin_command_dict["hello"] == "alpha"
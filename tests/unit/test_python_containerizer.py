@@ -23,10 +23,33 @@ def test_detect_package_manager(tmp_path, environment):
     with pytest.raises(Exception):
         pc.detect_package_manager()
 
+    Path("pdm.lock").touch()
+    assert pc.detect_package_manager() == "pdm"
+    Path("Pipfile.lock").touch()
+    assert pc.detect_package_manager() == "pipenv"
     Path("poetry.lock").touch()
     assert pc.detect_package_manager() == "poetry"
     Path("requirements.txt").touch()
     assert pc.detect_package_manager() == "pip3"
+    Path("uv.lock").touch()
+    assert pc.detect_package_manager() == "uv"
+
+
+def test_detect_lockfile(tmp_path, environment):
+    os.chdir(tmp_path)
+    ctx = MockContext(obj=environment)
+    pc = PythonContainerizer(ctx, tmp_path)
+
+    pc.package_manager = "pdm"
+    with pytest.raises(SystemExit):
+        pc.detect_lockfile()
+
+    # uv without a uv.lock installs from requirements.txt
+    Path("requirements.txt").touch()
+    pc.package_manager = "uv"
+    assert pc.detect_lockfile() == "requirements.txt"
+    Path("uv.lock").touch()
+    assert pc.detect_lockfile() == "uv.lock"
 
 
 def test_has_requirements_txt(tmp_path, environment):
@@ -64,6 +87,7 @@ def test_run(tmp_path, environment):
     assert Path(tmp_path, "Dockerfile").exists()
     assert Path(tmp_path, "docker-compose.yaml").exists()
     assert Path(tmp_path, "scripts/entrypoint.sh").exists()
+    assert ".git\n" in Path(tmp_path, ".dockerignore").read_text()
 
 
 def test_validate_python_version(tmp_path, environment):
@@ -77,3 +101,73 @@ def test_validate_python_version(tmp_path, environment):
     assert not invalid_version_pc.validate_python_version()
     invalid_value_pc = PythonContainerizer(ctx, tmp_path, "foo")
     assert not invalid_value_pc.validate_python_version()
+
+
+@pytest.mark.parametrize("package_manager", ["requirements.txt", "poetry.lock"])
+@pytest.mark.parametrize("mode", PythonContainerizer.MODES)
+def test_run_modes(tmp_path, environment, mode, package_manager):
+    templates_dir = (
+        Path(__file__).parents[2] / "palm/plugins/core/templates/containerize"
+    )
+
+    os.chdir(tmp_path)
+    Path(".env").touch()
+    Path(package_manager).touch()
+    ctx = MockContext(obj=environment)
+    PythonContainerizer(ctx, templates_dir, "3.11", mode).run()
+
+    dockerfile = Path(tmp_path, "Dockerfile").read_text()
+    lines = dockerfile.splitlines()
+    if mode == "standard":
+        assert lines[0] == "FROM python:3.11"
+        assert "RUN ./scripts/entrypoint.sh" in lines
+        return
+
+    # Only the lockfile is copied before dependencies are installed
+    copy_source = lines.index("COPY . /app/")
+    install = max(i for i, line in enumerate(lines) if "install" in line)
+    assert install < copy_source
+    assert "--mount=type=cache" in dockerfile
+    if package_manager == "poetry.lock":
+        assert "COPY pyproject.toml poetry.lock ./" in lines
+    else:
+        assert "COPY requirements.txt ./" in lines
+    if mode == "multi-stage":
+        assert "FROM python:3.11 AS builder" in lines
+        assert "FROM python:3.11-slim" in lines
+        assert "COPY --from=builder /opt/venv /opt/venv" in lines
+    else:
+        assert dockerfile.count("FROM ") == 1
+
+
+@pytest.mark.parametrize(
+    "lockfile,package_manager,install",
+    [
+        ("uv.lock", None, "uv sync --frozen --no-install-project"),
+        ("requirements.txt", "uv", "uv pip install --system -r requirements.txt"),
+        ("Pipfile.lock", None, "pipenv requirements --dev --hash"),
+        ("pdm.lock", None, "pdm export -o /tmp/requirements.txt"),
+    ],
+)
+def test_run_package_managers(
+    tmp_path, environment, lockfile, package_manager, install
+):
+    templates_dir = (
+        Path(__file__).parents[2] / "palm/plugins/core/templates/containerize"
+    )
+
+    os.chdir(tmp_path)
+    Path(".env").touch()
+    Path(lockfile).touch()
+    ctx = MockContext(obj=environment)
+    PythonContainerizer(ctx, templates_dir, "3.11", "optimized", package_manager).run()
+
+    dockerfile = Path(tmp_path, "Dockerfile").read_text()
+    assert install in dockerfile
+    assert "--mount=type=cache,target=/root/.cache/uv" in dockerfile
+    lines = dockerfile.splitlines()
+    assert lines.index("COPY . /app/") > max(
+        i for i, line in enumerate(lines) if install in line
+    )
+    entrypoint = Path(tmp_path, "scripts/entrypoint.sh").read_text()
+    assert "pip3 install" in entrypoint and " uv" in entrypoint
@@ -0,0 +1,181 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from palm import utils
+from palm.palm_exceptions import InvalidConfigError
+from palm.result_cache import (
+    InputSpec,
+    ResultCache,
+    cached_run,
+    glob_pattern,
+    tee_output,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    project = tmp_path / "project"
+    (project / "src" / "pkg").mkdir(parents=True)
+    (project / "src" / "pkg" / "mod.py").write_text("x = 1\n")
+    (project / "setup.py").write_text("")
+    (project / ".venv" / "lib").mkdir(parents=True)
+    (project / ".venv" / "lib" / "site.py").write_text("")
+    return ResultCache(project)
+
+
+@pytest.fixture
+def counting_run():
+    calls = []
+
+    def run():
+        calls.append(1)
+        os.write(1, b"ran\n")
+        return (True, "done")
+
+    run.calls = calls
+    return run
+
+
+def test_glob_pattern():
+    assert glob_pattern("**/*.py").match("a/b/c.py")
+    assert glob_pattern("**/*.py").match("c.py")
+    assert not glob_pattern("*.py").match("a/c.py")
+    assert glob_pattern("src/**").match("src/a/b")
+    assert not glob_pattern("?.py").match("ab.py")
+
+
+def test_input_files(store):
+    assert store.input_files(["**/*.py"]) == ["setup.py", "src/pkg/mod.py"]
+    assert store.input_files(["src/*.py"]) == []
+
+
+def test_input_spec_parse():
+    assert InputSpec.parse(["*.py"]).files == ["*.py"]
+    assert InputSpec.parse({"env": ["A"], "image": False}).env == ["A"]
+    with pytest.raises(InvalidConfigError):
+        InputSpec.parse({"glob": "*.py"})
+
+
+def test_key_follows_inputs(store, monkeypatch):
+    spec = InputSpec(files=["**/*.py"], env=["FLAVOUR"])
+    command = {"cmd": "pytest"}
+    key = store.key(command, spec)
+
+    assert store.key(command, spec) == key
+    assert store.key({"cmd": "pytest -x"}, spec) != key
+    assert store.key(command, spec, "sha256:other") != key
+    monkeypatch.setenv("FLAVOUR", "mint")
+    assert store.key(command, spec) != key
+    monkeypatch.delenv("FLAVOUR")
+    (store.project_root / "src" / "pkg" / "mod.py").write_text("x = 2\n")
+    assert store.key(command, spec) != key
+    (store.project_root / ".venv" / "lib" / "site.py").write_text("ignored")
+    (store.project_root / "src" / "pkg" / "mod.py").write_text("x = 1\n")
+    assert store.key(command, spec) == key
+
+
+def test_cached_run_replays(store, counting_run, capfd):
+    spec = InputSpec(files=["**/*.py"])
+    assert cached_run(store, {"cmd": "x"}, spec, counting_run) == (True, "done")
+    assert capfd.readouterr().out == "ran\n"
+
+    assert cached_run(store, {"cmd": "x"}, spec, counting_run) == (True, "done")
+    assert len(counting_run.calls) == 1
+    out, err = capfd.readouterr()
+    assert out == "ran\n"
+    assert "Cached result" in err
+
+
+def test_cached_run_force(store, counting_run):
+    spec = InputSpec()
+    cached_run(store, {"cmd": "x"}, spec, counting_run)
+    cached_run(store, {"cmd": "x"}, spec, counting_run, force=True)
+    assert len(counting_run.calls) == 2
+
+
+@pytest.mark.parametrize("result", [(False, "failed"), (1, "", "failed")])
+def test_failures_are_not_stored(store, result):
+    calls = []
+
+    def run():
+        calls.append(1)
+        return result
+
+    spec = InputSpec()
+    assert cached_run(store, {"cmd": "x"}, spec, run) == result
+    assert cached_run(store, {"cmd": "x"}, spec, run, capture=False) == result
+    assert len(calls) == 2
+
+
+def test_tee_output_captures_subprocesses(capfd):
+    with tee_output() as output:
+        subprocess.run("echo out; echo err >&2", shell=True)
+    assert output.stdout == "out\n"
+    assert output.stderr == "err\n"
+    assert capfd.readouterr() == ("out\n", "err\n")
+
+
+def test_evicts_least_recently_used(store):
+    store.max_size = 400
+    for name in ("a", "b", "c"):
+        store.put(name * 64, [0], "x" * 100)
+        time.sleep(0.01)
+        if name == "b":
+            # Reading a refreshes it
+            store.get("a" * 64)
+
+    assert store.get("a" * 64) is not None
+    assert store.get("b" * 64) is None
+    assert store.get("c" * 64) is not None
+
+
+def test_run_on_host_cache(environment, tmp_path, capfd):
+    count = tmp_path / "count"
+    cmd = f"echo hello; echo x >> {count}"
+    for _ in range(2):
+        result = environment.run_on_host(cmd, cache_inputs={"files": ["*.txt"]})
+        assert result == (0, "", "")
+
+    assert count.read_text() == "x\n"
+    assert capfd.readouterr().out == "hello\nhello\n"
+
+    environment.use_result_cache = False
+    environment.run_on_host(cmd, cache_inputs=[])
+    assert count.read_text() == "x\nx\n"
+
+
+def test_run_in_docker_cache(environment, monkeypatch):
+    commands = []
+    monkeypatch.setattr(
+        utils, "run_on_host", lambda cmd, *args: commands.append(cmd) or (0, "", "")
+    )
+    monkeypatch.setattr(environment, "docker_image_id", lambda: "sha256:1")
+    for _ in range(2):
+        assert environment.run_in_docker("pytest", cache_inputs=["**/*.py"])[0]
+    assert len(commands) == 1
+
+    monkeypatch.setattr(environment, "docker_image_id", lambda: "sha256:2")
+    environment.run_in_docker("pytest", cache_inputs=["**/*.py"])
+    assert len(commands) == 2
+
+
+def test_run_in_docker_without_image_is_not_cached(environment, monkeypatch):
+    commands = []
+    monkeypatch.setattr(
+        utils, "run_on_host", lambda cmd, *args: commands.append(cmd) or (0, "", "")
+    )
+    monkeypatch.setattr(environment, "docker_image_id", lambda: None)
+    for _ in range(2):
+        environment.run_in_docker("pytest", cache_inputs=["**/*.py"])
+    assert len(commands) == 2
+
+
+def test_result_cache_config(environment):
+    assert environment.result_cache().max_size == 256 * 1024 * 1024
+    environment.palm.config["result_cache"] = {"max_size_mb": 1}
+    assert environment.result_cache().max_size == 1024 * 1024
+    environment.palm.config["result_cache"] = False
+    assert environment.result_cache() is None
@@ -0,0 +1,200 @@
+import sys
+import time
+
+import click
+import pytest
+
+from palm import utils
+from palm.palm_exceptions import InvalidConfigError
+from palm.task_runner import (
+    CANCELLED,
+    FAILED,
+    PASSED,
+    SKIPPED,
+    Task,
+    TaskGraph,
+    TaskRunner,
+)
+
+
+def host_graph(tasks):
+    return TaskGraph.from_config(
+        {
+            "tasks": {
+                name: {**spec, "host": True} if "run" in spec else spec
+                for name, spec in tasks.items()
+            }
+        }
+    )
+
+
+def run(graph, targets, jobs=4, keep_going=False):
+    lines = []
+    results = TaskRunner(graph, jobs, keep_going, echo=lines.append).run(targets)
+    return results, [click.unstyle(line) for line in lines]
+
+
+def test_task_shorthand():
+    task = Task.from_config("unit", "test -x")
+    assert task.argv() == [sys.executable, "-m", "palm", "test", "-x"]
+
+
+def test_docker_step_runs_through_palm():
+    task = Task.from_config("types", {"run": "mypy ."})
+    assert task.argv()[-3:] == ["run", "--in-docker", "mypy ."]
+
+
+def test_task_environ():
+    env = Task.from_config("unit", {"command": "test", "env": {"A": 1}}).environ()
+    assert env["A"] == "1"
+    assert env["PALM_TASK_ENV"] == '{"A": "1"}'
+    assert env["PALM_NO_SERVICE_PORTS"] == "1"
+
+
+def test_invalid_tasks():
+    with pytest.raises(InvalidConfigError):
+        TaskGraph.from_config({"tasks": {"a": {"depends_on": ["missing"]}}})
+    with pytest.raises(InvalidConfigError):
+        TaskGraph.from_config({"tasks": {"a": {"command": "x", "run": "y"}}})
+    with pytest.raises(InvalidConfigError):
+        TaskGraph.from_config({"tasks": {"a": {"comand": "x"}}})
+
+
+def test_plan_orders_dependencies():
+    graph = TaskGraph.from_config(
+        {
+            "tasks": {
+                "ci": {"depends_on": ["unit", "lint"]},
+                "unit": {"command": "test", "depends_on": ["build"]},
+                "lint": "lint",
+                "build": "build",
+                "unused": "other",
+            }
+        }
+    )
+    assert graph.plan(["ci"]) == ["build", "unit", "lint", "ci"]
+
+
+def test_plan_cycle():
+    graph = TaskGraph.from_config(
+        {"tasks": {"a": {"depends_on": ["b"]}, "b": {"depends_on": "a"}}}
+    )
+    with pytest.raises(InvalidConfigError, match="a -> b -> a"):
+        graph.plan(["a"])
+
+
+def test_plan_unknown_target():
+    with pytest.raises(click.BadParameter):
+        TaskGraph.from_config({"tasks": {}}).plan(["ci"])
+
+
+def test_independent_tasks_run_concurrently():
+    graph = host_graph(
+        {
+            "a": {"run": "sleep 0.3; echo a"},
+            "b": {"run": "sleep 0.3; echo b"},
+            "c": {"run": "sleep 0.3; echo c"},
+            "all": {"depends_on": ["a", "b", "c"]},
+        }
+    )
+    start = time.perf_counter()
+    results, lines = run(graph, ["all"])
+
+    assert time.perf_counter() - start < 0.8
+    assert results == {"a": PASSED, "b": PASSED, "c": PASSED, "all": PASSED}
+    assert sorted(lines) == ["a   | a", "b   | b", "c   | c"]
+
+
+def test_task_env_is_set():
+    graph = host_graph({"a": {"run": "echo $GREETING", "env": {"GREETING": "hi"}}})
+    assert run(graph, ["a"])[1] == ["a | hi"]
+
+
+def test_failure_stops_the_run():
+    graph = host_graph(
+        {
+            "fail": {"run": "exit 1"},
+            "slow": {"run": "sleep 5"},
+            "after": {"run": "echo after", "depends_on": ["slow"]},
+        }
+    )
+    start = time.perf_counter()
+    results, _ = run(graph, ["fail", "after"])
+
+    assert time.perf_counter() - start < 4
+    assert results == {"fail": FAILED, "slow": CANCELLED, "after": CANCELLED}
+
+
+def test_interrupt_terminates_tasks(monkeypatch):
+    from palm import task_runner
+
+    graph = host_graph({"slow": {"run": "sleep 8; echo done"}})
+    lines = []
+    runner = TaskRunner(graph, 1, echo=lines.append)
+
+    def interrupted_wait(*args, **kwargs):
+        while not runner.processes:
+            time.sleep(0.01)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(task_runner, "wait", interrupted_wait)
+    start = time.perf_counter()
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(["slow"])
+
+    assert time.perf_counter() - start < 4
+    assert runner.processes == {}
+    assert not any("done" in line for line in lines)
+
+
+def test_keep_going():
+    graph = host_graph(
+        {
+            "fail": {"run": "exit 1"},
+            "dependent": {"run": "echo no", "depends_on": ["fail"]},
+            "independent": {"run": "sleep 0.1; echo yes"},
+        }
+    )
+    results, lines = run(graph, ["dependent", "independent"], keep_going=True)
+
+    assert results == {"fail": FAILED, "dependent": SKIPPED, "independent": PASSED}
+    assert [line for line in lines if "yes" in line]
+
+
+def test_jobs_limit():
+    graph = host_graph({name: {"run": "sleep 0.2"} for name in "abc"})
+    start = time.perf_counter()
+    run(graph, ["a", "b", "c"], jobs=1)
+    assert time.perf_counter() - start >= 0.6
+
+
+def test_no_service_ports(environment, monkeypatch):
+    commands = []
+    monkeypatch.setattr(
+        utils, "run_on_host", lambda cmd, *args: commands.append(cmd) or (0, "", "")
+    )
+    environment.run_in_docker("pytest")
+    monkeypatch.setenv("PALM_NO_SERVICE_PORTS", "1")
+    monkeypatch.setenv("PALM_TASK_ENV", '{"A": "1"}')
+    environment.run_in_docker("pytest")
+
+    assert commands[0].startswith("docker compose run --service-ports --rm")
+    assert commands[1].startswith("docker compose run --rm -e A=1 ")
+
+
+def test_in_docker_step_streams_output(environment, monkeypatch):
+    from click.testing import CliRunner
+
+    from palm.plugins.core.commands.cmd_run import cli, requires
+
+    calls = []
+    monkeypatch.setattr(
+        utils, "run_on_host", lambda *args: calls.append(args) or (1, "", "")
+    )
+    result = CliRunner().invoke(cli, ["--in-docker", "mypy ."], obj=environment)
+
+    assert result.exit_code == 1
+    ((cmd, _, capture_output),) = calls
+    assert "mypy ." in cmd
+    assert not capture_output
+    assert "docker" in requires
@@ -0,0 +1,145 @@
+import json
+import subprocess
+import sys
+
+import pygit2
+import pytest
+
+from palm.test_impact import AffectedTestRun, ImpactMap, global_changes
+
+
+def commit_all(repo, message):
+    repo.index.add_all()
+    repo.index.write()
+    signature = pygit2.Signature("palm", "palm@example.com")
+    parents = [] if repo.head_is_unborn else [repo.head.target]
+    repo.create_commit(
+        "HEAD", signature, signature, message, repo.index.write_tree(), parents
+    )
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "shapes.py").write_text("def area(w, h):\n    return w * h\n")
+    (tmp_path / "tests" / "words.py").write_text(
+        "def shout(s):\n    return s.upper()\n"
+    )
+    (tmp_path / "tests" / "test_shapes.py").write_text(
+        "from shapes import area\n"
+        "def test_area():\n    assert area(2, 3) == 6\n"
+        "def test_nothing():\n    pass\n"
+    )
+    (tmp_path / "tests" / "test_words.py").write_text(
+        "from words import shout\n" "def test_shout():\n    assert shout('a') == 'A'\n"
+    )
+    (tmp_path / ".gitignore").write_text(".palm/cache/\n__pycache__/\n")
+    repo = pygit2.init_repository(str(tmp_path))
+    commit_all(repo, "initial")
+    return tmp_path, repo
+
+
+def run_affected(project_root, repo, base=None):
+    def run_in_docker(cmd):
+        cmd = cmd.replace("python ", f"{sys.executable} ", 1)
+        result = subprocess.run(cmd, shell=True, cwd=project_root)
+        return (result.returncode == 0, "")
+
+    run = AffectedTestRun(project_root, run_in_docker)
+    selection = run.select(repo, base)
+    success = run.run(selection, repo)
+    result = json.loads((run.directory / "coverage.json").read_text())
+    return selection, success, sorted(result["coverage"])
+
+
+def test_first_run_records_the_whole_suite(project):
+    project_root, repo = project
+    selection, success, ran = run_affected(project_root, repo)
+
+    assert selection == {"full": True, "reason": "no test impact map recorded yet"}
+    assert success
+    assert len(ran) == 3
+    impact_map = ImpactMap(project_root)
+    assert impact_map.load()
+    assert impact_map.commit == str(repo.head.target)
+    assert impact_map.tests["tests/test_shapes.py::test_area"] == {
+        "tests/shapes.py",
+        "tests/test_shapes.py",
+    }
+
+
+def test_only_affected_and_new_tests_run(project):
+    project_root, repo = project
+    run_affected(project_root, repo)
+
+    selection, success, ran = run_affected(project_root, repo)
+    assert not selection["full"] and selection["affected"] == []
+    assert success and ran == []
+
+    (project_root / "tests" / "words.py").write_text(
+        "def shout(s):\n    return s.upper() + '!'\n"
+    )
+    (project_root / "tests" / "test_new.py").write_text("def test_new():\n    pass\n")
+    selection, success, ran = run_affected(project_root, repo)
+    assert selection["changed"] == ["tests/test_new.py", "tests/words.py"]
+    assert ran == ["tests/test_new.py::test_new", "tests/test_words.py::test_shout"]
+    assert not success
+
+    # Failed tests run again until they pass
+    (project_root / "tests" / "words.py").write_text(
+        "def shout(s):\n    return s.upper()\n"
+    )
+    (project_root / "tests" / "test_new.py").unlink()
+    selection, success, ran = run_affected(project_root, repo)
+    assert selection["changed"] == []
+    assert success and ran == ["tests/test_words.py::test_shout"]
+
+    selection, success, ran = run_affected(project_root, repo)
+    assert success and ran == []
+
+
+def test_global_change_runs_everything(project):
+    project_root, repo = project
+    run_affected(project_root, repo)
+
+    (project_root / "tests" / "conftest.py").write_text("")
+    selection, success, ran = run_affected(project_root, repo)
+    assert selection == {"full": True, "reason": "tests/conftest.py changed"}
+    assert len(ran) == 3
+
+
+def test_unknown_base_runs_everything(project):
+    project_root, repo = project
+    run_affected(project_root, repo)
+
+    selection, _, ran = run_affected(project_root, repo, base="no-such-branch")
+    assert selection["full"]
+    assert len(ran) == 3
+
+
+def test_impact_map_round_trip(tmp_path):
+    impact_map = ImpactMap(tmp_path)
+    impact_map.commit = "abc"
+    impact_map.update(
+        {
+            "collected": ["t::a", "t::b"],
+            "coverage": {"t::a": ["x.py", "y.py"], "t::b": ["y.py"]},
+            "failed": ["t::b"],
+        },
+        full=True,
+    )
+    impact_map.save()
+
+    loaded = ImpactMap(tmp_path)
+    assert loaded.load()
+    assert loaded.tests == {"t::a": {"x.py", "y.py"}, "t::b": {"y.py"}}
+    assert loaded.failed == {"t::b"}
+    assert loaded.affected(["x.py"]) == ["t::a", "t::b"]
+    assert '"files":["x.py","y.py"]' in impact_map.path.read_text()
+
+
+def test_global_changes():
+    assert global_changes(["a/conftest.py", "src/app.py", "requirements-dev.txt"]) == [
+        "a/conftest.py",
+        "requirements-dev.txt",
+    ]
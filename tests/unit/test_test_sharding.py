@@ -0,0 +1,140 @@
+import subprocess
+import sys
+
+import click
+import pytest
+
+from palm.test_sharding import (
+    DurationHistory,
+    ShardedTestRun,
+    merge_junit,
+    partition,
+)
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_a.py").write_text(
+        "import time\n"
+        "def test_slow():\n    time.sleep(0.2)\n"
+        "def test_fast():\n    pass\n"
+    )
+    (tmp_path / "tests" / "test_b.py").write_text(
+        "def test_ok():\n    pass\n" "def test_broken():\n    assert False\n"
+    )
+    return tmp_path
+
+
+def host_runner(project, commands):
+    def run_in_docker(cmd, silent=False, service_ports=True):
+        commands.append((cmd, service_ports))
+        cmd = cmd.replace("python ", f"{sys.executable} ", 1)
+        completed = subprocess.run(
+            cmd, shell=True, cwd=project, capture_output=True, text=True
+        )
+        return (completed.returncode == 0, completed.stderr)
+
+    return run_in_docker
+
+
+def test_partition_balances_durations():
+    expected = {"a": 5.0, "b": 3.0, "c": 2.0, "d": 2.0, "e": 2.0}
+    buckets = partition(expected, 2)
+
+    totals = sorted(sum(expected[i] for i in bucket) for bucket in buckets)
+    assert totals == [7.0, 7.0]
+    assert sorted(i for bucket in buckets for i in bucket) == list(expected)
+
+
+def test_partition_keeps_collection_order():
+    expected = {"t1": 1.0, "t2": 1.0, "t3": 5.0, "t4": 1.0}
+    for bucket in partition(expected, 2):
+        assert bucket == sorted(bucket)
+
+
+def test_partition_drops_empty_shards():
+    assert partition({"a": 1.0}, 4) == [["a"]]
+
+
+def test_duration_history(tmp_path):
+    history = DurationHistory(tmp_path)
+    assert history.expected(["a"]) == {"a": 1.0}
+
+    history.update({"a": 4.0, "b": 2.0})
+    history.update({"a": 2.0})
+    assert history.expected(["a", "b", "c"]) == {"a": 3.0, "b": 2.0, "c": 2.5}
+
+    history.save(["a"])
+    assert DurationHistory(tmp_path).durations == {"a": 3.0}
+
+
+def test_merge_junit(tmp_path):
+    (tmp_path / "junit-0.xml").write_text(
+        '<testsuites><testsuite name="pytest" tests="2" failures="1" errors="0"'
+        ' skipped="0"><testcase name="a"/></testsuite></testsuites>'
+    )
+    (tmp_path / "junit-1.xml").write_text(
+        '<testsuite name="pytest" tests="3" failures="0" errors="1" skipped="1"/>'
+    )
+    totals = merge_junit(
+        [tmp_path / "junit-0.xml", tmp_path / "junit-1.xml", tmp_path / "missing"],
+        tmp_path / "out" / "junit.xml",
+    )
+
+    assert totals == {"tests": 5, "failures": 1, "errors": 1, "skipped": 1}
+    assert (tmp_path / "out" / "junit.xml").read_text().count("<testsuite ") == 2
+
+
+def test_sharded_run(project):
+    commands = []
+    run = ShardedTestRun(project, host_runner(project, commands))
+    finished = []
+    results = run.run(2, lambda shard, result: finished.append(shard))
+
+    assert sorted(finished) == [0, 1]
+    assert sorted(t for r in results for t in r["tests"]) == [
+        "tests/test_a.py::test_fast",
+        "tests/test_a.py::test_slow",
+        "tests/test_b.py::test_broken",
+        "tests/test_b.py::test_ok",
+    ]
+    assert sorted(r["exit_code"] for r in results) == [0, 1]
+    failed = [r for r in results if r["exit_code"]][0]
+    assert "test_broken" in failed["log"]
+    assert all(not ports for cmd, ports in commands if " run " in cmd)
+
+    durations = DurationHistory(project).durations
+    assert durations["tests/test_a.py::test_slow"] >= 0.2
+    assert (project / ".palm" / "cache" / ".gitignore").read_text() == "*\n"
+
+    # The slow test gets a shard of its own once its duration is known
+    results = ShardedTestRun(project, host_runner(project, [])).run(2)
+    assert ["tests/test_a.py::test_slow"] in [r["tests"] for r in results]
+
+
+def test_collection_errors(project):
+    (project / "tests" / "test_c.py").write_text("import missing_module\n")
+    run = ShardedTestRun(project, host_runner(project, []))
+    with pytest.raises(click.ClickException, match="missing_module"):
+        run.run(2)
+
+
+def test_container_errors(project):
+    def broken_docker(cmd, silent=False, service_ports=True):
+        return (False, "service palm-test has no image")
+
+    run = ShardedTestRun(project, broken_docker)
+    with pytest.raises(click.ClickException, match="has no image"):
+        run.run(2)
+
+    runner = host_runner(project, [])
+
+    def broken_shards(cmd, silent=False, service_ports=True):
+        if " run " in cmd:
+            return broken_docker(cmd)
+        return runner(cmd)
+
+    results = ShardedTestRun(project, broken_shards).run(2)
+    assert all(result["exit_code"] is None for result in results)
+    assert all("has no image" in result["log"] for result in results)
@@ -0,0 +1,13 @@
+from palm.timings import Timings
+
+
+def test_report_lists_phases():
+    timings = Timings()
+    with timings.phase("config"):
+        pass
+    timings.skip("docker")
+
+    lines = timings.report().splitlines()
+    assert lines[0].startswith("config") and lines[0].endswith("ms")
+    assert lines[1].startswith("docker") and lines[1].endswith("skipped")
+    assert lines[2].startswith("total")
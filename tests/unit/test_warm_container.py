@@ -0,0 +1,105 @@
+import subprocess
+
+import click
+import pytest
+
+from palm import warm_container
+from palm.palm_exceptions import InvalidConfigError
+from palm.warm_container import HEARTBEAT, KEEPALIVE, WarmContainer, container_name
+
+
+@pytest.fixture
+def host_commands(monkeypatch):
+    commands = []
+
+    def run_on_host(cmd, check=False, capture_output=False):
+        commands.append(cmd)
+        return (0, "", "")
+
+    monkeypatch.setattr(warm_container, "run_on_host", run_on_host)
+    return commands
+
+
+@pytest.fixture
+def warm_environment(environment):
+    environment.palm.config["docker_executor"] = "warm"
+    return environment
+
+
+def container_state(docker_engine, palm_config, status):
+    name = container_name(palm_config)
+    state = {"Status": status, "Running": status == "running"}
+    docker_engine.route("GET", f"/containers/{name}/json", (200, {"State": state}))
+
+
+def test_container_name(environment):
+    environment.palm.config["image_name"] = "my image"
+    name = container_name(environment.palm)
+    assert name.startswith("palm-my-image-")
+    assert name == container_name(environment.palm)
+
+
+def test_run_starts_missing_container(warm_environment, docker_engine, host_commands):
+    success, _ = warm_environment.run_in_docker("pytest", {"palm_test": True})
+
+    assert success
+    name = container_name(warm_environment.palm)
+    start, run = host_commands
+    assert start.startswith("docker compose run -d --service-ports")
+    assert f"--name {name} {warm_environment.palm.image_name} sh -c" in start
+    assert run.startswith("docker exec -i -e PALM_TEST=True " + name)
+    assert run.endswith('palm /bin/bash -c "pytest" ')
+
+
+def test_run_reuses_running_container(warm_environment, docker_engine, host_commands):
+    container_state(docker_engine, warm_environment.palm, "running")
+    warm_environment.run_in_docker("pytest")
+
+    assert len(host_commands) == 1
+    assert host_commands[0].startswith("docker exec")
+
+
+def test_stopped_container_is_replaced(warm_environment, docker_engine, host_commands):
+    container_state(docker_engine, warm_environment.palm, "exited")
+    WarmContainer(warm_environment.palm).start()
+
+    name = container_name(warm_environment.palm)
+    assert host_commands[0] == f"docker rm -f {name}"
+    assert host_commands[1].startswith("docker compose run -d")
+
+
+def test_compose_executor_is_default(environment, host_commands, monkeypatch):
+    monkeypatch.setattr(
+        "palm.environment.run_in_docker", lambda *args, **kwargs: (True, "compose")
+    )
+    assert environment.run_in_docker("pytest") == (True, "compose")
+    assert host_commands == []
+
+
+def test_invalid_executor(environment):
+    environment.palm.config["docker_executor"] = "swarm"
+    with pytest.raises(InvalidConfigError):
+        environment.palm.docker_executor
+    with pytest.raises(click.ClickException, match="expected one of: compose"):
+        environment.run_in_docker("pytest")
+
+
+def test_keepalive_exits_when_idle(tmp_path):
+    marker = tmp_path / "marker"
+    script = KEEPALIVE.format(marker=marker, timeout=1, interval=1)
+    subprocess.run(["sh", "-c", script], timeout=10, check=True)
+    assert marker.exists()
+
+
+def test_heartbeat_returns_command_status(tmp_path):
+    marker = tmp_path / "marker"
+    script = HEARTBEAT.format(marker=marker, interval=1)
+    result = subprocess.run(
+        ["sh", "-c", script, "palm", "sh", "-c", "echo hi; exit 3"],
+        capture_output=True,
+        text=True,
+        timeout=10,
+    )
+    assert result.returncode == 3
+    assert result.stdout == "hi\n"
+    assert marker.exists()